@@ -0,0 +1,137 @@
+# TeddyTale/circuit_breaker.py
+"""
+Автоматический выключатель (circuit breaker) для обращений к Supabase.
+
+Состояния:
+- closed    - БД работает, запросы идут как обычно, без предварительных проверок;
+- open      - БД недоступна, обращения к ней сразу отклоняются (без ожидания
+              connect_timeout), пользователи получают кэш или страницу 503;
+- half_open - после RESET_TIMEOUT секунд пропускается один пробный запрос.
+              Успех замыкает выключатель, ошибка снова размыкает его.
+
+Один экземпляр на процесс (воркер gunicorn).
+"""
+import logging
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Выключатель с тремя состояниями и счетчиками переходов"""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0
+        self._trial_in_progress = False
+        self.transitions = {CLOSED: 0, OPEN: 0, HALF_OPEN: 0}
+        self.failures = 0
+        self.successes = 0
+        self.rejected = 0
+
+    def _config(self):
+        config = {
+            'FAILURE_THRESHOLD': 3,  # Ошибок подряд до размыкания
+            'RESET_TIMEOUT': 30,  # Секунд до пробного запроса
+        }
+        config.update(getattr(settings, 'DB_CIRCUIT_BREAKER', {}))
+        return config
+
+    def _transition(self, state):
+        if self._state != state:
+            logger.warning(f"Выключатель '{self.name}': {self._state} -> {state}")
+            self._state = state
+            self.transitions[state] += 1
+
+    @property
+    def state(self):
+        with self._lock:
+            if (self._state == OPEN and time.monotonic() - self._opened_at
+                    >= self._config()['RESET_TIMEOUT']):
+                return HALF_OPEN
+            return self._state
+
+    def is_open(self):
+        """Разомкнут ли выключатель (без захвата пробного запроса)"""
+        return self.state == OPEN
+
+    def allow_request(self):
+        """
+        Разрешает ли выключатель обращение к БД.
+        Возвращает (allowed, is_trial): в полуоткрытом состоянии
+        разрешается ровно один пробный запрос.
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True, False
+
+            if self._state == OPEN:
+                if (time.monotonic() - self._opened_at
+                        < self._config()['RESET_TIMEOUT']):
+                    self.rejected += 1
+                    return False, False
+                self._transition(HALF_OPEN)
+
+            # HALF_OPEN: пропускаем только один пробный запрос
+            if self._trial_in_progress:
+                self.rejected += 1
+                return False, False
+            self._trial_in_progress = True
+            return True, True
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self._consecutive_failures = 0
+            self._trial_in_progress = False
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._consecutive_failures += 1
+            self._trial_in_progress = False
+            if (self._state == HALF_OPEN or self._consecutive_failures
+                    >= self._config()['FAILURE_THRESHOLD']):
+                self._opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def stats(self):
+        state = self.state
+        with self._lock:
+            return {
+                'state': state,
+                'consecutive_failures': self._consecutive_failures,
+                'failures': self.failures,
+                'successes': self.successes,
+                'rejected': self.rejected,
+                'transitions': dict(self.transitions),
+            }
+
+
+# Глобальный экземпляр для базы данных
+db_circuit_breaker = CircuitBreaker('database')
+
+
+def db_optional(view_func):
+    """
+    Помечает представление, которое умеет отвечать без БД
+    (из кэша или последней удачной версии контента). Такие представления
+    вызываются и при разомкнутом выключателе.
+    """
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        return view_func(*args, **kwargs)
+    wrapper.db_optional = True
+    return wrapper
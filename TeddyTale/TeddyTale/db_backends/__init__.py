@@ -0,0 +1,3 @@
+"""
+Собственные движки баз данных проекта TeddyTale.
+"""
@@ -0,0 +1,3 @@
+"""
+PostgreSQL с пулом соединений (django-db-connection-pool) и статистикой пула.
+"""
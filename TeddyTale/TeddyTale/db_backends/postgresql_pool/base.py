@@ -0,0 +1,28 @@
+"""
+Движок PostgreSQL с пулом соединений SQLAlchemy.
+
+Расширяет dj_db_conn_pool: учитывает время ожидания соединения из пула
+и подключает к пулу проверку соединений при выдаче (см. TeddyTale/db_pool.py).
+"""
+import time
+
+from dj_db_conn_pool.backends.postgresql.base import (
+    DatabaseWrapper as PoolDatabaseWrapper,
+)
+from dj_db_conn_pool.core import pool_container
+
+from TeddyTale.db_pool import pool_stats
+
+
+class DatabaseWrapper(PoolDatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        pool = pool_container.get(self.alias) if pool_container.has(self.alias) else None
+        # Свободных соединений нет - придется ждать или открывать новое
+        waited = pool is None or pool.checkedin() == 0
+
+        started = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        pool_stats.record_checkout(self.alias, time.perf_counter() - started,
+                                   waited)
+        return connection
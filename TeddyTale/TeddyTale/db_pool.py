@@ -0,0 +1,195 @@
+# TeddyTale/db_pool.py
+"""
+Пул соединений с Supabase для воркеров gunicorn.
+
+Используется движок TeddyTale.db_backends.postgresql_pool
+(django-db-connection-pool поверх SQLAlchemy QueuePool):
+
+- при выдаче соединения из пула оно проверяется (pre-ping);
+- соединения, простоявшие дольше IDLE_TIMEOUT, закрываются без проверки -
+  пулер Supabase к этому времени уже мог их разорвать;
+- после fork пулы сбрасываются, затем MIN_SIZE соединений открываются
+  в фоне (хуки в gunicorn.conf.py);
+- статистика пула: выдано, ожидания, время ожидания, переподключения.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+POOL_ENGINE = 'TeddyTale.db_backends.postgresql_pool'
+
+
+def _get_config():
+    config = {
+        'MIN_SIZE': 1,
+        'IDLE_TIMEOUT': 120,
+    }
+    config.update(getattr(settings, 'DB_POOL', {}))
+    return config
+
+
+class PoolStats:
+    """Счетчики работы пулов соединений процесса"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._aliases = {}
+        self.connects = 0
+        self.reconnects = 0
+        self.idle_reaped = 0
+
+    def _alias_stats(self, alias):
+        return self._aliases.setdefault(alias, {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'max_wait_time': 0.0,
+        })
+
+    def record_checkout(self, alias, wait_time, waited):
+        with self._lock:
+            stats = self._alias_stats(alias)
+            stats['checkouts'] += 1
+            if waited:
+                stats['waits'] += 1
+                stats['wait_time'] += wait_time
+                stats['max_wait_time'] = max(stats['max_wait_time'], wait_time)
+
+    def record_event(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        from dj_db_conn_pool.core import pool_container
+
+        with self._lock:
+            result = {
+                'connects': self.connects,
+                'reconnects': self.reconnects,
+                'idle_reaped': self.idle_reaped,
+                'pools': {alias: dict(stats)
+                          for alias, stats in self._aliases.items()},
+            }
+        for alias, pool in list(pool_container.items()):
+            pool_info = result['pools'].setdefault(alias, {})
+            pool_info.update({
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': pool.overflow(),
+            })
+        return result
+
+
+pool_stats = PoolStats()
+
+
+# --------------------
+# События пула SQLAlchemy (для всех QueuePool процесса)
+# --------------------
+
+@event.listens_for(QueuePool, 'connect')
+def _on_connect(dbapi_connection, connection_record):
+    pool_stats.record_event('connects')
+
+
+@event.listens_for(QueuePool, 'checkin')
+def _on_checkin(dbapi_connection, connection_record):
+    connection_record.info['last_checkin'] = time.monotonic()
+
+
+@event.listens_for(QueuePool, 'checkout')
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    """
+    Проверка соединения при выдаче из пула.
+    DisconnectionError заставляет SQLAlchemy открыть новое соединение.
+    """
+    last_checkin = connection_record.info.get('last_checkin')
+    if last_checkin is None:
+        # Только что открытое соединение проверять не нужно
+        return
+
+    if time.monotonic() - last_checkin > _get_config()['IDLE_TIMEOUT']:
+        pool_stats.record_event('idle_reaped')
+        raise exc.DisconnectionError("Соединение простаивало дольше IDLE_TIMEOUT")
+
+    try:
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+        if not getattr(dbapi_connection, 'autocommit', True):
+            # Не оставляем открытую транзакцию после проверки
+            dbapi_connection.rollback()
+    except Exception as e:
+        pool_stats.record_event('reconnects')
+        raise exc.DisconnectionError(f"Проверка соединения не удалась: {e}")
+
+
+# --------------------
+# Жизненный цикл пулов в воркере gunicorn
+# --------------------
+
+def pooled_aliases():
+    """Алиасы БД, использующие пул соединений"""
+    return [alias for alias, db in settings.DATABASES.items()
+            if db.get('ENGINE') == POOL_ENGINE]
+
+
+def reset_pools_after_fork():
+    """
+    Закрывает пулы, унаследованные от мастер-процесса gunicorn:
+    сокеты родителя нельзя использовать в дочернем процессе.
+    """
+    from dj_db_conn_pool.core import pool_container
+
+    with pool_container.lock:
+        for pool in pool_container.values():
+            pool.dispose()
+        pool_container.clear()
+
+
+def warm_up_pools():
+    """Открывает MIN_SIZE соединений в каждом пуле и возвращает их в пул"""
+    from dj_db_conn_pool.core import pool_container
+    from django.db import connections
+
+    min_size = _get_config()['MIN_SIZE']
+    for alias in pooled_aliases():
+        started = time.perf_counter()
+        extra = []
+        try:
+            # Первое соединение создает сам пул
+            connections[alias].ensure_connection()
+            pool = pool_container.get(alias)
+            for _ in range(min_size - 1):
+                extra.append(pool.connect())
+            logger.info(f"Пул '{alias}' прогрет: {min_size} соединений за "
+                        f"{time.perf_counter() - started:.2f} с")
+        except Exception as e:
+            logger.warning(f"Не удалось прогреть пул '{alias}': {e}")
+        finally:
+            for conn in extra:
+                conn.close()
+            connections[alias].close()
+
+
+def start_warm_up():
+    """Прогревает пулы в фоне, не задерживая готовность воркера"""
+    if not pooled_aliases():
+        return
+    thread = threading.Thread(target=warm_up_pools, name='db-pool-warmup',
+                              daemon=True)
+    thread.start()
+
+
+def get_pool_stats():
+    """Статистика пулов соединений текущего процесса"""
+    return pool_stats.snapshot()
@@ -0,0 +1,173 @@
+# TeddyTale/db_router.py
+"""
+Маршрутизация запросов между основной БД и репликой для чтения.
+
+- Чтения лендинга (обернутые в use_replica) идут в алиас 'replica',
+  если он настроен (DATABASE_REPLICA_URL);
+- все записи и остальные чтения (админка, сессии) идут в 'default';
+- после записи контента лендинга (модели из CONTENT_MODELS) все чтения
+  этого запроса идут в 'default', а ответ получает cookie, закрепляющую
+  браузер за основной БД на REPLICA_LAG секунд (чтение своих записей);
+- после изменения контента все воркеры читают из основной БД еще
+  REPLICA_LAG секунд, пока реплика догоняет. Время последней записи
+  хранится в файле-метке, общем для воркеров.
+  Служебные записи (ChangeLog, ImageJob, MediaBlob, сессии) реплику
+  не отключают: лендинг их не читает.
+
+Локальная проверка на двух файлах SQLite:
+    DATABASE_REPLICA_URL=sqlite:///replica.sqlite3
+    python manage.py migrate && cp db.sqlite3 replica.sqlite3
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import ContextDecorator
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+
+# Время последней записи контента в этом процессе (time.time())
+_last_write_at = 0
+
+
+def _get_config():
+    config = {
+        'REPLICA_ALIAS': 'replica',
+        'REPLICA_LAG': 5,  # Секунды чтения из основной БД после записи
+        'PIN_COOKIE': 'teddy_db_primary',
+        # Модели, которые читает лендинг (app_label.ModelName)
+        'CONTENT_MODELS': (
+            'teddy_admin.PageSection',
+            'teddy_admin.SectionContent',
+            'teddy_admin.ShopItem',
+            'teddy_admin.SiteSettings',
+            'teddy_admin.PublishedPage',
+        ),
+        'WRITE_STAMP_FILE': os.path.join(settings.BASE_DIR, 'cache',
+                                         'db_write.stamp'),
+    }
+    config.update(getattr(settings, 'DB_ROUTER', {}))
+    return config
+
+
+class use_replica(ContextDecorator):
+    """
+    Разрешает читать из реплики внутри блока (или декорированной функции).
+    Без реплики или при закреплении за основной БД ничего не меняет.
+    """
+
+    def __enter__(self):
+        _state.replica_depth = getattr(_state, 'replica_depth', 0) + 1
+        return self
+
+    def __exit__(self, *exc_info):
+        _state.replica_depth -= 1
+        return False
+
+
+def begin_request(pinned=False):
+    """Сбрасывает состояние потока в начале HTTP-запроса"""
+    _state.pinned = pinned
+    _state.replica_depth = 0
+
+
+def is_pinned():
+    """Была ли в текущем запросе запись (или закрепляющая cookie)"""
+    return getattr(_state, 'pinned', False)
+
+
+def record_content_write():
+    """Запоминает время изменения контента для всех воркеров"""
+    global _last_write_at
+    _last_write_at = time.time()
+    stamp_file = _get_config()['WRITE_STAMP_FILE']
+    try:
+        os.makedirs(os.path.dirname(stamp_file), exist_ok=True)
+        with open(stamp_file, 'a'):
+            pass
+        os.utime(stamp_file)
+    except OSError as e:
+        logger.warning(f"Не удалось обновить метку записи {stamp_file}: {e}")
+
+
+def is_content_model(model):
+    """Читает ли лендинг эту модель (через реплику)"""
+    label = model._meta.label_lower
+    return any(label == name.lower()
+               for name in _get_config()['CONTENT_MODELS'])
+
+
+def _last_content_write(config):
+    try:
+        stamp_mtime = os.stat(config['WRITE_STAMP_FILE']).st_mtime
+    except OSError:
+        stamp_mtime = 0
+    return max(_last_write_at, stamp_mtime)
+
+
+def replica_is_usable():
+    """Можно ли прямо сейчас читать из реплики"""
+    config = _get_config()
+    if config['REPLICA_ALIAS'] not in settings.DATABASES:
+        return False
+    if is_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return False
+    return time.time() - _last_content_write(config) >= config['REPLICA_LAG']
+
+
+class PrimaryReplicaRouter:
+    """Роутер: записи - в основную БД, чтения лендинга - в реплику"""
+
+    def db_for_read(self, model, **hints):
+        if not getattr(_state, 'replica_depth', 0):
+            return None
+        if replica_is_usable():
+            return _get_config()['REPLICA_ALIAS']
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if is_content_model(model):
+            _state.pinned = True
+            record_content_write()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же данные, что и основная БД
+        aliases = {DEFAULT_DB_ALIAS, _get_config()['REPLICA_ALIAS']}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплика получает схему от основной БД
+        if db == _get_config()['REPLICA_ALIAS']:
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Закрепляет за основной БД запросы, в которых была запись,
+    и следующие запросы того же браузера в течение REPLICA_LAG секунд.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = _get_config()
+        begin_request(pinned=config['PIN_COOKIE'] in request.COOKIES)
+        try:
+            response = self.get_response(request)
+            if is_pinned() and config['REPLICA_ALIAS'] in settings.DATABASES:
+                response.set_cookie(config['PIN_COOKIE'], '1',
+                                    max_age=config['REPLICA_LAG'],
+                                    httponly=True, samesite='Lax')
+            return response
+        finally:
+            begin_request()
@@ -2,14 +2,28 @@
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_GET, require_http_methods
 from django.db import connection
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
 import time
 import os
 from datetime import datetime
+from landing.db_utils import get_retry_stats
+from .circuit_breaker import db_circuit_breaker, db_optional
+from .db_pool import get_pool_stats
+from .media_files import get_media_files_stats
+from .media_thumbnails import get_thumbnail_stats
+from .request_metrics import get_config as get_metrics_config
+from .request_metrics import collect, render_prometheus
 
+@db_optional  # При разомкнутом выключателе отвечаем сами, без БД
 @require_http_methods(["GET", "HEAD"])  # Разрешаем и GET, и HEAD
 def health_check(request):
     """Упрощенный health-check с поддержкой HEAD запросов"""
     try:
+        # Пока выключатель разомкнут, не ждем connect_timeout
+        if db_circuit_breaker.is_open():
+            raise ConnectionError("Выключатель БД разомкнут")
+
         # Проверка базы данных
         with connection.cursor() as cursor:
             cursor.execute('SELECT 1')
@@ -24,6 +38,11 @@ def health_check(request):
         return JsonResponse({
             'status': 'healthy',
             'database': 'connected',
+            'circuit_breaker': db_circuit_breaker.stats(),
+            'db_pool': get_pool_stats(),
+            'media_files': get_media_files_stats(),
+            'thumbnails': get_thumbnail_stats(),
+            'db_retries': get_retry_stats(),
             'timestamp': datetime.now().isoformat()
         }, status=200)
     except Exception as e:
@@ -36,9 +55,15 @@ def health_check(request):
         return JsonResponse({
             'status': 'unhealthy',
             'error': str(e),
+            'circuit_breaker': db_circuit_breaker.stats(),
+            'db_pool': get_pool_stats(),
+            'media_files': get_media_files_stats(),
+            'thumbnails': get_thumbnail_stats(),
+            'db_retries': get_retry_stats(),
             'timestamp': datetime.now().isoformat()
         }, status=503)
 
+@db_optional  # Пинг не обращается к БД
 @require_http_methods(["GET", "HEAD"])  # Разрешаем и GET, и HEAD
 def ping(request):
     """Простой пинг с поддержкой HEAD запросов"""
@@ -46,4 +71,33 @@ def ping(request):
         response = HttpResponse(status=200)
         response['X-Status'] = 'pong'
         return response
-    return JsonResponse({'status': 'pong'})
\ No newline at end of file
+    return JsonResponse({'status': 'pong'})
+
+
+def _metrics_allowed(request):
+    """Сборщик с токеном из REQUEST_METRICS['TOKEN'] или администратор сайта"""
+    from teddy_admin.permissions_custom import is_site_admin
+
+    token = get_metrics_config()['TOKEN']
+    header = request.headers.get('Authorization', '')
+    if token and constant_time_compare(header, f"Bearer {token}"):
+        return True
+    return is_site_admin(request.user)
+
+
+@db_optional  # Сборщик с токеном получает метрики и без БД
+@require_GET
+def metrics(request):
+    """Метрики запросов всех воркеров в формате Prometheus"""
+    if not _metrics_allowed(request):
+        response = HttpResponse('Unauthorized', status=401,
+                                content_type='text/plain; charset=utf-8')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+
+    series, workers = collect()
+    response = HttpResponse(render_prometheus(series, workers),
+                            content_type='text/plain; version=0.0.4; '
+                                         'charset=utf-8')
+    patch_cache_control(response, no_store=True)
+    return response
@@ -0,0 +1,199 @@
+# TeddyTale/media_files.py
+"""
+Реестр медиа-файлов для отдачи без django.views.static.serve.
+
+Для каждого файла из MEDIA_ROOT хранятся метаданные (размер, mtime,
+Content-Type, ETag по sha256). Небольшие часто запрашиваемые
+изображения держатся в памяти процесса (LRU, ограниченный
+MEDIA_FILES['MAX_BYTES']), остальные отдаются через FileResponse,
+который gunicorn передает в sendfile().
+
+Новые файлы регистрируются сразу после загрузки (register), остальные -
+при первом запросе. Запись проверяется по (mtime, size) на каждом
+запросе, поэтому замена файла на диске сразу видна.
+"""
+import logging
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from django.utils.cache import quote_etag
+
+from .media_storage import digest_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _get_config():
+    config = {
+        'MAX_FILES': 4096,  # Записей с метаданными
+        'MAX_BYTES': 16 * 1024 * 1024,  # Байт содержимого в памяти
+        'MAX_FILE_SIZE': 256 * 1024,  # Файлы крупнее в память не попадают
+    }
+    config.update(getattr(settings, 'MEDIA_FILES', {}))
+    return config
+
+
+class MediaFile:
+    """Метаданные файла и (для небольших файлов) его содержимое"""
+
+    def __init__(self, name, full_path, stat, etag):
+        self.name = name
+        self.full_path = full_path
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.last_modified = int(stat.st_mtime)
+        self.content_type = (mimetypes.guess_type(full_path)[0]
+                             or 'application/octet-stream')
+        self.etag = etag
+        self.data = None
+
+    def is_current(self, stat):
+        return (self.mtime_ns, self.size) == (stat.st_mtime_ns, stat.st_size)
+
+
+class MediaFileRegistry:
+    """Реестр файлов с LRU содержимого (один экземпляр на процесс)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = OrderedDict()
+        self._cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.registered = 0
+
+    def _stat(self, name):
+        try:
+            full_path = safe_join(settings.MEDIA_ROOT, name)
+            stat = os.stat(full_path)
+        except (SuspiciousFileOperation, OSError, ValueError):
+            return None, None
+        if not os.path.isfile(full_path):
+            return None, None
+        return full_path, stat
+
+    def register(self, name):
+        """
+        Добавляет файл в реестр (после загрузки или создания варианта).
+        Возвращает MediaFile или None, если файла нет.
+        """
+        full_path, stat = self._stat(name)
+        if stat is None:
+            self._forget(name)
+            return None
+
+        digest = digest_cache.get(name)
+        etag = (quote_etag(digest) if digest
+                else f'W/"{stat.st_mtime_ns:x}-{stat.st_size:x}"')
+        media_file = MediaFile(name, full_path, stat, etag)
+
+        config = _get_config()
+        with self._lock:
+            self._drop(name)
+            self._files[name] = media_file
+            self.registered += 1
+            while len(self._files) > config['MAX_FILES']:
+                self._drop(next(iter(self._files)))
+        return media_file
+
+    def get(self, name):
+        """Актуальная запись файла или None"""
+        full_path, stat = self._stat(name)
+        if stat is None:
+            self._forget(name)
+            return None
+
+        with self._lock:
+            media_file = self._files.get(name)
+            if media_file is not None and media_file.is_current(stat):
+                self._files.move_to_end(name)
+                return media_file
+        return self.register(name)
+
+    def read(self, media_file):
+        """
+        Содержимое небольшого файла из памяти (с загрузкой при промахе)
+        или None - тогда файл отдается с диска.
+        """
+        config = _get_config()
+        if media_file.size > config['MAX_FILE_SIZE']:
+            return None
+
+        with self._lock:
+            if media_file.data is not None:
+                self.hits += 1
+                return media_file.data
+            self.misses += 1
+
+        try:
+            with open(media_file.full_path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            logger.warning(f"Не удалось прочитать медиа-файл "
+                           f"{media_file.name}: {e}")
+            return None
+        if len(data) != media_file.size:
+            # Файл изменился между stat и чтением
+            return None
+
+        with self._lock:
+            if self._files.get(media_file.name) is media_file:
+                if media_file.data is None:
+                    media_file.data = data
+                    self._cached_bytes += len(data)
+                self._evict(config)
+        return data
+
+    def _evict(self, config):
+        for name, media_file in list(self._files.items()):
+            if self._cached_bytes <= config['MAX_BYTES']:
+                break
+            if media_file.data is not None:
+                self._cached_bytes -= len(media_file.data)
+                media_file.data = None
+                self.evictions += 1
+
+    def _drop(self, name):
+        media_file = self._files.pop(name, None)
+        if media_file is not None and media_file.data is not None:
+            self._cached_bytes -= len(media_file.data)
+
+    def _forget(self, name):
+        with self._lock:
+            self._drop(name)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'files': len(self._files),
+                'cached_files': sum(media_file.data is not None
+                                    for media_file in self._files.values()),
+                'cached_bytes': self._cached_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'registered': self.registered,
+            }
+
+
+# Глобальный экземпляр (один на процесс)
+media_files = MediaFileRegistry()
+
+
+def register_media_file(name):
+    """Регистрирует новый файл; ошибки не мешают загрузке"""
+    try:
+        media_files.register(name)
+    except Exception as e:
+        logger.warning(f"Не удалось зарегистрировать медиа-файл {name}: {e}")
+
+
+def get_media_files_stats():
+    """Статистика реестра медиа текущего процесса"""
+    return media_files.stats()
@@ -0,0 +1,136 @@
+# TeddyTale/media_storage.py
+"""
+URL медиа-файлов с хешем содержимого.
+
+Файл из MEDIA_ROOT отдается по адресу /media/h/<digest>/<путь>, где
+digest - начало sha256 содержимого. При изменении файла меняется и URL,
+поэтому ответ кэшируется браузером и CDN навсегда
+(Cache-Control: immutable) и никогда не перепроверяется.
+
+Загрузки после дедупликации (teddy_admin/media_store.py) уже названы
+по sha256 - для них digest берется из имени без чтения файла. Для
+остальных файлов (варианты, старые загрузки) хеш считается один раз
+и кэшируется в памяти процесса по (mtime, size).
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.utils._os import safe_join
+from django.utils.encoding import filepath_to_uri
+
+logger = logging.getLogger(__name__)
+
+_SHA256_NAME = re.compile(r'^[0-9a-f]{64}$')
+
+
+def get_config():
+    config = {
+        'ENABLED': True,
+        'PREFIX': 'h',  # /media/<PREFIX>/<digest>/<путь>
+        'DIGEST_LENGTH': 16,  # Символов sha256 в URL
+        'MAX_AGE': 31536000,  # Секунды (год)
+        # Копия AVIF/WebP еще создается фоновой задачей: исходник вместо
+        # нее кэшируется ненадолго, а не на год
+        'PENDING_MAX_AGE': 60,  # Секунды
+        # Сколько секунд после изменения исходника ждать его копии
+        'TRANSCODE_WAIT': 900,
+        'MAX_ENTRIES': 2048,  # Хешей файлов в памяти процесса
+    }
+    config.update(getattr(settings, 'MEDIA_HASHING', {}))
+    return config
+
+
+def is_content_addressed(name):
+    """Имя файла - его sha256 (загрузка после дедупликации)"""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return bool(_SHA256_NAME.match(stem))
+
+
+class DigestCache:
+    """Хеши содержимого файлов по (путь, mtime, size) с вытеснением LRU"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name):
+        """
+        Digest файла name (путь относительно MEDIA_ROOT) или None,
+        если файла нет или путь выходит за MEDIA_ROOT.
+        """
+        config = get_config()
+        length = config['DIGEST_LENGTH']
+        try:
+            full_path = safe_join(settings.MEDIA_ROOT, name)
+            stat = os.stat(full_path)
+        except (SuspiciousFileOperation, OSError, ValueError):
+            return None
+        if not os.path.isfile(full_path):
+            return None
+
+        if is_content_addressed(name):
+            return os.path.splitext(os.path.basename(name))[0][:length]
+
+        key = (name, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            digest = self._entries.get(key)
+            if digest is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return digest[:length]
+            self.misses += 1
+
+        sha256 = hashlib.sha256()
+        try:
+            with open(full_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(64 * 1024), b''):
+                    sha256.update(chunk)
+        except OSError as e:
+            logger.warning(f"Не удалось прочитать медиа-файл {name}: {e}")
+            return None
+        digest = sha256.hexdigest()
+
+        with self._lock:
+            self._entries[key] = digest
+            while len(self._entries) > config['MAX_ENTRIES']:
+                self._entries.popitem(last=False)
+        return digest[:length]
+
+
+# Глобальный экземпляр (один на процесс)
+digest_cache = DigestCache()
+
+
+def hashed_media_url(name):
+    """
+    URL файла с хешем содержимого. Если файла нет (или хеширование
+    выключено), возвращается обычный MEDIA_URL + name.
+    """
+    config = get_config()
+    if config['ENABLED'] and name:
+        digest = digest_cache.get(name)
+        if digest is not None:
+            return (f"{settings.MEDIA_URL}{config['PREFIX']}/{digest}/"
+                    f"{filepath_to_uri(name)}")
+    return f"{settings.MEDIA_URL}{filepath_to_uri(name)}"
+
+
+class HashedMediaStorage(FileSystemStorage):
+    """
+    Хранилище медиа по умолчанию: FieldFile.url (item.image.url в
+    шаблонах и JSON) возвращает URL с хешем содержимого.
+    """
+
+    def url(self, name):
+        if not name or not get_config()['ENABLED']:
+            return super().url(name)
+        return hashed_media_url(name.replace('\\', '/'))
@@ -0,0 +1,184 @@
+# TeddyTale/media_thumbnails.py
+"""
+Миниатюры медиа-файлов для админки и админ-панели.
+
+Адрес: /media/thumb/<w>x<h>/h/<digest>/<путь>. Миниатюра вписывается
+в прямоугольник w x h (без обрезки и увеличения), создается Pillow один
+раз и хранится на диске в MEDIA_ROOT/<DIR> под именем из хеша исходника,
+поэтому отдается с Cache-Control: immutable.
+
+Общий размер миниатюр ограничен THUMBNAILS['MAX_BYTES']: при
+превышении удаляются давно не запрошенные (время последнего запроса
+хранится в atime файла, mtime не меняется).
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.utils.encoding import filepath_to_uri
+from PIL import Image, ImageOps
+
+from .media_storage import get_config as get_hashing_config
+from .media_storage import digest_cache, hashed_media_url
+
+logger = logging.getLogger(__name__)
+
+
+def get_config():
+    config = {
+        'ENABLED': True,
+        # Разрешенные размеры (произвольные размеры не принимаются)
+        'SIZES': ((100, 100), (400, 300)),
+        'QUALITY': 80,
+        'DIR': 'thumbs',  # Поддиректория MEDIA_ROOT
+        'MAX_BYTES': 64 * 1024 * 1024,  # Общий размер миниатюр на диске
+        # Как часто (секунды) обновлять время последнего запроса файла
+        'TOUCH_INTERVAL': 600,
+    }
+    config.update(getattr(settings, 'THUMBNAILS', {}))
+    return config
+
+
+def is_allowed_size(width, height):
+    return (width, height) in {tuple(size) for size in get_config()['SIZES']}
+
+
+def thumbnail_url(name, width, height):
+    """
+    URL миниатюры файла name (путь относительно MEDIA_ROOT).
+    Если миниатюры выключены или файла нет - обычный URL файла.
+    """
+    config = get_config()
+    digest = digest_cache.get(name) if name else None
+    if (not config['ENABLED'] or digest is None
+            or not is_allowed_size(width, height)):
+        return hashed_media_url(name)
+    prefix = get_hashing_config()['PREFIX']
+    return (f"{settings.MEDIA_URL}thumb/{width}x{height}/{prefix}/{digest}/"
+            f"{filepath_to_uri(name)}")
+
+
+class ThumbnailCache:
+    """Миниатюры на диске с вытеснением LRU (один экземпляр на процесс)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.generated = 0
+        self.evictions = 0
+
+    def path(self, digest, width, height):
+        """Путь миниатюры относительно MEDIA_ROOT"""
+        return f"{get_config()['DIR']}/{digest}-{width}x{height}.webp"
+
+    def get(self, name, digest, width, height):
+        """
+        Путь миниатюры (относительно MEDIA_ROOT), при необходимости
+        создает ее. None, если исходник не удалось открыть.
+        """
+        config = get_config()
+        path = self.path(digest, width, height)
+        full_path = os.path.join(settings.MEDIA_ROOT, path)
+        try:
+            stat = os.stat(full_path)
+        except FileNotFoundError:
+            stat = None
+
+        if stat is not None:
+            with self._lock:
+                self.hits += 1
+            now = time.time()
+            if now - stat.st_atime > config['TOUCH_INTERVAL']:
+                # Отмечаем запрос, не меняя mtime (по нему проверяется кэш)
+                os.utime(full_path, ns=(time.time_ns(), stat.st_mtime_ns))
+            return path
+
+        if not self._generate(name, full_path, width, height, config):
+            return None
+        with self._lock:
+            self.generated += 1
+        self.evict(keep=full_path)
+        return path
+
+    def _generate(self, name, full_path, width, height, config):
+        source_path = os.path.join(settings.MEDIA_ROOT, name)
+        try:
+            with Image.open(source_path) as image:
+                # JPEG сразу декодируется в уменьшенном виде
+                image.draft('RGB', (width, height))
+                image = ImageOps.exif_transpose(image)
+                if image.mode not in ('RGB', 'RGBA'):
+                    has_alpha = ('A' in image.getbands()
+                                 or 'transparency' in image.info)
+                    image = image.convert('RGBA' if has_alpha else 'RGB')
+                image.thumbnail((width, height), Image.LANCZOS)
+
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                # Пишем рядом и переименовываем: недописанный файл не отдается
+                tmp_path = f"{full_path}.{threading.get_ident()}.tmp"
+                image.save(tmp_path, 'WEBP', quality=config['QUALITY'])
+                os.replace(tmp_path, full_path)
+        except Exception as e:
+            logger.error(f"Ошибка создания миниатюры {name} "
+                         f"{width}x{height}: {e}")
+            return False
+        logger.info(f"Миниатюра {name} {width}x{height} создана")
+        return True
+
+    def evict(self, keep=None):
+        """
+        Удаляет давно не запрошенные миниатюры сверх MAX_BYTES.
+        keep - только что созданный файл, его не трогаем.
+        """
+        config = get_config()
+        directory = os.path.join(settings.MEDIA_ROOT, config['DIR'])
+        files = []
+        total = 0
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not entry.is_file() or not entry.name.endswith('.webp'):
+                        continue
+                    stat = entry.stat()
+                    total += stat.st_size
+                    if entry.path != keep:
+                        files.append((stat.st_atime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            return 0
+
+        removed = 0
+        if total > config['MAX_BYTES']:
+            # Освобождаем с запасом, чтобы не чистить после каждой миниатюры
+            target = config['MAX_BYTES'] * 0.9
+            for _, size, file_path in sorted(files):
+                if total <= target:
+                    break
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            with self._lock:
+                self.evictions += removed
+            logger.info(f"Удалено миниатюр: {removed}")
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'generated': self.generated,
+                'evictions': self.evictions,
+            }
+
+
+# Глобальный экземпляр (один на процесс)
+thumbnail_cache = ThumbnailCache()
+
+
+def get_thumbnail_stats():
+    """Статистика миниатюр текущего процесса"""
+    return thumbnail_cache.stats()
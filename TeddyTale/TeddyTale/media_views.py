@@ -0,0 +1,285 @@
+# TeddyTale/media_views.py
+"""
+Отдача медиа-файлов.
+
+/media/h/<digest>/<путь> - файл с хешем содержимого в URL, отдается
+с Cache-Control: public, max-age=<год>, immutable. Если содержимое
+уже другое, запрос перенаправляется на актуальный URL.
+
+/media/<путь> - старые адреса (закладки, сохраненные страницы,
+поисковые системы) перенаправляются на URL с хешем.
+
+/media/thumb/<w>x<h>/h/<digest>/<путь> - миниатюра для админки
+(TeddyTale/media_thumbnails.py), тоже с immutable.
+
+Поддерживаются условные запросы (ETag / Last-Modified) и Range с одним
+диапазоном. Если у изображения есть копия в AVIF или WebP и клиент
+указал этот формат в Accept, отдается копия (с Vary: Accept). Копии
+создает фоновая задача: пока нужной клиенту копии еще нет (первые
+TRANSCODE_WAIT секунд после загрузки), ответ кэшируется на
+PENDING_MAX_AGE секунд без immutable, иначе браузеры и CDN на год
+запомнили бы исходник.
+Небольшие файлы берутся из памяти (TeddyTale/media_files.py), крупные
+отдаются через FileResponse (sendfile в gunicorn).
+
+БД представления не используют (@db_optional): картинки отдаются и при
+разомкнутом выключателе, вместе с лендингом из последней удачной версии.
+"""
+import logging
+import os
+import re
+import time
+
+from django.conf import settings
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponsePermanentRedirect, HttpResponseRedirect,
+                         StreamingHttpResponse)
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_http_methods
+
+from teddy_admin.image_transcodes import (FORMATS, SOURCE_EXTENSIONS,
+                                          get_transcodes, supported_formats)
+
+from .circuit_breaker import db_optional
+from .media_files import media_files
+from .media_storage import get_config as get_hashing_config
+from .media_storage import digest_cache, hashed_media_url, is_content_addressed
+from .media_thumbnails import get_config as get_thumbnails_config
+from .media_thumbnails import is_allowed_size, thumbnail_cache, thumbnail_url
+
+logger = logging.getLogger(__name__)
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+_CHUNK_SIZE = 64 * 1024
+
+
+@db_optional
+@require_http_methods(["GET", "HEAD"])
+def serve_media(request, path):
+    config = get_hashing_config()
+    if not config['ENABLED']:
+        return _serve_file(request, path, 'no-cache')
+
+    prefix = f"{config['PREFIX']}/"
+    if path.startswith(prefix):
+        try:
+            digest, name = path[len(prefix):].split('/', 1)
+        except ValueError:
+            raise Http404("Неверный адрес медиа-файла")
+
+        current = digest_cache.get(name)
+        if current is None:
+            raise Http404("Файл не найден")
+        if current != digest:
+            # Файл по этому пути изменился - отдаем новый адрес
+            return HttpResponseRedirect(hashed_media_url(name))
+
+        # Содержимое по этому URL не меняется никогда
+        cache_control = f"public, max-age={config['MAX_AGE']}, immutable"
+        pending_cache_control = f"public, max-age={config['PENDING_MAX_AGE']}"
+        return _serve_file(request, name, cache_control,
+                           pending_cache_control=pending_cache_control)
+
+    if digest_cache.get(path) is None:
+        raise Http404("Файл не найден")
+
+    # Файл с именем-хешем не изменится, для остальных адрес может стать другим
+    redirect_class = (HttpResponsePermanentRedirect
+                      if is_content_addressed(path) else HttpResponseRedirect)
+    return redirect_class(hashed_media_url(path))
+
+
+@db_optional
+@require_http_methods(["GET", "HEAD"])
+def serve_thumbnail(request, width, height, path):
+    """Миниатюра /media/thumb/<w>x<h>/h/<digest>/<путь>"""
+    if (not get_thumbnails_config()['ENABLED']
+            or not is_allowed_size(width, height)):
+        raise Http404("Размер миниатюры не поддерживается")
+
+    config = get_hashing_config()
+    prefix = f"{config['PREFIX']}/"
+    digest, name = None, path
+    if path.startswith(prefix):
+        try:
+            digest, name = path[len(prefix):].split('/', 1)
+        except ValueError:
+            raise Http404("Неверный адрес миниатюры")
+
+    current = digest_cache.get(name)
+    if current is None:
+        raise Http404("Файл не найден")
+    if current != digest:
+        # Адрес без хеша или исходник изменился
+        return HttpResponseRedirect(thumbnail_url(name, width, height))
+
+    thumbnail = thumbnail_cache.get(name, digest, width, height)
+    if thumbnail is None:
+        raise Http404("Не удалось создать миниатюру")
+    cache_control = f"public, max-age={config['MAX_AGE']}, immutable"
+    return _serve_file(request, thumbnail, cache_control, negotiate=False)
+
+
+def _accepted_types(request):
+    """MIME-типы, явно перечисленные в Accept (без */* и q=0)"""
+    accepted = set()
+    for item in request.META.get('HTTP_ACCEPT', '').split(','):
+        media_type, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type and quality > 0:
+            accepted.add(media_type.lower())
+    return accepted
+
+
+def _transcode_pending(name):
+    """Может ли недостающая копия name еще появиться (исходник свежий)"""
+    try:
+        modified = os.path.getmtime(os.path.join(settings.MEDIA_ROOT, name))
+    except OSError:
+        return False
+    return time.time() - modified < get_hashing_config()['TRANSCODE_WAIT']
+
+
+def _negotiate(request, name):
+    """
+    Файл для ответа: копия в AVIF/WebP, если клиент явно принимает
+    этот формат (teddy_admin/image_transcodes.py), иначе исходник.
+    Возвращает (путь, зависит ли ответ от Accept, ждем ли копию в
+    более предпочтительном формате).
+    """
+    if not name.lower().endswith(SOURCE_EXTENSIONS) or not supported_formats():
+        return name, False, False
+    accepted = _accepted_types(request)
+    extension = os.path.splitext(name)[1].lower().lstrip('.')
+    transcodes = dict(get_transcodes(name))
+    missing = False
+    for image_format in supported_formats():
+        file_extension, mime_type = FORMATS[image_format]
+        if mime_type not in accepted or file_extension == extension:
+            # Копия в формате исходника не создается
+            continue
+        if mime_type in transcodes:
+            return (transcodes[mime_type], True,
+                    missing and _transcode_pending(name))
+        missing = True
+    return name, True, missing and _transcode_pending(name)
+
+
+def _serve_file(request, name, cache_control, negotiate=True,
+                pending_cache_control=None):
+    """
+    pending_cache_control - Cache-Control, пока копия в формате, который
+    клиент предпочитает, еще создается.
+    """
+    served_name, varies, pending = (_negotiate(request, name) if negotiate
+                                    else (name, False, False))
+    if pending and pending_cache_control:
+        cache_control = pending_cache_control
+    media_file = media_files.get(served_name)
+    if media_file is None:
+        raise Http404("Файл не найден")
+
+    response = get_conditional_response(
+        request, etag=media_file.etag, last_modified=media_file.last_modified)
+    if response is None:
+        byte_range = _requested_range(request, media_file)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{media_file.size}"
+        else:
+            response = _content_response(request, media_file, byte_range)
+
+    response['ETag'] = media_file.etag
+    response['Last-Modified'] = http_date(media_file.last_modified)
+    response['Cache-Control'] = cache_control
+    response['Accept-Ranges'] = 'bytes'
+    if varies:
+        # Браузеры и CDN должны хранить ответ отдельно для каждого Accept
+        patch_vary_headers(response, ('Accept',))
+    return response
+
+
+def _requested_range(request, media_file):
+    """
+    (start, end) включительно, None - отдать файл целиком,
+    False - диапазон вне файла (416). Неверный диапазон (bytes=5-3)
+    игнорируется, как требует RFC 9110, - файл отдается целиком.
+    """
+    header = request.META.get('HTTP_RANGE', '').strip()
+    if not header:
+        return None
+
+    if_range = request.META.get('HTTP_IF_RANGE', '').strip()
+    if if_range and if_range not in (media_file.etag,
+                                     http_date(media_file.last_modified)):
+        # Файл изменился с момента частичной загрузки - отдаем целиком
+        return None
+
+    match = _RANGE.match(header)
+    if match is None or match.groups() == ('', ''):
+        # Несколько диапазонов не поддерживаем - отдаем целиком
+        return None
+
+    size = media_file.size
+    start, end = match.groups()
+    if start:
+        start = int(start)
+        if end and int(end) < start:
+            return None
+        end = min(int(end), size - 1) if end else size - 1
+    else:
+        # bytes=-N - последние N байт
+        suffix = int(end)
+        if suffix == 0:
+            return False
+        start, end = max(0, size - suffix), size - 1
+
+    if start >= size:
+        return False
+    return start, end
+
+
+def _content_response(request, media_file, byte_range):
+    start, end = byte_range or (0, media_file.size - 1)
+    length = end - start + 1 if media_file.size else 0
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=media_file.content_type)
+    else:
+        data = media_files.read(media_file)
+        if data is not None:
+            response = HttpResponse(data[start:end + 1],
+                                    content_type=media_file.content_type)
+        elif byte_range is None:
+            # Весь файл - через file_wrapper сервера (sendfile)
+            response = FileResponse(open(media_file.full_path, 'rb'),
+                                    content_type=media_file.content_type)
+        else:
+            response = StreamingHttpResponse(
+                _read_range(media_file.full_path, start, length),
+                content_type=media_file.content_type)
+
+    response['Content-Length'] = str(length)
+    if byte_range is not None:
+        response.status_code = 206
+        response['Content-Range'] = f"bytes {start}-{end}/{media_file.size}"
+    return response
+
+
+def _read_range(full_path, start, length):
+    with open(full_path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
@@ -2,89 +2,105 @@
 """
 Middleware для обработки ошибок соединения с Supabase
 """
-import time
 import logging
-from django.db import connection, connections, OperationalError, InterfaceError
-from django.http import HttpResponseServerError
+from contextlib import ExitStack
+from django.db import connections, OperationalError, InterfaceError
+
+from .circuit_breaker import db_circuit_breaker
 
 logger = logging.getLogger(__name__)
 
+class _QueryTracker:
+    """Обертка execute: сообщает выключателю об ошибках запросов к БД"""
+
+    def __init__(self):
+        self.succeeded = False
+        self.failed = False
+
+    def __call__(self, execute, sql, params, many, context):
+        try:
+            result = execute(sql, params, many, context)
+        except (OperationalError, InterfaceError):
+            if not self.failed:
+                self.failed = True
+                db_circuit_breaker.record_failure()
+            raise
+        self.succeeded = True
+        return result
+
+
 class SupabaseConnectionMiddleware:
     """
-    Middleware для обработки проблем с подключением к Supabase
+    Middleware для обработки проблем с подключением к Supabase.
+
+    Соединение не проверяется перед каждым запросом: пока выключатель
+    замкнут, устаревшие соединения отбрасывает пул (TeddyTale/db_pool.py,
+    проверка при выдаче и IDLE_TIMEOUT), без пула - сам Django
+    (CONN_HEALTH_CHECKS). Ошибки БД учитываются выключателем, а пока он
+    разомкнут, запросы к представлениям, которым нужна БД, сразу получают
+    страницу 503 вместо ожидания connect_timeout.
     """
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        try:
-            # Проверяем и восстанавливаем соединение если нужно
-            self._ensure_db_connection()
-
-            # Выполняем запрос
+        tracker = request.db_query_tracker = _QueryTracker()
+        with ExitStack() as stack:
+            # Учитываем ошибки запросов, даже если представление их перехватит
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(tracker))
             response = self.get_response(request)
 
-            return response
+        if tracker.succeeded and not tracker.failed:
+            db_circuit_breaker.record_success()
+        return response
+
+    def process_exception(self, request, exception):
+        """Ошибка БД в представлении: учитываем ее и отдаем страницу 503"""
+        if not isinstance(exception, (OperationalError, InterfaceError)):
+            return None
+
+        logger.error(f"Ошибка БД Supabase: {exception}")
+        tracker = getattr(request, 'db_query_tracker', None)
+        if tracker is None or not tracker.failed:
+            db_circuit_breaker.record_failure()
+        self._close_broken_connections()
+        return self._get_error_response(request)
 
-        except (OperationalError, InterfaceError) as e:
-            logger.error(f"Ошибка БД Supabase: {e}")
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Пропускает запрос к БД только если это разрешает выключатель"""
+        if getattr(view_func, 'db_optional', False):
+            # Представление умеет отвечать без БД (кэш, устаревший контент)
+            return None
 
-            # Пытаемся восстановить соединение и повторить запрос
+        allowed, is_trial = db_circuit_breaker.allow_request()
+        if not allowed:
+            return self._get_error_response(request)
+
+        if is_trial:
+            # Пробный запрос в полуоткрытом состоянии: проверяем соединение
             try:
-                self._reconnect_all()
-                response = self.get_response(request)
-                return response
-            except Exception as retry_error:
-                logger.error(f"Не удалось восстановить соединение: {retry_error}")
-                # Возвращаем страницу с ошибкой вместо падения
+                connections['default'].ensure_connection()
+            except (OperationalError, InterfaceError) as e:
+                logger.warning(f"Пробное подключение к БД не удалось: {e}")
+                db_circuit_breaker.record_failure()
+                self._close_broken_connections()
                 return self._get_error_response(request)
+            db_circuit_breaker.record_success()
+        return None
 
-    def _ensure_db_connection(self):
-        """Проверяет и восстанавливает соединение с БД перед запросом"""
-        try:
-            for conn_name in connections:
-                conn = connections[conn_name]
-                # Проверяем, есть ли соединение и активно ли оно
-                if conn.connection is None:
-                    logger.debug(f"Соединение {conn_name} отсутствует, создаем новое")
-                    conn.connect()
-                elif hasattr(conn, 'is_usable') and not conn.is_usable():
-                    logger.debug(f"Соединение {conn_name} неактивно, переподключаемся")
-                    conn.close()
-                    conn.connect()
-        except Exception as e:
-            logger.warning(f"Ошибка при проверке соединения: {e}")
-            # Не падаем, пытаемся продолжить
-
-    def _reconnect_all(self):
-        """Переподключает все соединения к БД"""
-        try:
-            for conn_name in connections:
-                conn = connections[conn_name]
+    def _close_broken_connections(self):
+        """Закрывает соединения, чтобы следующий запрос открыл новые"""
+        for conn in connections.all(initialized_only=True):
+            try:
                 conn.close()
-                conn.connect()
-            logger.info("Все соединения с БД переподключены")
-        except Exception as e:
-            logger.error(f"Ошибка при переподключении соединений: {e}")
-            raise
+            except Exception as e:
+                logger.debug(f"Ошибка при закрытии соединения {conn.alias}: {e}")
 
     def _get_error_response(self, request):
-        """Возвращает простую HTML страницу с ошибкой"""
-        html = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Временные проблемы</title>
-            <style>
-                body { font-family: Arial, sans-serif; text-align: center; padding: 50px; }
-                .error { color: #d32f2f; }
-            </style>
-        </head>
-        <body>
-            <h1 class="error">Временные проблемы с базой данных</h1>
-            <p>Пожалуйста, попробуйте обновить страницу через несколько секунд.</p>
-            <p>Если проблема сохраняется, попробуйте позже.</p>
-        </body>
-        </html>
-        """
-        return HttpResponseServerError(html)
\ No newline at end of file
+        """Возвращает страницу 503 (без обращения к БД)"""
+        from landing.views import service_unavailable_view
+
+        response = service_unavailable_view(request)
+        response['Retry-After'] = '30'
+        return response
@@ -0,0 +1,315 @@
+# TeddyTale/request_metrics.py
+"""
+Метрики запросов: время ответа, число и время запросов к БД и размер
+ответа по каждому представлению (landing:index, media, health_check...).
+
+RequestMetricsMiddleware пишет наблюдения в гистограммы процесса.
+Каждый воркер gunicorn не реже раза в FLUSH_INTERVAL секунд сохраняет
+свои гистограммы в файл <DIR>/<pid>.json, а /metrics складывает файлы
+всех воркеров и отдает сумму в текстовом формате Prometheus.
+
+Данные завершившегося воркера переносятся в <DIR>/archive.json
+(хук child_exit в gunicorn.conf.py), поэтому счетчики не уменьшаются.
+При запуске сервера директория очищается (хук on_starting).
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FILE = 'archive.json'
+# Остальные методы учитываются как OTHER (метка не должна расти без предела)
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+# Имя метрики -> (описание, ключ границ в настройках)
+METRICS = {
+    'teddytale_request_duration_seconds': (
+        'Время обработки запроса', 'DURATION_BUCKETS'),
+    'teddytale_request_db_queries': (
+        'Число запросов к БД за запрос', 'QUERY_BUCKETS'),
+    'teddytale_request_db_duration_seconds': (
+        'Время запросов к БД за запрос', 'DURATION_BUCKETS'),
+    'teddytale_response_size_bytes': (
+        'Размер ответа', 'SIZE_BUCKETS'),
+}
+
+
+def get_config():
+    config = {
+        'ENABLED': True,
+        'DIR': os.path.join(settings.BASE_DIR, 'cache', 'metrics'),
+        'FLUSH_INTERVAL': 10,  # Секунды
+        'TOKEN': '',  # Authorization: Bearer <токен> для сборщика
+        'DURATION_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                             1, 2.5, 5, 10),
+        'QUERY_BUCKETS': (0, 1, 2, 5, 10, 20, 50, 100),
+        'SIZE_BUCKETS': (1024, 10 * 1024, 100 * 1024, 1024 * 1024,
+                         10 * 1024 * 1024),
+    }
+    config.update(getattr(settings, 'REQUEST_METRICS', {}))
+    return config
+
+
+class DBCostTracker:
+    """Обертка execute: число и суммарное время запросов к БД"""
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.queries += 1
+
+
+class RequestMetrics:
+    """Гистограммы процесса (один экземпляр на процесс)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (view, method, status) -> {метрика: [счетчики корзин..., sum, count]}
+        self._series = {}
+        self._last_flush = time.monotonic()
+
+    def observe(self, labels, values):
+        """values - {метрика: значение}; метрики без значения пропускаются"""
+        config = get_config()
+        with self._lock:
+            series = self._series.setdefault(labels, {})
+            for name, value in values.items():
+                if value is None:
+                    continue
+                buckets = config[METRICS[name][1]]
+                counts = series.get(name)
+                if counts is None:
+                    counts = series[name] = [0] * (len(buckets) + 3)
+                for index, bound in enumerate(buckets):
+                    if value <= bound:
+                        counts[index] += 1
+                        break
+                else:
+                    counts[len(buckets)] += 1  # +Inf
+                counts[-2] += value
+                counts[-1] += 1
+
+            flush_due = (time.monotonic() - self._last_flush
+                         >= config['FLUSH_INTERVAL'])
+        if flush_due:
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: {name: list(counts)
+                             for name, counts in series.items()}
+                    for labels, series in self._series.items()}
+
+    def flush(self):
+        """Сохраняет гистограммы процесса в <DIR>/<pid>.json"""
+        config = get_config()
+        with self._lock:
+            self._last_flush = time.monotonic()
+        path = os.path.join(config['DIR'], f"{os.getpid()}.json")
+        try:
+            _write_series(path, self.snapshot(), config)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить метрики в {path}: {e}")
+
+
+def _write_series(path, series, config):
+    data = {
+        'buckets': {key: list(config[key]) for _, key in METRICS.values()},
+        'series': [[list(labels), values] for labels, values in series.items()],
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Пишем рядом и переименовываем: читатель не увидит половину файла
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_series(path, config, into):
+    """Добавляет гистограммы из файла к into; файлы с другими границами пропускаются"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError) as e:
+        logger.warning(f"Не удалось прочитать метрики {path}: {e}")
+        return False
+
+    buckets = data.get('buckets', {})
+    for labels, values in data.get('series', []):
+        series = into.setdefault(tuple(labels), {})
+        for name, counts in values.items():
+            key = METRICS.get(name, (None, None))[1]
+            if (key is None or buckets.get(key) != list(config[key])
+                    or len(counts) != len(config[key]) + 3):
+                continue
+            total = series.setdefault(name, [0] * len(counts))
+            for index, count in enumerate(counts):
+                total[index] += count
+    return True
+
+
+def collect():
+    """Сумма гистограмм всех воркеров: (series, число файлов воркеров)"""
+    config = get_config()
+    request_metrics.flush()
+    series = {}
+    workers = 0
+    try:
+        names = sorted(os.listdir(config['DIR']))
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        if (_read_series(os.path.join(config['DIR'], name), config, series)
+                and name != ARCHIVE_FILE):
+            workers += 1
+    return series, workers
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(series, workers):
+    """Текстовый формат Prometheus 0.0.4"""
+    config = get_config()
+    lines = []
+    for name, (description, key) in METRICS.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} histogram")
+        bounds = [_format_number(bound) for bound in config[key]] + ['+Inf']
+        for (view, method, status), values in sorted(series.items()):
+            counts = values.get(name)
+            if counts is None:
+                continue
+            labels = (f'view="{_escape(view)}",method="{_escape(method)}",'
+                      f'status="{_escape(status)}"')
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} '
+                             f'{cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} "
+                         f"{_format_number(counts[-2])}")
+            lines.append(f"{name}_count{{{labels}}} {counts[-1]}")
+    lines.append('# HELP teddytale_metrics_workers Воркеры, приславшие метрики')
+    lines.append('# TYPE teddytale_metrics_workers gauge')
+    lines.append(f"teddytale_metrics_workers {workers}")
+    return '\n'.join(lines) + '\n'
+
+
+def reset_metrics_dir():
+    """Очищает директорию метрик (запуск сервера, хук on_starting)"""
+    config = get_config()
+    try:
+        names = os.listdir(config['DIR'])
+    except FileNotFoundError:
+        return
+    for name in names:
+        try:
+            os.remove(os.path.join(config['DIR'], name))
+        except OSError as e:
+            logger.warning(f"Не удалось удалить {name} из метрик: {e}")
+
+
+def archive_worker(pid):
+    """
+    Переносит метрики завершившегося воркера в archive.json
+    (хук child_exit, выполняется в мастер-процессе)
+    """
+    config = get_config()
+    path = os.path.join(config['DIR'], f"{pid}.json")
+    archive = os.path.join(config['DIR'], ARCHIVE_FILE)
+    series = {}
+    if not _read_series(path, config, series):
+        return
+    _read_series(archive, config, series)
+    try:
+        _write_series(archive, series, config)
+        os.remove(path)
+    except OSError as e:
+        logger.warning(f"Не удалось перенести метрики воркера {pid}: {e}")
+
+
+def view_name(request):
+    """Имя представления запроса для метрик и журналов"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    if match.url_name:
+        return match.view_name
+    return getattr(match.func, '__name__', match.view_name)
+
+
+def _response_size(response):
+    if not response.streaming:
+        return len(response.content)
+    length = response.get('Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+
+class RequestMetricsMiddleware:
+    """
+    Время ответа, запросы к БД и размер ответа по представлениям.
+    Стоит первым в MIDDLEWARE, чтобы учитывать и остальные middleware.
+    Время отдачи потоковых ответов (файлы) в длительность не входит.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = get_config()['ENABLED']
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        tracker = DBCostTracker()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(tracker))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        try:
+            request_metrics.observe(
+                (view_name(request),
+                 request.method if request.method in METHODS else 'OTHER',
+                 str(response.status_code)),
+                {
+                    'teddytale_request_duration_seconds': duration,
+                    'teddytale_request_db_queries': tracker.queries,
+                    'teddytale_request_db_duration_seconds': tracker.duration,
+                    'teddytale_response_size_bytes': _response_size(response),
+                })
+        except Exception as e:
+            logger.warning(f"Не удалось записать метрики запроса: {e}")
+        return response
+
+
+# Глобальный экземпляр (один на процесс)
+request_metrics = RequestMetrics()
@@ -0,0 +1,201 @@
+# TeddyTale/request_profiler.py
+"""
+Профилирование отдельного запроса по требованию администратора сайта.
+
+Запрос профилируется, только если в нем есть заголовок X-Profile: 1
+или параметр ?_profile=1 и пользователь - администратор сайта
+(is_site_admin). Для остального трафика middleware лишь проверяет
+заголовок и параметр.
+
+Представление выполняется под cProfile, результат сохраняется в
+<DIR>/<имя>.prof (формат pstats: python -m pstats, snakeviz, flameprof)
+и <DIR>/<имя>.json - сведения о запросе и самые затратные функции.
+Хранятся последние KEEP профилей; список - на странице
+admin-custom/profiles/, имя профиля возвращается в заголовке X-Profile-Id.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .request_metrics import DBCostTracker, view_name
+
+logger = logging.getLogger(__name__)
+
+NAME_RE = re.compile(r'^[\w-]+$')
+
+
+def _get_config():
+    config = {
+        'ENABLED': True,
+        'DIR': os.path.join(settings.BASE_DIR, 'logs', 'profiles'),
+        'HEADER': 'X-Profile',
+        'QUERY_PARAM': '_profile',
+        'KEEP': 50,  # Сколько последних профилей хранить
+        'TOP': 30,  # Сколько функций показывать в сводке
+        'SORT': 'cumulative',
+    }
+    config.update(getattr(settings, 'REQUEST_PROFILER', {}))
+    return config
+
+
+def _requested(request, config):
+    """Запрошено ли профилирование (без обращения к сессии и БД)"""
+    flag = (request.headers.get(config['HEADER'])
+            or request.GET.get(config['QUERY_PARAM']))
+    return flag not in (None, '', '0')
+
+
+def _summary(profile, config):
+    """Текстовая сводка pstats: самые затратные функции"""
+    stream = io.StringIO()
+    stats = pstats.Stats(profile, stream=stream)
+    stats.strip_dirs().sort_stats(config['SORT']).print_stats(config['TOP'])
+    return stream.getvalue()
+
+
+def save_profile(profile, meta):
+    """Сохраняет профиль и сведения о запросе, возвращает имя профиля"""
+    config = _get_config()
+    # Имена сортируются по времени: по ним выбираются старые профили
+    now = time.time()
+    name = (f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-"
+            f"{int(now * 1000000) % 1000000:06d}-{os.getpid()}")
+    os.makedirs(config['DIR'], exist_ok=True)
+    profile.dump_stats(os.path.join(config['DIR'], f"{name}.prof"))
+    meta = dict(meta, name=name, summary=_summary(profile, config))
+    with open(os.path.join(config['DIR'], f"{name}.json"), 'w',
+              encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    prune_profiles()
+    return name
+
+
+def list_profiles():
+    """Сведения о сохраненных профилях, новые первыми"""
+    config = _get_config()
+    try:
+        names = os.listdir(config['DIR'])
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for file_name in sorted(names, reverse=True):
+        if not file_name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(config['DIR'], file_name),
+                      encoding='utf-8') as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать профиль {file_name}: {e}")
+    return profiles
+
+
+def profile_path(name):
+    """Путь файла .prof по имени профиля или None"""
+    if not NAME_RE.match(name):
+        return None
+    path = os.path.join(_get_config()['DIR'], f"{name}.prof")
+    return path if os.path.isfile(path) else None
+
+
+def prune_profiles():
+    """Удаляет профили сверх KEEP (самые старые)"""
+    config = _get_config()
+    try:
+        names = sorted(file_name[:-len('.json')]
+                       for file_name in os.listdir(config['DIR'])
+                       if file_name.endswith('.json'))
+    except FileNotFoundError:
+        return 0
+    stale = names[:max(0, len(names) - config['KEEP'])]
+    for name in stale:
+        for extension in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(config['DIR'], f"{name}{extension}"))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Не удалось удалить профиль {name}: {e}")
+    return len(stale)
+
+
+class RequestProfilerMiddleware:
+    """
+    Профилирует запрос администратора сайта по заголовку или параметру.
+    Стоит после AuthenticationMiddleware (нужен request.user), поэтому
+    в профиль входят представление и следующие за ним middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = _get_config()['ENABLED']
+        # cProfile в одном процессе - по одному запросу за раз
+        self._busy = threading.Lock()
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        config = _get_config()
+        if not _requested(request, config):
+            return self.get_response(request)
+
+        from teddy_admin.permissions_custom import is_site_admin
+        if not is_site_admin(request.user):
+            return self.get_response(request)
+
+        if not self._busy.acquire(blocking=False):
+            response = self.get_response(request)
+            response['X-Profile-Id'] = 'busy'
+            return response
+        try:
+            return self._profile(request)
+        finally:
+            self._busy.release()
+
+    def _profile(self, request):
+        tracker = DBCostTracker()
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(tracker))
+            profile.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profile.disable()
+        duration = time.perf_counter() - start
+
+        try:
+            name = save_profile(profile, {
+                'time': timezone.now().isoformat(),
+                'method': request.method,
+                'path': request.get_full_path(),
+                'view': view_name(request),
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 1),
+                'queries': tracker.queries,
+                'db_ms': round(tracker.duration * 1000, 1),
+                'user': request.user.get_username(),
+                'pid': os.getpid(),
+            })
+        except Exception as e:
+            logger.error(f"Не удалось сохранить профиль запроса "
+                         f"{request.path}: {e}")
+            return response
+
+        logger.info(f"Профиль {name}: {request.method} {request.path} "
+                    f"{duration * 1000:.0f} мс")
+        response['X-Profile-Id'] = name
+        return response
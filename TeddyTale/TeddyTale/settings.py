@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import copy
 import os
 import logging
 from dotenv import load_dotenv
@@ -51,6 +52,7 @@ def ensure_directories_exist():
         BASE_DIR / 'logs',
         BASE_DIR / 'media',
         BASE_DIR / 'static',
+        BASE_DIR / 'cache',
         ]
 
     # Добавляем STATIC_ROOT, если он определен
@@ -164,6 +166,37 @@ if 'DATABASE_URL' in os.environ:
     # Эта настройка помогает автоматически восстанавливать соединения после "засыпания"
     DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
 
+    # Пул соединений в каждом воркере gunicorn (TeddyTale/db_pool.py).
+    # Соединение возвращается в пул после каждого запроса, поэтому
+    # CONN_MAX_AGE не нужен.
+    DB_POOL = {
+        'ENABLED': env.bool('DB_POOL_ENABLED', default=True),
+        # Сколько соединений открыть при старте воркера
+        'MIN_SIZE': env.int('DB_POOL_MIN_SIZE', default=1),
+        # Максимум соединений на воркер (2 потока gthread + запас)
+        'MAX_SIZE': env.int('DB_POOL_MAX_SIZE', default=3),
+        # Секунды простоя, после которых соединение открывается заново.
+        # Должно быть меньше таймаута простоя пулера Supabase.
+        'IDLE_TIMEOUT': env.int('DB_POOL_IDLE_TIMEOUT', default=120),
+        # Максимальный возраст соединения, секунды
+        'RECYCLE': env.int('DB_POOL_RECYCLE', default=1800),
+        # Сколько секунд ждать свободное соединение
+        'TIMEOUT': env.int('DB_POOL_TIMEOUT', default=10),
+    }
+
+    if DB_POOL['ENABLED']:
+        DATABASES['default']['ENGINE'] = 'TeddyTale.db_backends.postgresql_pool'
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['CONN_HEALTH_CHECKS'] = False
+        DATABASES['default']['POOL_OPTIONS'] = {
+            'POOL_SIZE': DB_POOL['MAX_SIZE'],
+            'MAX_OVERFLOW': 0,
+            'RECYCLE': DB_POOL['RECYCLE'],
+            'TIMEOUT': DB_POOL['TIMEOUT'],
+            # Проверку при выдаче делает TeddyTale.db_pool
+            'PRE_PING': False,
+        }
+
     # Логируем информацию о подключении (только при DEBUG)
     if DEBUG:
         print(f"База данных настроена для {'Render' if IS_RENDER else 'продакшена'}")
@@ -179,6 +212,39 @@ else:
         }
     }
 
+# Реплика для чтения лендинга (необязательна).
+# Локально можно проверить на втором файле: sqlite:///replica.sqlite3
+DATABASE_REPLICA_URL = env.str('DATABASE_REPLICA_URL', default='')
+if DATABASE_REPLICA_URL:
+    replica = dj_database_url.parse(DATABASE_REPLICA_URL)
+    if 'postgresql' in DATABASES['default']['ENGINE']:
+        # Те же движок, пул и параметры соединения, что у основной БД
+        for key in ('ENGINE', 'OPTIONS', 'CONN_MAX_AGE', 'CONN_HEALTH_CHECKS',
+                    'DISABLE_SERVER_SIDE_CURSORS', 'POOL_OPTIONS'):
+            if key in DATABASES['default']:
+                replica[key] = copy.deepcopy(DATABASES['default'][key])
+    # В тестах реплика указывает на тестовую основную БД
+    replica['TEST'] = {'MIRROR': 'default'}
+    DATABASES['replica'] = replica
+
+DATABASE_ROUTERS = ['TeddyTale.db_router.PrimaryReplicaRouter']
+
+DB_ROUTER = {
+    'REPLICA_ALIAS': 'replica',
+    # Секунды чтения из основной БД после записи (задержка репликации)
+    'REPLICA_LAG': env.int('DB_REPLICA_LAG', default=5),
+    'PIN_COOKIE': 'teddy_db_primary',
+    # Запись этих моделей отключает реплику на REPLICA_LAG секунд
+    'CONTENT_MODELS': (
+        'teddy_admin.PageSection',
+        'teddy_admin.SectionContent',
+        'teddy_admin.ShopItem',
+        'teddy_admin.SiteSettings',
+        'teddy_admin.PublishedPage',
+    ),
+    'WRITE_STAMP_FILE': BASE_DIR / 'cache' / 'db_write.stamp',
+}
+
 # ====================
 # НАСТРОЙКИ БЕЗОПАСНОСТИ
 # ====================
@@ -231,13 +297,17 @@ if not DEBUG:
     CSRF_COOKIE_SECURE = env.bool('CSRF_COOKIE_SECURE', default=True)
 
 MIDDLEWARE = [
+    'TeddyTale.request_metrics.RequestMetricsMiddleware',
+    'TeddyTale.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'TeddyTale.db_router.ReplicaPinningMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'TeddyTale.request_profiler.RequestProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'TeddyTale.middleware.SupabaseConnectionMiddleware',
@@ -337,6 +407,47 @@ WHITENOISE_AUTOREFRESH = True  # Автообновление в dev-режим
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / env('MEDIA_ROOT', default='media')
 
+STORAGES = {
+    # FieldFile.url возвращает URL с хешем содержимого
+    'default': {
+        'BACKEND': 'TeddyTale.media_storage.HashedMediaStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# URL медиа вида /media/h/<sha256>/<путь> с кэшированием навсегда
+# (TeddyTale/media_storage.py). Старые адреса перенаправляются.
+MEDIA_HASHING = {
+    'ENABLED': env.bool('MEDIA_HASHING_ENABLED', default=True),
+    'DIGEST_LENGTH': 16,
+    'MAX_AGE': env.int('MEDIA_MAX_AGE', default=31536000),  # Секунды
+    # Пока копия AVIF/WebP не создана (до TRANSCODE_WAIT секунд после
+    # загрузки), исходник кэшируется на PENDING_MAX_AGE, без immutable
+    'PENDING_MAX_AGE': 60,
+    'TRANSCODE_WAIT': 900,
+}
+
+# Миниатюры для админки: /media/thumb/<w>x<h>/... (TeddyTale/media_thumbnails.py)
+THUMBNAILS = {
+    'ENABLED': env.bool('THUMBNAILS_ENABLED', default=True),
+    # Превью 50x50 в списках админки и 200x150 в админ-панели (x2)
+    'SIZES': ((100, 100), (400, 300)),
+    'QUALITY': 80,
+    'DIR': 'thumbs',  # Поддиректория MEDIA_ROOT
+    'MAX_BYTES': env.int('THUMBNAILS_MAX_BYTES', default=64 * 1024 * 1024),
+    'TOUCH_INTERVAL': 600,  # Секунды
+}
+
+# Отдача медиа (TeddyTale/media_views.py): небольшие файлы держатся
+# в памяти воркера, крупные отдаются через sendfile
+MEDIA_FILES = {
+    'MAX_FILES': 4096,
+    'MAX_BYTES': env.int('MEDIA_CACHE_MAX_BYTES', default=16 * 1024 * 1024),
+    'MAX_FILE_SIZE': env.int('MEDIA_CACHE_MAX_FILE_SIZE', default=256 * 1024),
+}
+
 # ====================
 # НАСТРОЙКИ LOGGING
 # ====================
@@ -380,6 +491,8 @@ LOGGING = {
             # 3 резервные копии
             'backupCount': env.int('LOG_BACKUP_COUNT', default=3),
             'encoding': 'utf-8',
+            # Файл открывается при первой записи
+            'delay': True,
         },
         'landing_file': {
             'level': 'DEBUG',
@@ -389,6 +502,7 @@ LOGGING = {
             'maxBytes': env.int('LOG_MAX_BYTES', default=1048576),
             'backupCount': env.int('LOG_BACKUP_COUNT', default=3),
             'encoding': 'utf-8',
+            'delay': True,
         },
         'error_file': {
             'level': 'ERROR',
@@ -398,6 +512,7 @@ LOGGING = {
             'maxBytes': env.int('LOG_MAX_BYTES', default=1048576),
             'backupCount': env.int('LOG_BACKUP_COUNT', default=3),
             'encoding': 'utf-8',
+            'delay': True,
         },
         # Добавляем логгер для базы данных (важно для отладки подключений)
         'db_file': {
@@ -408,6 +523,18 @@ LOGGING = {
             'maxBytes': env.int('LOG_MAX_BYTES', default=1048576),
             'backupCount': env.int('LOG_BACKUP_COUNT', default=3),
             'encoding': 'utf-8',
+            'delay': True,
+        },
+        # Медленные запросы к БД (TeddyTale/slow_queries.py)
+        'slow_queries_file': {
+            'level': 'WARNING',
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': BASE_DIR / 'logs' / 'slow_queries.log',
+            'formatter': 'verbose',
+            'maxBytes': env.int('LOG_MAX_BYTES', default=1048576),
+            'backupCount': env.int('LOG_BACKUP_COUNT', default=3),
+            'encoding': 'utf-8',
+            'delay': True,
         },
     },
     'loggers': {
@@ -441,6 +568,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'TeddyTale.slow_queries': {
+            'handlers': ['slow_queries_file'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
     'root': {
         'handlers': ['console', 'error_file'],
@@ -520,6 +652,138 @@ JAZZMIN_UI_TWEAKS = {
     }
 }
 
+# ====================
+# КЭШ СТРАНИЦ ЛЕНДИНГА
+# ====================
+
+# Готовый HTML главной и privacy хранится в памяти процесса и
+# (опционально) в общем кэше Django. Сбрасывается сигналами teddy_admin.
+PAGE_CACHE = {
+    'ENABLED': env.bool('PAGE_CACHE_ENABLED', default=True),
+    'MAX_ENTRIES': env.int('PAGE_CACHE_MAX_ENTRIES', default=16),
+    'TIMEOUT': env.int('PAGE_CACHE_TIMEOUT', default=3600),  # Секунды
+    # Алиас из CACHES для общего уровня (None - только память процесса)
+    'SHARED_ALIAS': env('PAGE_CACHE_SHARED_ALIAS', default=None),
+    # Файл-метка поколения кэша, общий для всех воркеров gunicorn
+    'STAMP_FILE': BASE_DIR / 'cache' / 'page_cache.stamp',
+}
+
+# Метрики запросов (TeddyTale/request_metrics.py): время ответа, запросы
+# к БД и размер ответа по представлениям. Воркеры gunicorn сбрасывают
+# свои данные в общую директорию DIR, /metrics отдает их сумму
+REQUEST_METRICS = {
+    'ENABLED': env.bool('REQUEST_METRICS_ENABLED', default=True),
+    'DIR': BASE_DIR / 'cache' / 'metrics',
+    'FLUSH_INTERVAL': 10,  # Секунды
+    # Токен сборщика: Authorization: Bearer <токен>. Без токена /metrics
+    # доступен только администраторам сайта
+    'TOKEN': env('METRICS_TOKEN', default=''),
+}
+
+# Журнал медленных запросов к БД (TeddyTale/slow_queries.py): запросы
+# дольше порога пишутся в logs/slow_queries.log и в буфер процесса,
+# который виден администраторам на странице admin-custom/slow-queries/
+SLOW_QUERIES = {
+    'ENABLED': env.bool('SLOW_QUERIES_ENABLED', default=True),
+    'THRESHOLD_MS': env.int('SLOW_QUERY_THRESHOLD_MS', default=200),
+    'BUFFER_SIZE': 200,
+    'MAX_SQL_LENGTH': 2000,
+}
+
+# Профилирование запроса по требованию (TeddyTale/request_profiler.py):
+# администратор сайта добавляет заголовок X-Profile: 1 или ?_profile=1,
+# профиль cProfile сохраняется в DIR и виден на admin-custom/profiles/
+REQUEST_PROFILER = {
+    'ENABLED': env.bool('REQUEST_PROFILER_ENABLED', default=True),
+    'DIR': BASE_DIR / 'logs' / 'profiles',
+    'KEEP': env.int('REQUEST_PROFILER_KEEP', default=50),
+}
+
+# Снимок последнего загруженного контента лендинга. Используется при
+# холодном старте, пока соединение с Supabase прогревается в фоне.
+LANDING_SNAPSHOT_FILE = BASE_DIR / 'cache' / 'landing_snapshot.json'
+# Снимок, сохраненный при сборке (build.sh): диск Render не переживает
+# засыпание, а файлы сборки остаются. Читается, если снимка выше нет
+LANDING_SNAPSHOT_SEED_FILE = BASE_DIR / 'cache' / 'landing_snapshot.seed.json'
+
+# Режим stale-while-revalidate: при ошибке или медленном ответе БД
+# лендинг отдается из последней удачной версии документа
+STALE_CONTENT = {
+    # Сколько секунд запрос ждет свежие данные из БД
+    'LATENCY_BUDGET': env.float('STALE_CONTENT_LATENCY_BUDGET', default=1.0),
+    # Сколько секунд отдаем устаревший контент без повторной попытки
+    'TTL': env.int('STALE_CONTENT_TTL', default=30),
+}
+
+# Условные GET-запросы для главной и privacy (ETag по версии документа)
+CONDITIONAL_GET = {
+    'ENABLED': env.bool('CONDITIONAL_GET_ENABLED', default=True),
+    # Коммит деплоя на Render: после деплоя браузеры получат новые шаблоны
+    'ETAG_SALT': env('RENDER_GIT_COMMIT', default='')[:12],
+}
+
+# Уменьшенные копии изображений для srcset (teddy_admin/image_variants.py).
+# Существующие медиа-файлы: python manage.py backfill_image_variants
+IMAGE_VARIANTS = {
+    'ENABLED': env.bool('IMAGE_VARIANTS_ENABLED', default=True),
+    # Ширины копий в пикселях (больше исходной не создаются)
+    'WIDTHS': (320, 640, 960, 1280),
+    'FORMAT': 'WEBP',
+    'QUALITY': env.int('IMAGE_VARIANTS_QUALITY', default=80),
+    # Поддиректория MEDIA_ROOT
+    'DIR': 'variants',
+}
+
+# Копии изображений в AVIF/WebP (teddy_admin/image_transcodes.py).
+# Формат выбирается по заголовку Accept при отдаче медиа.
+# Если копия больше MAX_BYTES, качество снижается до MIN_QUALITY.
+IMAGE_TRANSCODING = {
+    'ENABLED': env.bool('IMAGE_TRANSCODING_ENABLED', default=True),
+    # В порядке предпочтения
+    'FORMATS': {
+        'AVIF': {
+            'QUALITY': env.int('IMAGE_AVIF_QUALITY', default=50),
+            'MAX_BYTES': env.int('IMAGE_AVIF_MAX_BYTES', default=150 * 1024),
+        },
+        'WEBP': {
+            'QUALITY': env.int('IMAGE_WEBP_QUALITY', default=80),
+            'MAX_BYTES': env.int('IMAGE_WEBP_MAX_BYTES', default=250 * 1024),
+        },
+    },
+    'MIN_QUALITY': 30,
+    'QUALITY_STEP': 10,
+    'DIR': 'transcodes',  # Поддиректория MEDIA_ROOT
+}
+
+# Заглушки изображений (LQIP) в index.html (teddy_admin/image_placeholders.py)
+IMAGE_PLACEHOLDERS = {
+    'ENABLED': env.bool('IMAGE_PLACEHOLDERS_ENABLED', default=True),
+    'WIDTH': 16,  # Ширина размытой копии в пикселях
+    'QUALITY': 40,
+    'BLUR_RADIUS': 1,
+}
+
+# Фоновая обработка загруженных изображений (teddy_admin/image_jobs.py)
+IMAGE_JOBS = {
+    # Потоков обработки на воркер (Pillow расходует много памяти)
+    'WORKERS': env.int('IMAGE_JOBS_WORKERS', default=1),
+    'MAX_PENDING': env.int('IMAGE_JOBS_MAX_PENDING', default=16),
+    # Хранить задачи в БД и выполнять незавершенные после перезапуска
+    'PERSIST': env.bool('IMAGE_JOBS_PERSIST', default=False),
+    'KEEP_FINISHED': 100,
+    'STALE_AFTER': 600,  # Секунды
+}
+
+# Потоковая загрузка изображений из админ-панели
+# (teddy_admin/upload_handlers.py): тип по сигнатуре, sha256 и размеры
+# считаются при приеме, файл перемещается на место без копирования
+IMAGE_UPLOADS = {
+    'MAX_SIZE': env.int('IMAGE_UPLOAD_MAX_SIZE', default=5 * 1024 * 1024),
+    'ALLOWED_TYPES': ('image/jpeg', 'image/png', 'image/webp', 'image/gif'),
+    'HEADER_LIMIT': 256 * 1024,  # Байт заголовка для поиска размеров
+    'TEMP_DIR': 'tmp',  # Поддиректория MEDIA_ROOT
+}
+
 # ====================
 # API КЛЮЧИ
 # ====================
@@ -543,6 +807,26 @@ HEALTH_CHECK = {
     'TIMEOUT': 30,  # Секунды для health-check таймаута
 }
 
+# Автоматический выключатель для обращений к Supabase
+# (см. TeddyTale/circuit_breaker.py)
+DB_CIRCUIT_BREAKER = {
+    # Сколько ошибок БД подряд размыкают выключатель
+    'FAILURE_THRESHOLD': env.int('DB_BREAKER_FAILURE_THRESHOLD', default=3),
+    # Через сколько секунд пропускаем пробный запрос
+    'RESET_TIMEOUT': env.int('DB_BREAKER_RESET_TIMEOUT', default=30),
+}
+
+# Политика повторов запросов к БД для landing.db_utils.safe_db_query
+DB_RETRY = {
+    'MAX_ATTEMPTS': env.int('DB_RETRY_MAX_ATTEMPTS', default=2),
+    'BASE_DELAY': env.float('DB_RETRY_BASE_DELAY', default=0.1),  # Секунды
+    'MAX_DELAY': env.float('DB_RETRY_MAX_DELAY', default=1.0),  # Секунды
+    # Бюджет повторов на процесс: не больше BUDGET_CAPACITY повторов подряд,
+    # затем BUDGET_REFILL_PER_SECOND повторов в секунду
+    'BUDGET_CAPACITY': env.int('DB_RETRY_BUDGET_CAPACITY', default=10),
+    'BUDGET_REFILL_PER_SECOND': env.float('DB_RETRY_BUDGET_REFILL', default=0.5),
+}
+
 # Информация для разработчика
 if DEBUG and IS_RENDER:
     print("\n" + "="*80)
@@ -582,7 +866,8 @@ if IS_RENDER:
     import os
     from pathlib import Path
 
-    media_subdirs = ['shop_items', 'uploaded_images', 'tmp']
+    media_subdirs = ['shop_items', 'uploaded_images', 'variants',
+                     'transcodes', 'thumbs', 'tmp']
     for subdir in media_subdirs:
         dir_path = Path(MEDIA_ROOT) / subdir
         dir_path.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,189 @@
+# TeddyTale/slow_queries.py
+"""
+Журнал медленных запросов к БД без включения DEBUG.
+
+SlowQueryMiddleware оборачивает execute всех соединений на время
+запроса. Запрос дольше SLOW_QUERIES['THRESHOLD_MS'] записывается вместе
+с SQL, отпечатком параметров, длительностью, именем представления и
+первым кадром стека из кода проекта (например
+teddy_admin/signals.py:delete_old_image_on_update).
+
+Записи уходят в логгер TeddyTale.slow_queries (файл
+logs/slow_queries.log с ротацией) и в кольцевой буфер процесса, который
+администраторы сайта видят на странице admin-custom/slow-queries/.
+Запросы фоновых задач вне HTTP-запроса не учитываются.
+"""
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .request_metrics import view_name
+
+logger = logging.getLogger(__name__)
+
+# Файлы проекта, которые сами выполняют запросы за других (обертки
+# execute и middleware) - место вызова ищется выше них
+_SKIP_FILES = (
+    'TeddyTale/slow_queries.py',
+    'TeddyTale/request_metrics.py',
+    'TeddyTale/middleware.py',
+    'TeddyTale/db_router.py',
+    'TeddyTale/db_backends/',
+)
+# Кадры самого ORM не подходят и как запасной вариант
+_ORM_DIRS = ('django/db/',)
+
+
+def get_config():
+    config = {
+        'ENABLED': True,
+        'THRESHOLD_MS': 200,  # Запросы дольше стольких миллисекунд
+        'BUFFER_SIZE': 200,  # Записей в памяти процесса
+        'MAX_SQL_LENGTH': 2000,  # Длинный SQL обрезается
+    }
+    config.update(getattr(settings, 'SLOW_QUERIES', {}))
+    return config
+
+
+def _fingerprint(params):
+    """Короткий хеш параметров: одинаковые вызовы видны без самих значений"""
+    if params is None:
+        return ''
+    return hashlib.blake2b(repr(params).encode('utf-8', 'replace'),
+                           digest_size=6).hexdigest()
+
+
+def _call_site():
+    """
+    Первый кадр стека из кода проекта: ('путь:функция', строка).
+    Если запрос выполнил не код проекта (сессии, аутентификация) -
+    первый кадр из библиотек вне ORM.
+    """
+    base = os.path.join(str(settings.BASE_DIR), '')
+    packages = f"site-packages{os.sep}"
+    fallback = ('unknown', None)
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if packages in filename:
+            relative = filename.rpartition(packages)[2].replace(os.sep, '/')
+            if fallback[1] is None and not relative.startswith(_ORM_DIRS):
+                fallback = (f"{relative}:{frame.f_code.co_name}",
+                            frame.f_lineno)
+        elif filename.startswith(base):
+            relative = filename[len(base):].replace(os.sep, '/')
+            if not relative.startswith(_SKIP_FILES):
+                return f"{relative}:{frame.f_code.co_name}", frame.f_lineno
+        frame = frame.f_back
+    return fallback
+
+
+class SlowQueryLog:
+    """Кольцевой буфер медленных запросов (один экземпляр на процесс)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=get_config()['BUFFER_SIZE'])
+        self.recorded = 0
+
+    def record(self, sql, params, many, duration, alias, view):
+        config = get_config()
+        call_site, line = _call_site()
+        if len(sql) > config['MAX_SQL_LENGTH']:
+            sql = f"{sql[:config['MAX_SQL_LENGTH']]}..."
+        entry = {
+            'time': timezone.now(),
+            'duration_ms': round(duration * 1000, 1),
+            'sql': sql,
+            'params': _fingerprint(params),
+            'many': many,
+            'alias': alias,
+            'view': view,
+            'call_site': call_site,
+            'line': line,
+            'pid': os.getpid(),
+        }
+        with self._lock:
+            self._entries.append(entry)
+            self.recorded += 1
+
+        logger.warning(
+            f"Медленный запрос {entry['duration_ms']} мс [{alias}] "
+            f"{view} {call_site}:{line} params={entry['params']}: {sql}")
+        return entry
+
+    def entries(self):
+        """Записи процесса, новые первыми"""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'recorded': self.recorded,
+                'buffered': len(self._entries),
+            }
+
+
+class _SlowQueryWrapper:
+    """Обертка execute: записывает запросы дольше порога"""
+
+    def __init__(self, request, threshold):
+        self.request = request
+        self.threshold = threshold
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold:
+                try:
+                    slow_query_log.record(
+                        sql, params, many, duration,
+                        context['connection'].alias,
+                        view_name(self.request))
+                except Exception as e:
+                    logger.warning(f"Не удалось записать медленный запрос: {e}")
+
+
+class SlowQueryMiddleware:
+    """
+    Записывает медленные запросы к БД. Стоит сразу после
+    RequestMetricsMiddleware, чтобы учитывать запросы остальных middleware
+    (сессии, аутентификация).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = get_config()
+        self.enabled = config['ENABLED']
+        self.threshold = config['THRESHOLD_MS'] / 1000
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        wrapper = _SlowQueryWrapper(request, self.threshold)
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(wrapper))
+            return self.get_response(request)
+
+
+# Глобальный экземпляр (один на процесс)
+slow_query_log = SlowQueryLog()
@@ -1,10 +1,8 @@
 from django.urls import path, include
 from django.contrib import admin
 from django.views.generic import RedirectView
-from django.conf import settings
-from django.conf.urls.static import static
-from django.views.static import serve
-from .health_views import health_check, ping
+from .health_views import health_check, metrics, ping
+from .media_views import serve_media, serve_thumbnail
 
 # Меняем URL стандартной админки
 admin.site.site_url = '/panel/'  # Для ссылок "Вернуться на сайт"
@@ -26,18 +24,19 @@ urlpatterns = [
     path('health', health_check),
     path('ping/', ping),
     path('ping', ping),
+
+    # Метрики запросов для Prometheus (TeddyTale/request_metrics.py)
+    path('metrics', metrics, name='metrics'),
 ]
 
 # ====================
 # Разрешаем обслуживание медиафайлов ВСЕГДА
 # ====================
 
-# На Render (production) используем специальный маршрут
-if settings.IS_RENDER and not settings.DEBUG:
-    # Добавляем маршрут для обслуживания медиа-файлов в production
-    urlpatterns += [
-        path('media/<path:path>', serve, {'document_root': settings.MEDIA_ROOT}),
-    ]
-else:
-    # В development используем стандартный способ
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Файлы отдаются по URL с хешем содержимого и кэшируются навсегда,
+# старые адреса /media/<путь> перенаправляются (TeddyTale/media_views.py)
+urlpatterns += [
+    path('media/thumb/<int:width>x<int:height>/<path:path>', serve_thumbnail,
+         name='media-thumbnail'),
+    path('media/<path:path>', serve_media, name='media'),
+]
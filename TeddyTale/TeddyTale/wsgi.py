@@ -12,11 +12,10 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TeddyTale.settings')
 # Импортируем и запускаем сервисы ТОЛЬКО на Render
 if os.environ.get('RENDER'):
     try:
-        from .connection_manager import connection_manager
         from .self_ping import self_ping_service
 
         # Запускаем сервисы
-        connection_manager.start()
+        # (соединения с БД держит пул, см. TeddyTale/db_pool.py и gunicorn.conf.py)
         self_ping_service.start()
         print("✅ Background services started on Render")
 
@@ -48,13 +47,6 @@ application = WhiteNoise(
     prefix='/static/'
 )
 
-# ✅ Включаем обслуживание медиа-файлов через WhiteNoise на Render
-IS_RENDER = os.environ.get('RENDER') is not None
-if IS_RENDER or not os.environ.get('DEBUG', 'False') == 'True':
-    media_root = os.path.join(BASE_DIR, 'media')
-    if os.path.exists(media_root):
-        # Добавляем медиа-файлы с правильным префиксом
-        application.add_files(media_root, prefix='/media/')
-        print(f"✅ WhiteNoise настроен для обслуживания медиа-файлов")
-    else:
-        print(f"⚠️ Медиа директория не найдена: {media_root}")
\ No newline at end of file
+# Медиа-файлы WhiteNoise не отдает: он видит только файлы, которые были
+# на диске при старте, и не знает URL с хешем содержимого.
+# Их обслуживает Django (TeddyTale/media_views.py).
@@ -59,6 +59,18 @@ fi
 echo "4. 🎨 Сбор статических файлов..."
 python manage.py collectstatic --noinput --clear
 
+# 5. МИГРАЦИИ И СНИМОК ЛЕНДИНГА
+# Снимок входит в образ сборки и переживает засыпание инстанса:
+# после пробуждения лендинг отдается из него, пока Supabase не ответил.
+# Ошибки не прерывают сборку - start.sh повторит миграции перед
+# запуском сервера. --fake-initial: таблицы из 0001_initial уже есть
+# в базах, созданных до появления миграций в репозитории
+echo "5. 🗄️  Миграции и снимок лендинга..."
+timeout "${DB_STEP_TIMEOUT:-120}" python manage.py migrate --noinput --fake-initial \
+    || echo "⚠️  Миграции не применены при сборке"
+timeout "${DB_STEP_TIMEOUT:-120}" python manage.py seed_landing_snapshot \
+    || echo "⚠️  Снимок лендинга не сохранен"
+
 echo ""
 echo "=========================================="
 echo "✅ СБОРКА УСПЕШНО ЗАВЕРШЕНА"
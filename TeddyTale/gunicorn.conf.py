@@ -0,0 +1,49 @@
+# gunicorn.conf.py
+"""
+Хуки gunicorn: пул соединений с Supabase (TeddyTale/db_pool.py),
+восстановление задач обработки изображений (teddy_admin/image_jobs.py)
+и общая директория метрик воркеров (TeddyTale/request_metrics.py).
+Параметры запуска (воркеры, потоки, таймауты) задаются в start.sh.
+"""
+
+
+def on_starting(server):
+    """Метрики прошлого запуска не должны попасть в сумму"""
+    try:
+        from TeddyTale.request_metrics import reset_metrics_dir
+        reset_metrics_dir()
+    except Exception as e:
+        server.log.warning(f"Не удалось очистить директорию метрик: {e}")
+
+
+def post_fork(server, worker):
+    """Воркер не должен использовать соединения мастер-процесса (--preload)"""
+    try:
+        from TeddyTale.db_pool import reset_pools_after_fork
+        reset_pools_after_fork()
+    except Exception as e:
+        server.log.warning(f"Не удалось сбросить пул соединений: {e}")
+
+
+def post_worker_init(worker):
+    """Приложение загружено - прогреваем пул и подхватываем задачи в фоне"""
+    try:
+        from TeddyTale.db_pool import start_warm_up
+        start_warm_up()
+    except Exception as e:
+        worker.log.warning(f"Не удалось запустить прогрев пула: {e}")
+
+    try:
+        from teddy_admin.image_jobs import start_recovery
+        start_recovery()
+    except Exception as e:
+        worker.log.warning(f"Не удалось восстановить задачи изображений: {e}")
+
+
+def child_exit(server, worker):
+    """Счетчики завершившегося воркера сохраняются в общей сумме"""
+    try:
+        from TeddyTale.request_metrics import archive_worker
+        archive_worker(worker.pid)
+    except Exception as e:
+        server.log.warning(f"Не удалось сохранить метрики воркера: {e}")
@@ -0,0 +1,86 @@
+# landing/conditional.py
+"""
+Условные GET-запросы (ETag / Last-Modified) для страниц лендинга.
+
+Валидатор строится из версии опубликованного документа лендинга,
+которая берется из памяти процесса или одним запросом по первичному
+ключу. На If-None-Match / If-Modified-Since с совпавшим валидатором
+отдается 304 без рендера шаблона и без чтения таблиц контента.
+"""
+import logging
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from .published_page import get_published_version
+
+logger = logging.getLogger(__name__)
+
+
+def _get_config():
+    config = {
+        'ENABLED': True,
+        # Меняется при деплое, чтобы новые шаблоны не отдавались как 304
+        'ETAG_SALT': '',
+    }
+    config.update(getattr(settings, 'CONDITIONAL_GET', {}))
+    return config
+
+
+def get_page_validators(name):
+    """
+    Возвращает (etag, last_modified) для страницы или None,
+    если версию контента узнать не удалось (БД недоступна).
+    """
+    config = _get_config()
+    try:
+        current = get_published_version()
+    except Exception as e:
+        logger.warning(f"Не удалось получить версию контента для {name}: {e}")
+        return None
+    if current is None:
+        return None
+
+    version, published_at = current
+    etag = quote_etag(f"{name}-{version}-{config['ETAG_SALT']}")
+    last_modified = int(published_at.timestamp()) if published_at else None
+    return etag, last_modified
+
+
+def conditional_page(name):
+    """
+    Декоратор для представлений лендинга: отвечает 304 Not Modified,
+    если у клиента актуальная версия страницы. Резервные ответы
+    (response.is_fallback) валидаторы не получают.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if (not _get_config()['ENABLED']
+                    or request.method not in ('GET', 'HEAD')):
+                return view_func(request, *args, **kwargs)
+
+            validators = get_page_validators(name)
+            if validators is not None:
+                etag, last_modified = validators
+                response = get_conditional_response(
+                    request, etag=etag, last_modified=last_modified)
+                if response is not None:
+                    return response
+
+            response = view_func(request, *args, **kwargs)
+
+            if (validators is not None and response.status_code == 200
+                    and not getattr(response, 'is_fallback', False)):
+                etag, last_modified = validators
+                response.headers.setdefault('ETag', etag)
+                if last_modified is not None:
+                    response.headers.setdefault('Last-Modified',
+                                                http_date(last_modified))
+                # Браузер хранит страницу, но каждый раз сверяет валидатор
+                response.headers.setdefault('Cache-Control', 'no-cache')
+            return response
+        return wrapper
+    return decorator
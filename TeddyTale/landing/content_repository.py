@@ -0,0 +1,92 @@
+# landing/content_repository.py
+"""
+Общий загрузчик контента страниц.
+
+Все активные секции вместе с их содержимым загружаются одним
+запросом с JOIN (вместо отдельного запроса на каждую секцию).
+Результат - неизменяемое отображение:
+
+    content['contacts']['contactsPhone']['value']
+
+Используется в landing.views (index, privacy) и в кастомной админке.
+"""
+import logging
+from types import MappingProxyType
+
+from TeddyTale.db_router import use_replica
+from teddy_admin.models import SectionContent
+from .db_utils import safe_db_query
+
+logger = logging.getLogger(__name__)
+
+EMPTY_SECTION = MappingProxyType({})
+
+
+class PageContent:
+    """
+    Неизменяемый контент страницы: section_key -> content_key -> запись.
+    Запись содержит value, label, content_type и id элемента контента.
+    """
+
+    def __init__(self, sections):
+        self._sections = MappingProxyType({
+            section_key: MappingProxyType({
+                content_key: MappingProxyType(entry)
+                for content_key, entry in contents.items()
+            })
+            for section_key, contents in sections.items()
+        })
+
+    def __contains__(self, section_key):
+        return section_key in self._sections
+
+    def __getitem__(self, section_key):
+        return self._sections[section_key]
+
+    def __iter__(self):
+        return iter(self._sections)
+
+    def __len__(self):
+        return len(self._sections)
+
+    def section(self, section_key):
+        """Содержимое секции (пустое отображение, если секции нет)"""
+        return self._sections.get(section_key, EMPTY_SECTION)
+
+    def values(self, section_key):
+        """Словарь content_key -> value для секции"""
+        return {key: entry['value']
+                for key, entry in self.section(section_key).items()}
+
+    def value(self, section_key, content_key, default=None):
+        """Значение одного элемента контента или default"""
+        entry = self.section(section_key).get(content_key)
+        if entry is None:
+            return default
+        return entry['value']
+
+
+@safe_db_query
+@use_replica()
+def load_page_content():
+    """
+    Загружает все активные секции с содержимым одним запросом к БД
+    (из реплики, если она настроена и не отстает).
+    """
+    rows = (SectionContent.objects
+            .filter(section__is_active=True)
+            .order_by('section__order_index', 'order_index')
+            .values_list('section__section_key', 'content_key', 'value',
+                         'label', 'content_type', 'id'))
+
+    sections = {}
+    for section_key, content_key, value, label, content_type, pk in rows:
+        sections.setdefault(section_key, {})[content_key] = {
+            'value': value,
+            'label': label,
+            'content_type': content_type,
+            'id': pk,
+        }
+
+    logger.debug(f"Загружен контент страниц: {len(sections)} секций")
+    return PageContent(sections)
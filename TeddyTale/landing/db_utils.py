@@ -3,33 +3,213 @@
 Утилиты для безопасной работы с базой данных Supabase
 """
 import logging
-from django.db import OperationalError, InterfaceError, connection
+import random
+import threading
+import time
+from django.conf import settings
+from django.db import (OperationalError, InterfaceError, DataError,
+                       IntegrityError, ProgrammingError, connections)
 from functools import wraps
 
+from TeddyTale.circuit_breaker import db_circuit_breaker
+
 logger = logging.getLogger(__name__)
 
-def safe_db_query(func):
+
+def _get_retry_config():
+    config = {
+        'MAX_ATTEMPTS': 2,  # Всего попыток, включая первую
+        'BASE_DELAY': 0.1,  # Секунды, база экспоненциальной задержки
+        'MAX_DELAY': 1.0,  # Секунды, потолок задержки
+        'BUDGET_CAPACITY': 10,  # Емкость бюджета повторов (токенов)
+        'BUDGET_REFILL_PER_SECOND': 0.5,  # Скорость пополнения бюджета
+    }
+    config.update(getattr(settings, 'DB_RETRY', {}))
+    return config
+
+
+class RetryBudget:
+    """
+    Бюджет повторов на процесс (token bucket).
+    Каждый повтор тратит токен; если токенов нет, ошибка пробрасывается
+    сразу - повторы не умножают нагрузку на лежащую БД.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = None
+        self._updated_at = time.monotonic()
+
+    def try_acquire(self):
+        config = _get_retry_config()
+        capacity = config['BUDGET_CAPACITY']
+        with self._lock:
+            now = time.monotonic()
+            if self._tokens is None:
+                self._tokens = capacity
+            self._tokens = min(capacity, self._tokens + (now - self._updated_at)
+                               * config['BUDGET_REFILL_PER_SECOND'])
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+retry_budget = RetryBudget()
+
+
+class RetryPolicy:
+    """
+    Политика повторов: какие ошибки повторять и с какой задержкой.
+    Задержка - экспоненциальная с полным джиттером.
+    """
+    # Ошибки соединения - можно повторить
+    retryable_errors = (OperationalError, InterfaceError)
+    # Ошибки в самом запросе - повтор ничего не изменит
+    fatal_errors = (IntegrityError, DataError, ProgrammingError)
+    # Таймауты запросов не повторяем, чтобы не усиливать нагрузку
+    fatal_messages = ('statement timeout', 'canceling statement')
+
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=None):
+        config = _get_retry_config()
+        self.max_attempts = max_attempts or config['MAX_ATTEMPTS']
+        self.base_delay = base_delay if base_delay is not None else config['BASE_DELAY']
+        self.max_delay = max_delay if max_delay is not None else config['MAX_DELAY']
+
+    def is_retryable(self, error):
+        if isinstance(error, self.fatal_errors):
+            return False
+        if not isinstance(error, self.retryable_errors):
+            return False
+        message = str(error).lower()
+        return not any(text in message for text in self.fatal_messages)
+
+    def get_delay(self, attempt):
+        """Задержка перед повтором номер attempt (с 1)"""
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, cap)
+
+
+class RetryStats:
+    """Счетчики повторов по функциям чтения (модуль.функция)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, name, retries, retry_time, failed=False,
+               budget_exhausted=False):
+        with self._lock:
+            stats = self._views.setdefault(name, {
+                'calls': 0,
+                'retries': 0,
+                'retry_time': 0.0,
+                'failures': 0,
+                'budget_exhausted': 0,
+            })
+            stats['calls'] += 1
+            stats['retries'] += retries
+            stats['retry_time'] += retry_time
+            stats['failures'] += int(failed)
+            stats['budget_exhausted'] += int(budget_exhausted)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._views.items()}
+
+
+retry_stats = RetryStats()
+
+
+def _in_atomic_block():
+    """Открыта ли транзакция на каком-либо соединении (default, replica)"""
+    return any(conn.in_atomic_block
+               for conn in connections.all(initialized_only=True))
+
+
+def _close_failed_connections():
+    """
+    Закрывает соединения, на которых была ошибка (errors_occurred
+    ставит обертка ошибок Django). Если ошибка пришла не из драйвера
+    и флага нет ни у одного, закрываются все открытые соединения.
+    Переподключение - лениво, при следующем запросе.
+    """
+    opened = connections.all(initialized_only=True)
+    failed = [conn for conn in opened if conn.errors_occurred] or opened
+    for conn in failed:
+        conn.close()
+
+
+def safe_db_query(func=None, *, idempotent=True, policy=None):
     """
     Декоратор для безопасного выполнения функций с запросами к БД.
-    Автоматически переподключается при ошибках соединения.
+    При ошибке соединения закрывает его (Django переподключится сам
+    при следующем запросе) и повторяет вызов по политике RetryPolicy.
+
+    Декорировать нужно функции, которые пропускают ошибки БД наружу
+    (load_page_content, PublishedDocumentStore._load): если функция сама
+    перехватывает исключения, повторять будет нечего.
+
+    Использование:
+        @safe_db_query
+        @safe_db_query(idempotent=False)  # без повторов (запись в БД)
     """
+    if func is None:
+        return lambda f: safe_db_query(f, idempotent=idempotent,
+                                       policy=policy)
+
     @wraps(func)
     def wrapper(*args, **kwargs):
-        max_retries = 2
-        for attempt in range(max_retries):
+        retry_policy = policy or RetryPolicy()
+        name = f"{func.__module__}.{func.__name__}"
+        retries = 0
+        retry_time = 0.0
+        attempt = 0
+        while True:
+            attempt += 1
             try:
-                return func(*args, **kwargs)
-            except (OperationalError, InterfaceError) as e:
-                if attempt < max_retries - 1:
-                    logger.warning(f"Ошибка БД при вызове {func.__name__}: {e}. Попытка {attempt + 1}/{max_retries}")
-                    # Закрываем и переподключаемся
-                    connection.close()
-                    connection.connect()
-                    continue
-                else:
-                    logger.error(f"Ошибка БД при вызове {func.__name__} после {max_retries} попыток: {e}")
-                    raise
+                result = func(*args, **kwargs)
+                retry_stats.record(name, retries, retry_time)
+                return result
             except Exception as e:
-                logger.error(f"Неожиданная ошибка в {func.__name__}: {e}")
-                raise
-    return wrapper
\ No newline at end of file
+                budget_exhausted = False
+                can_retry = (
+                    idempotent
+                    and attempt < retry_policy.max_attempts
+                    and retry_policy.is_retryable(e)
+                    # Внутри транзакции соединение не переоткрыть
+                    and not _in_atomic_block()
+                    and not db_circuit_breaker.is_open()
+                )
+                if can_retry:
+                    budget_exhausted = not retry_budget.try_acquire()
+                    can_retry = not budget_exhausted
+
+                if not can_retry:
+                    retry_stats.record(name, retries, retry_time, failed=True,
+                                       budget_exhausted=budget_exhausted)
+                    if isinstance(e, (OperationalError, InterfaceError)):
+                        logger.error(f"Ошибка БД при вызове {func.__name__} после "
+                                     f"{attempt} попыток: {e}")
+                    else:
+                        logger.error(f"Неожиданная ошибка в {func.__name__}: {e}")
+                    raise
+
+                delay = retry_policy.get_delay(attempt)
+                logger.warning(f"Ошибка БД при вызове {func.__name__}: {e}. "
+                               f"Попытка {attempt}/{retry_policy.max_attempts}, "
+                               f"повтор через {delay:.2f} с")
+                started = time.monotonic()
+                # Закрываем сломанное соединение (с реплики при
+                # use_replica), переподключение - лениво
+                _close_failed_connections()
+                time.sleep(delay)
+                retry_time += time.monotonic() - started
+                retries += 1
+    return wrapper
+
+
+def get_retry_stats():
+    """Статистика повторов по функциям (отдается в /health)"""
+    return retry_stats.snapshot()
@@ -0,0 +1,219 @@
+# landing/page_cache.py
+"""
+Кэш готовых HTML-страниц лендинга (index, privacy).
+
+Контент страниц меняется только при сохранении данных через админку,
+поэтому отрендеренный HTML хранится целиком:
+
+- первый уровень - LRU в памяти процесса (у каждого воркера gunicorn свой);
+- второй уровень (опционально) - общий кэш Django из settings.CACHES,
+  алиас задается в PAGE_CACHE['SHARED_ALIAS'].
+
+Сброс выполняется через "поколение" кэша. При изменении контента
+поколение увеличивается (файл-метка на диске или ключ в общем кэше),
+и все воркеры перестают отдавать старые страницы без единого запроса к БД.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = 'teddytale:page_cache:generation'
+
+
+def _get_config():
+    """Возвращает настройки кэша страниц с значениями по умолчанию"""
+    config = {
+        'ENABLED': True,
+        'MAX_ENTRIES': 16,
+        'TIMEOUT': 3600,
+        'SHARED_ALIAS': None,
+        'STAMP_FILE': os.path.join(settings.BASE_DIR, 'cache',
+                                   'page_cache.stamp'),
+    }
+    config.update(getattr(settings, 'PAGE_CACHE', {}))
+    return config
+
+
+class PageCache:
+    """Двухуровневый кэш HTML-страниц с общим поколением"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    # --------------------
+    # Поколение кэша
+    # --------------------
+
+    def _shared(self, config):
+        alias = config['SHARED_ALIAS']
+        if not alias:
+            return None
+        try:
+            return caches[alias]
+        except Exception as e:
+            logger.warning(f"Общий кэш '{alias}' недоступен: {e}")
+            return None
+
+    def current_generation(self, config=None):
+        """Текущее поколение: ключ в общем кэше или mtime файла-метки"""
+        config = config or _get_config()
+        shared = self._shared(config)
+        if shared is not None:
+            try:
+                generation = shared.get(GENERATION_KEY)
+                if generation is None:
+                    shared.add(GENERATION_KEY, 1, timeout=None)
+                    generation = shared.get(GENERATION_KEY, 1)
+                return generation
+            except Exception as e:
+                logger.warning(f"Не удалось прочитать поколение кэша: {e}")
+        try:
+            return os.stat(config['STAMP_FILE']).st_mtime_ns
+        except OSError:
+            return 0
+
+    def bump_generation(self):
+        """Увеличивает поколение - все ранее сохраненные страницы устаревают"""
+        config = _get_config()
+        with self._lock:
+            self._entries.clear()
+
+        shared = self._shared(config)
+        if shared is not None:
+            try:
+                try:
+                    shared.incr(GENERATION_KEY)
+                except ValueError:
+                    shared.set(GENERATION_KEY, 1, timeout=None)
+            except Exception as e:
+                logger.warning(f"Не удалось обновить поколение кэша: {e}")
+
+        stamp_file = config['STAMP_FILE']
+        try:
+            os.makedirs(os.path.dirname(stamp_file), exist_ok=True)
+            with open(stamp_file, 'a'):
+                pass
+            os.utime(stamp_file, ns=(time.time_ns(), time.time_ns()))
+        except OSError as e:
+            logger.warning(f"Не удалось обновить файл-метку кэша {stamp_file}: {e}")
+
+    # --------------------
+    # Чтение и запись
+    # --------------------
+
+    def get(self, name):
+        """Возвращает (content, content_type) или None"""
+        config = _get_config()
+        generation = self.current_generation(config)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                entry_generation, expires_at, payload = entry
+                if entry_generation == generation and expires_at > now:
+                    self._entries.move_to_end(name)
+                    self.hits += 1
+                    return payload
+                del self._entries[name]
+
+        shared = self._shared(config)
+        if shared is not None:
+            try:
+                payload = shared.get(f'teddytale:page:{generation}:{name}')
+            except Exception as e:
+                logger.warning(f"Ошибка чтения общего кэша страниц: {e}")
+                payload = None
+            if payload is not None:
+                self._store_local(name, generation, payload, config)
+                with self._lock:
+                    self.shared_hits += 1
+                return payload
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, name, payload, generation):
+        """Сохраняет страницу, отрендеренную в поколении generation"""
+        config = _get_config()
+        if generation != self.current_generation(config):
+            # Контент изменился, пока страница рендерилась
+            return
+        self._store_local(name, generation, payload, config)
+
+        shared = self._shared(config)
+        if shared is not None:
+            try:
+                shared.set(f'teddytale:page:{generation}:{name}', payload,
+                           timeout=config['TIMEOUT'])
+            except Exception as e:
+                logger.warning(f"Ошибка записи в общий кэш страниц: {e}")
+
+    def _store_local(self, name, generation, payload, config):
+        expires_at = time.monotonic() + config['TIMEOUT']
+        with self._lock:
+            self._entries[name] = (generation, expires_at, payload)
+            self._entries.move_to_end(name)
+            while len(self._entries) > config['MAX_ENTRIES']:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+            }
+
+
+# Глобальный экземпляр (один на процесс)
+page_cache = PageCache()
+
+
+def cached_page(name):
+    """
+    Декоратор для представлений лендинга: отдает готовый HTML из кэша.
+    Кэшируются только успешные GET/HEAD ответы, не помеченные
+    как резервные (response.is_fallback).
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            config = _get_config()
+            if not config['ENABLED'] or request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+
+            payload = page_cache.get(name)
+            if payload is not None:
+                content, content_type = payload
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Page-Cache'] = 'HIT'
+                return response
+
+            generation = page_cache.current_generation(config)
+            response = view_func(request, *args, **kwargs)
+
+            if (response.status_code == 200
+                    and not getattr(response, 'is_fallback', False)
+                    and not getattr(response, 'streaming', False)):
+                page_cache.set(name, (response.content, response['Content-Type']),
+                               generation)
+            response['X-Page-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
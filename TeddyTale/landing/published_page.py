@@ -0,0 +1,286 @@
+# landing/published_page.py
+"""
+Опубликованный документ лендинга.
+
+При каждом изменении контента (AJAX-запросы кастомной админки,
+сохранения в Jazzmin) весь лендинг собирается в один JSON-документ
+и сохраняется в PublishedPage с увеличенной версией.
+
+При рендере главной страницы читается одна строка по первичному ключу,
+а если поколение кэша не менялось - документ берется из памяти процесса
+вообще без запросов к БД. Если БД недоступна, отдается последняя
+удачная версия документа.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connections, transaction, OperationalError
+from django.db.models import F
+
+from TeddyTale.circuit_breaker import db_circuit_breaker
+from TeddyTale.db_router import use_replica
+
+from teddy_admin.image_placeholders import get_placeholders_map
+from teddy_admin.image_variants import get_variants_map
+from teddy_admin.models import PublishedPage, ShopItem
+from .content_repository import load_page_content
+from .db_utils import safe_db_query
+from .page_cache import page_cache
+from .snapshot import read_snapshot, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Документ лендинга хранится в единственной строке
+PUBLISHED_PAGE_PK = 1
+
+
+def compile_document():
+    """Собирает документ лендинга из PageSection, SectionContent и ShopItem"""
+    page_content = load_page_content()
+    sections = {section_key: page_content.values(section_key)
+                for section_key in page_content}
+
+    shop_items = []
+    for item in (ShopItem.objects.filter(is_active=True)
+                 .order_by('slot_number')):
+        shop_items.append({
+            'id': item.id,
+            'slot_number': item.slot_number,
+            'title': item.title,
+            'description': item.description,
+            'price': item.price,
+            'image': ({'name': item.image.name, 'url': item.image.url}
+                      if item.image else None),
+        })
+
+    # Уменьшенные копии изображений для srcset (одним запросом)
+    image_sources = [item['image']['name'] for item in shop_items
+                     if item['image']]
+    for section_key in page_content:
+        image_sources.extend(
+            entry['value'] for entry in page_content.section(section_key).values()
+            if entry['content_type'] == 'image')
+
+    # Размеры и заглушки (LQIP) - для width/height и фона <img>
+    images = get_variants_map(image_sources)
+    for source, placeholder in get_placeholders_map(image_sources).items():
+        images.setdefault(source, {'variants': []}).update(placeholder)
+
+    return {
+        'sections': sections,
+        'shop_items': shop_items,
+        'images': images,
+    }
+
+
+@safe_db_query(idempotent=False)
+def publish():
+    """
+    Пересобирает документ и сохраняет его с новой версией.
+    Возвращает опубликованную запись PublishedPage.
+    """
+    with transaction.atomic():
+        page, _ = (PublishedPage.objects.select_for_update()
+                   .get_or_create(pk=PUBLISHED_PAGE_PK))
+        page.document = compile_document()
+        page.version = F('version') + 1
+        page.save()
+        page.refresh_from_db()
+
+    logger.info(f"Опубликован документ лендинга, версия {page.version}")
+    return page
+
+
+PublishedDocument = namedtuple('PublishedDocument',
+                               ['version', 'document', 'is_stale'])
+
+
+def _get_stale_config():
+    config = {
+        'LATENCY_BUDGET': 1.0,  # Секунды ожидания свежих данных из БД
+        'TTL': 30,  # Секунды, в течение которых не повторяем обновление
+    }
+    config.update(getattr(settings, 'STALE_CONTENT', {}))
+    return config
+
+
+class PublishedDocumentStore:
+    """
+    Кэш документа в памяти процесса, привязанный к поколению кэша страниц.
+
+    Работает по схеме stale-while-revalidate: если в процессе уже есть
+    последняя удачная версия документа (или снимок на диске после
+    холодного старта), обновление из БД выполняется в фоновом потоке.
+    Запрос ждет его не дольше LATENCY_BUDGET, а при ошибке или
+    превышении бюджета получает последнюю удачную версию с is_stale=True.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._version = None
+        self._published_at = None
+        self._document = None
+        self._is_live = False
+        self._snapshot_version = None
+        self._stale_until = 0
+        self._refresh_thread = None
+
+    def get(self):
+        """Возвращает PublishedDocument(version, document, is_stale)"""
+        generation = page_cache.current_generation()
+        with self._lock:
+            if (self._document is not None and self._is_live
+                    and self._generation == generation):
+                return PublishedDocument(self._version, self._document,
+                                         False)
+            last_good = self._document and (self._version, self._document)
+
+        if not last_good:
+            last_good = read_snapshot()
+        if not last_good:
+            if db_circuit_breaker.is_open():
+                raise OperationalError("Выключатель БД разомкнут")
+            # Нечего отдать взамен - читаем из БД синхронно
+            version, document = self._load(generation)
+            return PublishedDocument(version, document, False)
+
+        config = _get_stale_config()
+        if (time.monotonic() >= self._stale_until
+                and not db_circuit_breaker.is_open()):
+            refresh_thread = self._start_refresh()
+            refresh_thread.join(config['LATENCY_BUDGET'])
+            with self._lock:
+                if self._is_live and self._generation == generation:
+                    return PublishedDocument(self._version, self._document,
+                                             False)
+                if self._refresh_thread is not None:
+                    # БД не уложилась в бюджет - не ждем ее следующие запросы
+                    self._stale_until = time.monotonic() + config['TTL']
+
+        version, document = last_good
+        logger.warning(f"Лендинг отдается из последней удачной версии "
+                       f"документа ({version}), БД недоступна или медленная")
+        return PublishedDocument(version, document, True)
+
+    @safe_db_query
+    def _load(self, generation):
+        """Читает документ из БД и запоминает его"""
+        with use_replica():
+            page = PublishedPage.objects.filter(pk=PUBLISHED_PAGE_PK).first()
+        if page is None:
+            # Документ еще не публиковался (первый запуск)
+            page = publish()
+
+        with self._lock:
+            self._generation = generation
+            self._version = page.version
+            self._published_at = page.published_at
+            self._document = page.document
+            self._is_live = True
+            self._stale_until = 0
+            snapshot_is_stale = self._snapshot_version != page.version
+            self._snapshot_version = page.version
+
+        if snapshot_is_stale:
+            write_snapshot(page.version, page.document)
+        return page.version, page.document
+
+    def current_version(self):
+        """
+        Версия текущего документа и время публикации: (version, published_at).
+        Без загрузки документа - из памяти или одним запросом по первичному
+        ключу. Возвращает None, если версию узнать нельзя.
+        """
+        generation = page_cache.current_generation()
+        with self._lock:
+            if self._is_live and self._generation == generation:
+                return self._version, self._published_at
+
+        if db_circuit_breaker.is_open():
+            return None
+        with use_replica():
+            return (PublishedPage.objects.filter(pk=PUBLISHED_PAGE_PK)
+                    .values_list('version', 'published_at').first())
+
+    def _start_refresh(self):
+        with self._lock:
+            if self._refresh_thread is None:
+                self._refresh_thread = threading.Thread(
+                    target=self._refresh, name='landing-refresh', daemon=True)
+                self._refresh_thread.start()
+            return self._refresh_thread
+
+    def _refresh(self):
+        """Фоновое обновление документа из БД"""
+        try:
+            self._load(page_cache.current_generation())
+            db_circuit_breaker.record_success()
+            logger.info("Документ лендинга обновлен из БД")
+        except Exception as e:
+            logger.warning(f"Не удалось обновить документ лендинга из БД:"
+                           f" {e}")
+            db_circuit_breaker.record_failure()
+            with self._lock:
+                self._stale_until = (time.monotonic()
+                                     + _get_stale_config()['TTL'])
+        finally:
+            # У фонового потока собственные соединения - закрываем их
+            connections.close_all()
+            with self._lock:
+                self._refresh_thread = None
+
+    def clear(self):
+        """Помечает документ устаревшим (последняя версия остается запасной)"""
+        with self._lock:
+            self._generation = None
+            self._stale_until = 0
+
+
+document_store = PublishedDocumentStore()
+
+
+def get_published_document():
+    """Текущий документ лендинга: (version, document, is_stale)"""
+    return document_store.get()
+
+
+def get_published_version():
+    """Версия документа лендинга без его загрузки: (version, published_at)"""
+    return document_store.current_version()
+
+
+def mark_stale_response(response):
+    """
+    Помечает ответ, собранный из устаревшего документа: заголовок
+    X-Content-Stale и короткое время кэширования в браузере.
+    """
+    ttl = _get_stale_config()['TTL']
+    response['X-Content-Stale'] = '1'
+    response['Cache-Control'] = f'max-age={ttl}'
+    return response
+
+
+def _publish_on_commit():
+    try:
+        publish()
+    except Exception as e:
+        logger.error(f"Ошибка публикации документа лендинга: {e}",
+                     exc_info=True)
+    document_store.clear()
+    page_cache.bump_generation()
+
+
+def schedule_publish():
+    """
+    Планирует публикацию документа после фиксации текущей транзакции.
+    Несколько изменений в одной транзакции дают одну публикацию.
+    """
+    connection = transaction.get_connection()
+    if any(func is _publish_on_commit
+           for _, func, _ in connection.run_on_commit):
+        return
+    transaction.on_commit(_publish_on_commit)
@@ -0,0 +1,85 @@
+# landing/snapshot.py
+"""
+Снимок последнего успешно загруженного документа лендинга на диске.
+
+На бесплатном плане Render инстанс засыпает, и первый запрос после
+пробуждения ждет подключения к Supabase. Снимок позволяет сразу
+отдать главную и privacy, пока соединение с БД прогревается в фоне.
+
+Диск инстанса Render не переживает засыпание, поэтому при сборке
+(build.sh, команда seed_landing_snapshot) снимок сохраняется еще и
+в LANDING_SNAPSHOT_SEED_FILE - он входит в образ сборки. Если снимка
+текущего запуска нет, читается снимок сборки.
+"""
+import json
+import logging
+import os
+import tempfile
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _snapshot_path():
+    return getattr(settings, 'LANDING_SNAPSHOT_FILE',
+                   os.path.join(settings.BASE_DIR, 'cache',
+                                'landing_snapshot.json'))
+
+
+def _seed_path():
+    return getattr(settings, 'LANDING_SNAPSHOT_SEED_FILE', None)
+
+
+def read_snapshot():
+    """
+    Читает снимок с диска (если его нет - снимок сборки).
+    Возвращает (version, document) или None.
+    """
+    last_good = _read(_snapshot_path())
+    if last_good is None and _seed_path():
+        last_good = _read(_seed_path())
+    return last_good
+
+
+def _read(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return data['version'], data['document']
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Не удалось прочитать снимок лендинга {path}: {e}")
+        return None
+
+
+def write_snapshot(version, document, path=None):
+    """
+    Атомарно записывает снимок (временный файл + os.replace),
+    чтобы воркеры никогда не прочитали недописанный JSON.
+    path - другой файл снимка (снимок сборки). Возвращает True,
+    если снимок записан.
+    """
+    path = path or _snapshot_path()
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'version': version,
+                    'saved_at': time.time(),
+                    'document': document,
+                }, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        logger.debug(f"Снимок лендинга сохранен, версия {version}")
+        return True
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить снимок лендинга {path}: {e}")
+        return False
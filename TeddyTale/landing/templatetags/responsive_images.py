@@ -0,0 +1,78 @@
+# landing/templatetags/responsive_images.py
+"""
+Теги для адаптивных изображений лендинга.
+
+Варианты изображений берутся из документа лендинга (context['images']),
+поэтому при рендере страницы запросов к БД нет.
+
+Использование:
+    {% load responsive_images %}
+    <img src="{{ item.image.url }}" {% image_srcset item.image.name '280px' %}>
+    <img src="{{ hero_image|media_url }}" {% image_placeholder hero_image %}>
+    <img src="{{ hero_image|thumbnail:'400x300' }}">
+"""
+from django import template
+from django.utils.html import format_html
+
+from TeddyTale.media_storage import hashed_media_url
+from TeddyTale.media_thumbnails import thumbnail_url
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def image_srcset(context, source, sizes='100vw'):
+    """
+    Атрибуты srcset и sizes для изображения source (путь относительно
+    MEDIA_ROOT). Если вариантов нет - пустая строка, остается только src.
+    """
+    image = (context.get('images') or {}).get(source)
+    if not image or not image['variants']:
+        return ''
+
+    candidates = [f"{variant['url']} {variant['width']}w"
+                  for variant in image['variants']]
+    if image.get('width'):
+        # Оригинал - самый большой вариант
+        candidates.append(f"{hashed_media_url(source)} {image['width']}w")
+    return format_html('srcset="{}" sizes="{}"', ', '.join(candidates), sizes)
+
+
+@register.simple_tag(takes_context=True)
+def image_placeholder(context, source):
+    """
+    Атрибуты width/height (пропорции до загрузки, без сдвига макета)
+    и фон-заглушка (размытая копия или основной цвет) для source.
+    Фон рисуется только под содержимым (content-box): у картинок с
+    padding (.avatar) он не остается рамкой после загрузки.
+    """
+    image = (context.get('images') or {}).get(source)
+    if not image or not image.get('width') or not image.get('height'):
+        return ''
+
+    attributes = format_html('width="{}" height="{}"',
+                             image['width'], image['height'])
+    if image.get('placeholder'):
+        attributes += format_html(
+            ' style="background: {} url(\'{}\') center / cover no-repeat '
+            'content-box"',
+            image.get('color') or 'transparent', image['placeholder'])
+    elif image.get('color'):
+        attributes += format_html(' style="background: {} content-box"',
+                                  image['color'])
+    return attributes
+
+
+@register.filter
+def media_url(path):
+    """URL файла из MEDIA_ROOT с хешем содержимого (кэшируется навсегда)"""
+    return hashed_media_url(path) if path else ''
+
+
+@register.filter
+def thumbnail(path, size):
+    """URL миниатюры файла из MEDIA_ROOT, size - строка вида '400x300'"""
+    if not path:
+        return ''
+    width, _, height = str(size).partition('x')
+    return thumbnail_url(path, int(width), int(height))
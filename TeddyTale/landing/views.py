@@ -2,25 +2,38 @@ import logging
 
 from django.shortcuts import render
 from django.http import HttpResponse, HttpResponseServerError
-from teddy_admin.models import PageSection, SectionContent, ShopItem
-from .db_utils import safe_db_query  # Импортируем декоратор для безопасных запросов
+from TeddyTale.circuit_breaker import db_optional
+from .conditional import conditional_page  # ETag / Last-Modified и ответ 304
+from .page_cache import cached_page  # Кэш готовых HTML-страниц
+from .published_page import get_published_document, mark_stale_response  # Документ лендинга одной строкой
 
 # Настройка логгера для отслеживания ошибок
 logger = logging.getLogger(__name__)
 
-@safe_db_query
+@db_optional
+@conditional_page('index')
+@cached_page('index')
 def index(request):
     """
     Обработчик главной страницы с динамическим контентом
     Использует безопасные значения по умолчанию и подробное логирование
     """
     context = {}
+    is_stale = False
 
     try:
+        # Берем опубликованный документ лендинга (одна строка из БД
+        # или вообще без запроса, если контент не менялся).
+        # Если БД недоступна - последняя удачная версия документа
+        # (при холодном старте - снимок на диске).
+        published = get_published_document()
+        is_stale = published.is_stale
+        document = published.document
+        sections = document['sections']
+
         # 1. Мета-информация (для <title> и мета-тегов)
-        meta_section = PageSection.objects.filter(section_key='meta').first()
-        if meta_section:
-            meta_contents = {c.content_key: c.value for c in meta_section.contents.all()}
+        if 'meta' in sections:
+            meta_contents = sections['meta']
             context['meta_title'] = meta_contents.get('title', 'Мишки Тедди ручной работы')
             context['meta_description'] = meta_contents.get('description',
                                                             'Авторские мишки Тедди ручной работы для вашей коллекции. ' +
@@ -35,9 +48,8 @@ def index(request):
             context['meta_keywords'] = 'коллекционные мишки тедди, авторский мишка тедди'
 
         # 2. Hero-секция (главный баннер)
-        hero_section = PageSection.objects.filter(section_key='hero').first()
-        if hero_section:
-            hero_contents = {c.content_key: c.value for c in hero_section.contents.all()}
+        if 'hero' in sections:
+            hero_contents = sections['hero']
             context['hero_title'] = hero_contents.get('titleHero', 'Уникальные мишки Тедди с душой')
             context['hero_description'] = hero_contents.get('descriptionHero',
                                                             'Ручная работа, наполненная теплом и заботой. ' +
@@ -50,8 +62,10 @@ def index(request):
             context['hero_image'] = ''
 
         # 3. Товары магазина - ОСНОВНОЕ ИЗМЕНЕНИЕ
-        shop_items = list(ShopItem.objects.filter(is_active=True).order_by('slot_number'))
+        shop_items = document['shop_items']
         context['shop_items'] = shop_items
+        # Варианты изображений для srcset (в старых снимках их нет)
+        context['images'] = document.get('images', {})
 
         # Определяем, сколько товаров из БД
         db_items_count = len(shop_items)
@@ -86,9 +100,8 @@ def index(request):
         logger.debug(f"Показывать заглушки: {placeholder_count > 0}, количество: {placeholder_count}")
 
         # 4. Секция "О мастере"
-        about_section = PageSection.objects.filter(section_key='about').first()
-        if about_section:
-            about_contents = {c.content_key: c.value for c in about_section.contents.all()}
+        if 'about' in sections:
+            about_contents = sections['about']
             context['about_title1'] = about_contents.get('aboutTitleBlock1', 'История мастера')
             context['about_description1'] = about_contents.get('aboutDescriptionBlock1',
                                                                'Добро пожаловать в мой мир handmade-творчества! Уже более 5 лет я создаю ' +
@@ -137,11 +150,9 @@ def index(request):
         # Добавляем все значения по умолчанию в контекст
         context.update(default_contacts)
 
-        # Пытаемся получить данные из базы
-        contacts_section = PageSection.objects.filter(section_key='contacts').first()
-
-        if contacts_section:
-            contacts_contents = {c.content_key: c.value for c in contacts_section.contents.all()}
+        # Берем данные из загруженного контента
+        if 'contacts' in sections:
+            contacts_contents = sections['contacts']
 
             if contacts_contents:  # Если в секции есть данные
                 # Обновляем только те поля, которые есть в базе
@@ -198,9 +209,16 @@ def index(request):
 
         logger.warning("Используется резервный режим с безопасными значениями")
 
-    return render(request, 'index.html', context)
+    response = render(request, 'index.html', context)
+    if is_stale:
+        mark_stale_response(response)
+    # Резервную страницу и устаревший контент не кэшируем
+    response.is_fallback = context.get('static_fallback', False) or is_stale
+    return response
 
-@safe_db_query
+@db_optional
+@conditional_page('privacy')
+@cached_page('privacy')
 def privacy(request):
     """
     Обработчик для страницы политики конфиденциальности
@@ -218,14 +236,18 @@ def privacy(request):
     }
 
     context = {}
+    is_stale = False
+    is_fallback = False
 
     try:
-        # Пытаемся получить контакты из базы данных
-        contacts_section = PageSection.objects.filter(section_key='contacts').first()
+        # Пытаемся получить контакты из опубликованного документа
+        published = get_published_document()
+        is_stale = published.is_stale
+        sections = published.document['sections']
 
-        if contacts_section:
+        if 'contacts' in sections:
             # Получаем содержимое секции контактов
-            contacts_contents = {c.content_key: c.value for c in contacts_section.contents.all()}
+            contacts_contents = sections['contacts']
 
             # Обновляем контекст данными из базы
             context['contacts_city'] = contacts_contents.get('contactsCity', default_contacts['contacts_city'])
@@ -249,9 +271,14 @@ def privacy(request):
         logger.error(f"Ошибка при загрузке контактов для страницы privacy: {str(e)}",
                      exc_info=True, stack_info=True)
         context.update(default_contacts)
+        is_fallback = True
         logger.warning("Используются резервные данные контактов для страницы privacy")
 
-    return render(request, 'privacy.html', context)
+    response = render(request, 'privacy.html', context)
+    if is_stale:
+        mark_stale_response(response)
+    response.is_fallback = is_fallback or is_stale
+    return response
 
 def page_not_found(request, exception):
     """Обработчик для ошибки 404"""
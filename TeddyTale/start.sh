@@ -42,16 +42,24 @@ if [ ! -d "staticfiles" ] || [ -z "$(ls -A staticfiles/ 2>/dev/null)" ]; then
     python manage.py collectstatic --noinput
 fi
 
-# 3. ПРИМЕНЕНИЕ МИГРАЦИЙ БАЗЫ ДАННЫХ
-echo "3. 🗄️  Проверка миграций..."
-python manage.py showmigrations --list 2>/dev/null || true
-
-echo "   Применение миграций к Supabase..."
-python manage.py migrate --noinput
-
-# 4. СОЗДАНИЕ АДМИНИСТРАТОРА (если не существует)
-echo "4. 👑 Создание администратора..."
-python manage.py shell -c "
+# Каждый шаг с базой данных ограничен DB_STEP_TIMEOUT секундами,
+# ошибки не останавливают сервер: если Supabase недоступна, сайт отдает
+# лендинг из снимка (landing/snapshot.py)
+DB_STEP_TIMEOUT="${DB_STEP_TIMEOUT:-120}"
+
+# 3. МИГРАЦИИ (до запуска сервера)
+# Схема должна соответствовать коду до первого запроса: иначе записи
+# админки и publish() падают на старой схеме. Без новых миграций
+# migrate выполняется быстро (--fake-initial - см. build.sh)
+echo "3. 🗄️  Применение миграций к Supabase..."
+timeout "$DB_STEP_TIMEOUT" python manage.py migrate --noinput --fake-initial \
+    || echo "⚠️  Миграции не применены (БД недоступна?)"
+
+# 4-5. НАЧАЛЬНЫЕ ДАННЫЕ (в фоне, после запуска сервера)
+# Вывод шагов - в logs/startup_db.log
+db_setup() {
+    echo "4. 👑 Создание администратора..."
+    timeout "$DB_STEP_TIMEOUT" python manage.py shell -c "
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
@@ -70,11 +78,10 @@ if not admins.exists():
 else:
     print('✅ Администратор уже существует')
     print(f'   Найдено {admins.count()} администратор(ов)')
-"
+" || echo "⚠️  Администратор не проверен"
 
-# 5. СОЗДАНИЕ БАЗОВЫХ ДАННЫХ (если нужно)
-echo "5. 📝 Инициализация базы данных..."
-python manage.py shell -c "
+    echo "5. 📝 Инициализация базы данных..."
+    timeout "$DB_STEP_TIMEOUT" python manage.py shell -c "
 try:
     from teddy_admin.models import PageSection, SectionContent
 
@@ -96,7 +103,11 @@ try:
 
 except Exception as e:
     print(f'ℹ️  Модели teddy_admin не настроены: {e}')
-"
+" || echo "⚠️  Базовые данные не проверены"
+}
+
+echo "4-5. 📝 Начальные данные - в фоне (logs/startup_db.log)"
+db_setup > logs/startup_db.log 2>&1 &
 
 # 6. ЗАПУСК СЕРВЕРА С АНТИ-СПЯЩИМ РЕЖИМОМ
 echo "6. ⚡ Запуск сервера с настройками против 'засыпания'..."
@@ -134,8 +145,12 @@ echo "=========================================="
 # 2. --timeout 120 - увеличенный таймаут для тяжелых операций
 # 3. 2 воркера + 2 потока - оптимально для бесплатного плана
 # 4. keep-alive 5 - короткое время keep-alive
+# 5. gunicorn.conf.py - сброс и прогрев пула соединений с БД в каждом воркере
+# 6. В access.log пишется время ответа в миллисекундах (последнее поле),
+#    гистограммы по представлениям - на /metrics
 
 exec gunicorn TeddyTale.wsgi:application \
+    --config gunicorn.conf.py \
     --bind 0.0.0.0:${PORT:-8000} \
     --workers 2 \
     --threads 2 \
@@ -144,6 +159,7 @@ exec gunicorn TeddyTale.wsgi:application \
     --keepalive 5 \
     --preload \
     --access-logfile logs/access.log \
+    --access-logformat '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %(M)sms' \
     --error-logfile logs/error.log \
     --log-level info \
     --capture-output
\ No newline at end of file
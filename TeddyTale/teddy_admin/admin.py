@@ -2,9 +2,13 @@ from django.contrib import admin
 from django.contrib import messages
 from django.utils.html import format_html
 from django.db import transaction, OperationalError
+from TeddyTale.media_thumbnails import thumbnail_url
 from .models import *
 import time
 
+# Превью 50x50 в списках: миниатюра с запасом для экранов высокой плотности
+PREVIEW_SIZE = (100, 100)
+
 class SectionContentInline(admin.TabularInline):
     model = SectionContent
     extra = 0
@@ -27,6 +31,9 @@ class ShopItemAdmin(admin.ModelAdmin):
     list_filter = ['is_active']
     search_fields = ['title', 'description']
     ordering = ['slot_number']
+    # Заполняются при загрузке и фоновой обработкой изображения
+    readonly_fields = ['image_sha256', 'image_width', 'image_height',
+                       'image_color', 'image_placeholder']
 
     # Оптимизация для Supabase
     list_per_page = 15  # Уменьшаем для уменьшения нагрузки
@@ -42,7 +49,8 @@ class ShopItemAdmin(admin.ModelAdmin):
     def image_preview(self, obj):
         if obj.image:
             return format_html('<img src="{}" width="50" height="50" '
-                               'style="object-fit: cover;" />', obj.image.url)
+                               'style="object-fit: cover;" />',
+                               thumbnail_url(obj.image.name, *PREVIEW_SIZE))
         return "Нет изображения"
     image_preview.short_description = 'Превью'
 
@@ -151,10 +159,13 @@ class UploadedImageAdmin(admin.ModelAdmin):
     list_filter = ['is_active', 'section_type']
     search_fields = ['original_filename', 'stored_filename']
     ordering = ['uploaded_at', 'last_accessed']
+    readonly_fields = ['sha256', 'width', 'height', 'dominant_color',
+                       'placeholder']
 
     def image_preview(self, obj):
-        return format_html('<img src="/media/{}" width="50" height="50"'
-                           ' style="object-fit: cover;" />', obj.file_path)
+        return format_html('<img src="{}" width="50" height="50"'
+                           ' style="object-fit: cover;" />',
+                           thumbnail_url(obj.file_path, *PREVIEW_SIZE))
     image_preview.short_description = 'Превью'
 
 @admin.register(SiteSettings)
@@ -200,11 +211,59 @@ class SectionContentAdmin(admin.ModelAdmin):
     def value_preview(self, obj):
         if obj.value:
             if obj.content_type == 'image':
-                return format_html('<img src="/media/{}" width="50"'
-                                   ' height="50" />', obj.value)
+                return format_html('<img src="{}" width="50"'
+                                   ' height="50" />',
+                                   thumbnail_url(obj.value, *PREVIEW_SIZE))
             value = obj.value
             if len(value) > 50:
                 return value[:50] + '...'
             return value
         return "Не задано"
-    value_preview.short_description = 'Значение'
\ No newline at end of file
+    value_preview.short_description = 'Значение'
+
+@admin.register(PublishedPage)
+class PublishedPageAdmin(admin.ModelAdmin):
+    list_display = ['version', 'published_at']
+    readonly_fields = ['version', 'document', 'published_at']
+
+    def has_add_permission(self, request):
+        # документ собирается автоматически при изменении контента
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ImageVariant)
+class ImageVariantAdmin(admin.ModelAdmin):
+    list_display = ['source', 'width', 'height', 'file_size', 'created_at']
+    search_fields = ['source']
+    readonly_fields = ['source', 'width', 'height', 'source_width',
+                       'source_height', 'file_path', 'file_size',
+                       'mime_type', 'created_at']
+
+    def has_add_permission(self, request):
+        # варианты создаются автоматически при загрузке изображений
+        return False
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'attempts', 'created_at',
+                    'finished_at']
+    list_filter = ['status', 'kind']
+    readonly_fields = ['kind', 'payload', 'status', 'result', 'error',
+                       'attempts', 'created_at', 'started_at', 'finished_at']
+
+    def has_add_permission(self, request):
+        # задачи создаются при загрузке изображений
+        return False
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['file_path', 'size', 'refcount', 'created_at']
+    search_fields = ['file_path', 'sha256']
+    readonly_fields = ['sha256', 'file_path', 'size', 'refcount',
+                       'created_at']
+
+    def has_add_permission(self, request):
+        # файлы регистрируются при загрузке изображений
+        return False
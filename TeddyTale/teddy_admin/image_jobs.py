@@ -0,0 +1,348 @@
+# teddy_admin/image_jobs.py
+"""
+Фоновая обработка загруженных изображений.
+
+Загрузка в админке только сохраняет файл и ставит задачу в очередь:
+извлечение размеров и заглушки (LQIP), создание вариантов для srcset
+и копий в AVIF/WebP, удаление старых файлов и публикация документа
+лендинга выполняются в ограниченном пуле потоков (IMAGE_JOBS['WORKERS']),
+не занимая потоки gunicorn.
+
+Задачи хранятся в памяти процесса. С IMAGE_JOBS['PERSIST'] они
+записываются в ImageJob и после перезапуска воркера выполняются
+заново (start_recovery в gunicorn.conf.py).
+"""
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def _get_config():
+    config = {
+        'WORKERS': 1,  # Потоков обработки на процесс
+        'MAX_PENDING': 16,  # Задач в очереди; сверх - выполняются сразу
+        'PERSIST': False,  # Хранить задачи в БД (ImageJob)
+        'KEEP_FINISHED': 100,  # Завершенных задач в памяти для статуса
+        'STALE_AFTER': 600,  # Секунды, после которых running считается потерянной
+    }
+    config.update(getattr(settings, 'IMAGE_JOBS', {}))
+    return config
+
+
+_handlers = {}
+
+
+def job_handler(kind):
+    """Регистрирует обработчик задач типа kind"""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+class Job:
+    """Задача в памяти процесса"""
+
+    def __init__(self, job_id, kind, payload):
+        self.id = job_id
+        self.kind = kind
+        self.payload = payload
+        self.status = PENDING
+        self.result = None
+        self.error = ''
+        self.created_at = timezone.now()
+        self.finished_at = None
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': (self.finished_at.isoformat()
+                            if self.finished_at else None),
+        }
+
+
+class ImageJobQueue:
+    """Очередь задач с ограниченным пулом потоков (один экземпляр на процесс)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._jobs = OrderedDict()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.inline = 0
+
+    def _get_executor(self, config):
+        with self._lock:
+            # После fork пул потоков родителя не работает
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=config['WORKERS'],
+                    thread_name_prefix='image-job')
+                self._slots = threading.BoundedSemaphore(config['MAX_PENDING'])
+                self._pid = os.getpid()
+            return self._executor
+
+    # --------------------
+    # Постановка задач
+    # --------------------
+
+    def _create(self, kind, payload, config):
+        if kind not in _handlers:
+            raise ValueError(f"Неизвестный тип задачи: {kind}")
+
+        if config['PERSIST']:
+            from .models import ImageJob
+            job_id = str(ImageJob.objects.create(kind=kind, payload=payload).pk)
+        else:
+            job_id = uuid.uuid4().hex
+
+        with self._lock:
+            self._jobs[job_id] = Job(job_id, kind, payload)
+            self.submitted += 1
+        return job_id
+
+    def _dispatch(self, job_id):
+        config = _get_config()
+        executor = self._get_executor(config)
+        if self._slots.acquire(blocking=False):
+            executor.submit(self._run_in_pool, job_id)
+        else:
+            # Очередь переполнена - не копим задачи, выполняем сразу
+            logger.warning(f"Очередь изображений переполнена, задача "
+                           f"{job_id} выполняется синхронно")
+            with self._lock:
+                self.inline += 1
+            self._run(job_id)
+
+    def submit(self, kind, **payload):
+        """Ставит задачу в очередь и возвращает ее id"""
+        job_id = self._create(kind, payload, _get_config())
+        self._dispatch(job_id)
+        return job_id
+
+    def submit_on_commit(self, kind, **payload):
+        """
+        Ставит задачу в очередь после фиксации текущей транзакции
+        (обработчик должен видеть сохраненные записи). id - сразу.
+        """
+        job_id = self._create(kind, payload, _get_config())
+        transaction.on_commit(lambda: self._dispatch(job_id))
+        return job_id
+
+    # --------------------
+    # Выполнение
+    # --------------------
+
+    def _run_in_pool(self, job_id):
+        try:
+            self._run(job_id)
+        finally:
+            self._slots.release()
+            # У потока пула собственные соединения - возвращаем их
+            connections.close_all()
+
+    def _run(self, job_id):
+        config = _get_config()
+        with self._lock:
+            job = self._jobs.get(job_id)
+
+        if config['PERSIST']:
+            from .models import ImageJob
+            # Задачу из БД мог уже взять другой воркер
+            claimed = ImageJob.objects.filter(pk=job_id, status=PENDING).update(
+                status=RUNNING, started_at=timezone.now(),
+                attempts=F('attempts') + 1)
+            if not claimed:
+                return
+            if job is None:
+                record = ImageJob.objects.get(pk=job_id)
+                job = Job(job_id, record.kind, record.payload)
+                with self._lock:
+                    self._jobs[job_id] = job
+
+        job.status = RUNNING
+        try:
+            job.result = _handlers[job.kind](**job.payload)
+            job.status = DONE
+        except Exception as e:
+            logger.error(f"Ошибка задачи {job.kind} {job_id}: {e}",
+                         exc_info=True)
+            job.status = FAILED
+            job.error = str(e)
+        job.finished_at = timezone.now()
+
+        with self._lock:
+            if job.status == DONE:
+                self.completed += 1
+            else:
+                self.failed += 1
+            self._trim(config)
+
+        if config['PERSIST']:
+            ImageJob.objects.filter(pk=job_id).update(
+                status=job.status, result=job.result, error=job.error,
+                finished_at=job.finished_at)
+
+    def _trim(self, config):
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job.status in (DONE, FAILED)]
+        for job_id in finished[:max(0, len(finished) - config['KEEP_FINISHED'])]:
+            del self._jobs[job_id]
+
+    # --------------------
+    # Статус и восстановление
+    # --------------------
+
+    def get(self, job_id):
+        """Состояние задачи (словарь) или None"""
+        if _get_config()['PERSIST'] and str(job_id).isdigit():
+            # Задачу мог выполнить другой воркер - статус берем из БД
+            from .models import ImageJob
+            record = ImageJob.objects.filter(pk=job_id).first()
+            if record is not None:
+                return {
+                    'id': str(record.pk),
+                    'kind': record.kind,
+                    'status': record.status,
+                    'result': record.result,
+                    'error': record.error,
+                    'created_at': record.created_at.isoformat(),
+                    'finished_at': (record.finished_at.isoformat()
+                                    if record.finished_at else None),
+                }
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job.as_dict() if job is not None else None
+
+    def recover(self):
+        """Снова ставит в очередь незавершенные задачи из БД"""
+        from .models import ImageJob
+
+        config = _get_config()
+        stale_before = timezone.now() - timedelta(seconds=config['STALE_AFTER'])
+        ImageJob.objects.filter(status=RUNNING,
+                                started_at__lt=stale_before).update(
+            status=PENDING)
+
+        job_ids = [str(pk) for pk in ImageJob.objects.filter(status=PENDING)
+                   .order_by('created_at').values_list('pk', flat=True)]
+        for job_id in job_ids:
+            self._dispatch(job_id)
+        if job_ids:
+            logger.info(f"Восстановлено задач обработки изображений: "
+                        f"{len(job_ids)}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': sum(job.status == PENDING
+                              for job in self._jobs.values()),
+                'running': sum(job.status == RUNNING
+                               for job in self._jobs.values()),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'inline': self.inline,
+            }
+
+
+# Глобальный экземпляр (один на процесс)
+image_job_queue = ImageJobQueue()
+
+
+def start_recovery():
+    """Восстанавливает задачи из БД в фоне (хук воркера gunicorn)"""
+    config = _get_config()
+    if not config['PERSIST']:
+        return
+    image_job_queue._get_executor(config).submit(_recover_in_pool)
+
+
+def _recover_in_pool():
+    try:
+        image_job_queue.recover()
+    except Exception as e:
+        logger.warning(f"Не удалось восстановить задачи изображений: {e}")
+    finally:
+        connections.close_all()
+
+
+# --------------------
+# Обработчики задач
+# --------------------
+
+@job_handler('process_image')
+def process_image(source, old_sources=()):
+    """
+    Обработка загруженного изображения: размеры и заглушка, варианты
+    для srcset, удаление замененных файлов и публикация документа лендинга.
+    """
+    from landing.published_page import schedule_publish
+    from .image_placeholders import store_placeholder
+    from .image_transcodes import generate_transcodes
+    from .image_variants import generate_variants
+    from .media_store import release
+
+    # Записи ShopItem / UploadedImage находятся по пути файла
+    result = {'source': source}
+
+    # Размеры и заглушка (LQIP) для записей ShopItem / UploadedImage
+    placeholder = store_placeholder(source)
+    if placeholder is not None:
+        result.update(width=placeholder['width'],
+                      height=placeholder['height'])
+
+    variants = generate_variants(source)
+    result['variants'] = [variant.width for variant in variants]
+
+    # Копии в AVIF/WebP для исходника и каждого варианта
+    result['transcodes'] = len(generate_transcodes(source))
+    for variant in variants:
+        result['transcodes'] += len(generate_transcodes(variant.file_path))
+
+    # Снимаем ссылки с замененных файлов (тот же файл при повторной
+    # загрузке получил новую ссылку и не удалится)
+    result['removed'] = [old for old in old_sources if old and release(old)]
+
+    # Новые srcset попадают в документ лендинга
+    schedule_publish()
+    return result
+
+
+@job_handler('cleanup')
+def cleanup_files(paths):
+    """Снимает ссылки с файлов; файлы без ссылок удаляются с вариантами"""
+    from .media_store import release
+
+    return {'removed': [path for path in paths if path and release(path)]}
+
+
+def get_image_job_stats():
+    """Статистика очереди текущего процесса"""
+    return image_job_queue.stats()
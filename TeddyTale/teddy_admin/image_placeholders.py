@@ -0,0 +1,126 @@
+# teddy_admin/image_placeholders.py
+"""
+Заглушки изображений (LQIP) для лендинга.
+
+Для каждого загруженного изображения фоновая задача считает крошечную
+размытую копию (data URI на несколько сотен байт) и основной цвет и
+сохраняет их в записи ShopItem / UploadedImage вместе с размерами.
+В index.html заглушка становится фоном <img>, а width/height задают
+пропорции до загрузки файла - страница не прыгает.
+
+Изображениям с прозрачностью фон не задается: он остался бы виден
+сквозь прозрачные области и после загрузки.
+"""
+import base64
+import io
+import logging
+import os
+
+from django.conf import settings
+from PIL import Image, ImageFilter, ImageOps
+
+from .models import ShopItem, UploadedImage
+
+logger = logging.getLogger(__name__)
+
+_EXIF_ORIENTATION = 0x0112
+
+
+def _get_config():
+    config = {
+        'ENABLED': True,
+        'WIDTH': 16,  # Ширина заглушки в пикселях
+        'QUALITY': 40,
+        'BLUR_RADIUS': 1,
+    }
+    config.update(getattr(settings, 'IMAGE_PLACEHOLDERS', {}))
+    return config
+
+
+def _is_opaque(image):
+    if 'A' not in image.getbands():
+        return 'transparency' not in image.info
+    return image.getchannel('A').getextrema()[0] == 255
+
+
+def compute_placeholder(source):
+    """
+    Размеры, заглушка и основной цвет изображения source (путь
+    относительно MEDIA_ROOT): {'width', 'height', 'placeholder', 'color'}
+    или None, если файл не удалось открыть.
+    """
+    config = _get_config()
+    full_path = os.path.join(settings.MEDIA_ROOT, source)
+    try:
+        with Image.open(full_path) as image:
+            width, height = image.size
+            if image.getexif().get(_EXIF_ORIENTATION, 1) in (5, 6, 7, 8):
+                # Изображение повернуто на 90 градусов
+                width, height = height, width
+            # JPEG сразу декодируется в уменьшенном виде
+            image.draft('RGB', (config['WIDTH'] * 4, config['WIDTH'] * 4))
+            image = ImageOps.exif_transpose(image)
+            opaque = _is_opaque(image)
+            image = image.convert('RGB')
+    except Exception as e:
+        logger.warning(f"Не удалось построить заглушку {source}: {e}")
+        return None
+
+    result = {'width': width, 'height': height,
+              'placeholder': '', 'color': ''}
+    if not opaque or not config['ENABLED']:
+        return result
+
+    r, g, b = image.resize((1, 1), Image.BOX).getpixel((0, 0))
+    result['color'] = f"#{r:02x}{g:02x}{b:02x}"
+
+    small_height = max(1, round(height * config['WIDTH'] / width))
+    small = image.resize((config['WIDTH'], small_height), Image.BOX)
+    small = small.filter(ImageFilter.GaussianBlur(config['BLUR_RADIUS']))
+    buffer = io.BytesIO()
+    small.save(buffer, 'WEBP', quality=config['QUALITY'])
+    encoded = base64.b64encode(buffer.getvalue()).decode('ascii')
+    result['placeholder'] = f"data:image/webp;base64,{encoded}"
+    return result
+
+
+def store_placeholder(source):
+    """Считает заглушку и записывает ее во все записи с этим файлом"""
+    result = compute_placeholder(source)
+    if result is None:
+        return None
+
+    ShopItem.objects.filter(image=source).update(
+        image_width=result['width'], image_height=result['height'],
+        image_placeholder=result['placeholder'], image_color=result['color'])
+    UploadedImage.objects.filter(file_path=source).update(
+        width=result['width'], height=result['height'],
+        placeholder=result['placeholder'], dominant_color=result['color'])
+    return result
+
+
+def get_placeholders_map(sources):
+    """
+    Размеры и заглушки для набора изображений (два запроса):
+    source -> {'width', 'height', 'placeholder', 'color'}
+    """
+    sources = [source for source in set(sources) if source]
+    if not sources:
+        return {}
+
+    placeholders = {}
+    for path, width, height, placeholder, color in (
+            UploadedImage.objects.filter(file_path__in=sources,
+                                         width__isnull=False)
+            .values_list('file_path', 'width', 'height', 'placeholder',
+                         'dominant_color')):
+        placeholders[path] = {'width': width, 'height': height,
+                              'placeholder': placeholder, 'color': color}
+    for path, width, height, placeholder, color in (
+            ShopItem.objects.filter(image__in=sources,
+                                    image_width__isnull=False)
+            .values_list('image', 'image_width', 'image_height',
+                         'image_placeholder', 'image_color')):
+        placeholders[path] = {'width': width, 'height': height,
+                              'placeholder': placeholder, 'color': color}
+    return placeholders
@@ -0,0 +1,167 @@
+# teddy_admin/image_transcodes.py
+"""
+Копии изображений в более компактных форматах (AVIF, WebP).
+
+Для каждого загруженного изображения и его вариантов создаются копии
+того же размера в форматах из IMAGE_TRANSCODING['FORMATS'], у каждого
+свое качество и бюджет в байтах. Если копия не укладывается в бюджет,
+качество снижается до MIN_QUALITY; копия, которая не меньше
+исходного файла, не сохраняется.
+
+Копии лежат по пути <DIR>/<исходный путь>.<формат>, без записей в БД:
+отдача медиа (TeddyTale/media_views.py) выбирает формат по заголовку
+Accept и проверяет наличие файла.
+"""
+import logging
+import os
+
+from django.conf import settings
+from PIL import Image, ImageOps, features
+
+from TeddyTale.media_files import register_media_file
+
+logger = logging.getLogger(__name__)
+
+# Формат Pillow -> (расширение, MIME-тип)
+FORMATS = {
+    'AVIF': ('avif', 'image/avif'),
+    'WEBP': ('webp', 'image/webp'),
+}
+# Исходные форматы, которые имеет смысл перекодировать
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def _get_config():
+    config = {
+        'ENABLED': True,
+        # В порядке предпочтения: первый поддерживаемый клиентом
+        'FORMATS': {
+            'AVIF': {'QUALITY': 50, 'MAX_BYTES': 150 * 1024},
+            'WEBP': {'QUALITY': 80, 'MAX_BYTES': 250 * 1024},
+        },
+        'MIN_QUALITY': 30,
+        'QUALITY_STEP': 10,
+        'DIR': 'transcodes',
+    }
+    config.update(getattr(settings, 'IMAGE_TRANSCODING', {}))
+    return config
+
+
+def supported_formats():
+    """Форматы из настроек, которые умеет кодировать установленный Pillow"""
+    config = _get_config()
+    if not config['ENABLED']:
+        return []
+    return [image_format for image_format in config['FORMATS']
+            if image_format in FORMATS
+            and features.check(FORMATS[image_format][0])]
+
+
+def transcode_path(source, image_format):
+    """Путь копии относительно MEDIA_ROOT"""
+    config = _get_config()
+    return f"{config['DIR']}/{source}.{FORMATS[image_format][0]}"
+
+
+def get_transcodes(source):
+    """
+    Копии изображения, которые есть на диске, в порядке предпочтения:
+    [(MIME-тип, путь относительно MEDIA_ROOT), ...]
+    """
+    if not source.lower().endswith(SOURCE_EXTENSIONS):
+        return []
+    transcodes = []
+    for image_format in supported_formats():
+        path = transcode_path(source, image_format)
+        if os.path.isfile(os.path.join(settings.MEDIA_ROOT, path)):
+            transcodes.append((FORMATS[image_format][1], path))
+    return transcodes
+
+
+def _encode(image, image_format, full_path, options, min_quality, step):
+    """Сохраняет с наибольшим качеством, укладывающимся в бюджет"""
+    quality = options['QUALITY']
+    while True:
+        image.save(full_path, image_format, quality=quality)
+        size = os.path.getsize(full_path)
+        if size <= options['MAX_BYTES'] or quality - step < min_quality:
+            return size, quality
+        quality -= step
+
+
+def generate_transcodes(source, force=False):
+    """
+    Создает копии source (путь относительно MEDIA_ROOT) в форматах
+    из настроек. Возвращает список созданных или уже существующих путей.
+    """
+    config = _get_config()
+    if not source or not source.lower().endswith(SOURCE_EXTENSIONS):
+        return []
+
+    source_path = os.path.join(settings.MEDIA_ROOT, source)
+    try:
+        source_size = os.path.getsize(source_path)
+    except OSError:
+        logger.warning(f"Исходное изображение не найдено: {source_path}")
+        return []
+
+    paths = []
+    image = None
+    source_format = None
+    try:
+        for image_format in supported_formats():
+            path = transcode_path(source, image_format)
+            full_path = os.path.join(settings.MEDIA_ROOT, path)
+            if not force and os.path.isfile(full_path):
+                paths.append(path)
+                continue
+
+            if image is None:
+                with Image.open(source_path) as opened:
+                    source_format = opened.format
+                    image = ImageOps.exif_transpose(opened)
+                    if image.mode not in ('RGB', 'RGBA'):
+                        has_alpha = ('A' in image.getbands()
+                                     or 'transparency' in image.info)
+                        image = image.convert('RGBA' if has_alpha else 'RGB')
+            if image_format == source_format:
+                continue
+
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            # Пишем рядом и переименовываем: недописанный файл не отдается
+            tmp_path = f"{full_path}.tmp"
+            size, quality = _encode(image, image_format, tmp_path,
+                                    config['FORMATS'][image_format],
+                                    config['MIN_QUALITY'],
+                                    config['QUALITY_STEP'])
+            if size >= source_size:
+                # Копия не меньше исходника - отдаем исходник
+                os.remove(tmp_path)
+                if os.path.exists(full_path):
+                    os.remove(full_path)
+                logger.info(f"{image_format} для {source} не меньше "
+                            f"исходника ({size} >= {source_size}), пропущено")
+                continue
+
+            os.replace(tmp_path, full_path)
+            register_media_file(path)
+            paths.append(path)
+            logger.info(f"{image_format} для {source}: {size} байт "
+                        f"(качество {quality}, исходник {source_size})")
+    except Exception as e:
+        logger.error(f"Ошибка перекодирования {source}: {e}")
+    return paths
+
+
+def delete_transcodes(source):
+    """Удаляет копии изображения source во всех форматах"""
+    if not source:
+        return
+    for image_format in FORMATS:
+        full_path = os.path.join(settings.MEDIA_ROOT,
+                                 transcode_path(source, image_format))
+        try:
+            if os.path.exists(full_path):
+                os.remove(full_path)
+        except OSError as e:
+            logger.error(f"Ошибка при удалении копии {full_path}: {e}")
@@ -0,0 +1,170 @@
+# teddy_admin/image_variants.py
+"""
+Уменьшенные копии изображений (варианты) для адаптивной загрузки.
+
+Для каждого загруженного изображения (ShopItem.image, UploadedImage)
+Pillow создает несколько копий по ширинам из IMAGE_VARIANTS['WIDTHS'].
+Копии лежат в MEDIA_ROOT/variants/ и записываются в ImageVariant,
+а в документ лендинга попадают в виде, готовом для srcset.
+
+Изображение идентифицируется путем относительно MEDIA_ROOT
+(ShopItem.image.name, UploadedImage.file_path, значение SectionContent).
+"""
+import logging
+import os
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+from TeddyTale.media_files import register_media_file
+from TeddyTale.media_storage import hashed_media_url
+
+from .image_transcodes import delete_transcodes
+from .models import ImageVariant
+
+logger = logging.getLogger(__name__)
+
+
+def _get_config():
+    config = {
+        'ENABLED': True,
+        'WIDTHS': (320, 640, 960, 1280),
+        'FORMAT': 'WEBP',
+        'QUALITY': 80,
+        'DIR': 'variants',
+    }
+    config.update(getattr(settings, 'IMAGE_VARIANTS', {}))
+    return config
+
+
+def _variant_path(source, width, config):
+    """Путь варианта относительно MEDIA_ROOT"""
+    stem = os.path.splitext(source)[0]
+    extension = config['FORMAT'].lower()
+    return f"{config['DIR']}/{stem}-{width}w.{extension}"
+
+
+def generate_variants(source, force=False):
+    """
+    Создает варианты изображения source (путь относительно MEDIA_ROOT).
+    Ширины больше исходной пропускаются - изображение не увеличивается.
+    Возвращает список записей ImageVariant.
+    """
+    config = _get_config()
+    if not config['ENABLED'] or not source:
+        return []
+
+    source_path = os.path.join(settings.MEDIA_ROOT, source)
+    existing = {variant.width: variant
+                for variant in ImageVariant.objects.filter(source=source)}
+
+    if existing and not force:
+        # Все варианты уже есть - исходник не открываем
+        source_width = next(iter(existing.values())).source_width
+        expected = {width for width in config['WIDTHS'] if width < source_width}
+        if (expected == set(existing) and all(
+                os.path.exists(os.path.join(settings.MEDIA_ROOT,
+                                            variant.file_path))
+                for variant in existing.values())):
+            return sorted(existing.values(), key=lambda v: v.width)
+
+    try:
+        with Image.open(source_path) as image:
+            image = ImageOps.exif_transpose(image)
+            source_width, source_height = image.size
+            if image.mode not in ('RGB', 'RGBA'):
+                has_alpha = ('A' in image.getbands()
+                             or 'transparency' in image.info)
+                image = image.convert('RGBA' if has_alpha else 'RGB')
+
+            variants = []
+            for width in sorted(set(config['WIDTHS'])):
+                if width >= source_width:
+                    break
+                variant = existing.get(width)
+                variant_file = (os.path.join(settings.MEDIA_ROOT,
+                                             variant.file_path)
+                                if variant else None)
+                if (variant and not force
+                        and variant.source_width == source_width
+                        and os.path.exists(variant_file)):
+                    variants.append(variant)
+                    continue
+
+                height = round(source_height * width / source_width)
+                file_path = _variant_path(source, width, config)
+                full_path = os.path.join(settings.MEDIA_ROOT, file_path)
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                resized = image.resize((width, height), Image.LANCZOS)
+                resized.save(full_path, config['FORMAT'],
+                             quality=config['QUALITY'])
+
+                variant, _ = ImageVariant.objects.update_or_create(
+                    source=source, width=width,
+                    defaults={
+                        'height': height,
+                        'source_width': source_width,
+                        'source_height': source_height,
+                        'file_path': file_path,
+                        'file_size': os.path.getsize(full_path),
+                        'mime_type': f"image/{config['FORMAT'].lower()}",
+                    })
+                register_media_file(file_path)
+                variants.append(variant)
+    except FileNotFoundError:
+        logger.warning(f"Исходное изображение не найдено: {source_path}")
+        return []
+    except Exception as e:
+        logger.error(f"Ошибка создания вариантов {source}: {e}")
+        return []
+
+    # Ширины, которых больше нет в настройках (или исходник стал меньше)
+    stale_widths = set(existing) - {variant.width for variant in variants}
+    if stale_widths:
+        delete_variants(source, widths=stale_widths)
+
+    logger.info(f"Варианты изображения {source}: "
+                f"{[variant.width for variant in variants]}")
+    return variants
+
+
+def delete_variants(source, widths=None):
+    """Удаляет файлы и записи вариантов изображения source"""
+    if not source:
+        return
+    variants = ImageVariant.objects.filter(source=source)
+    if widths is not None:
+        variants = variants.filter(width__in=widths)
+    for variant in variants:
+        file_path = os.path.join(settings.MEDIA_ROOT, variant.file_path)
+        try:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        except OSError as e:
+            logger.error(f"Ошибка при удалении варианта {file_path}: {e}")
+        delete_transcodes(variant.file_path)
+    variants.delete()
+
+
+def get_variants_map(sources):
+    """
+    Варианты для набора изображений одним запросом:
+    source -> {'width', 'height', 'variants': [{'url', 'width'}, ...]}
+    """
+    sources = [source for source in set(sources) if source]
+    if not sources:
+        return {}
+
+    images = {}
+    for variant in (ImageVariant.objects.filter(source__in=sources)
+                    .order_by('source', 'width')):
+        image = images.setdefault(variant.source, {
+            'width': variant.source_width,
+            'height': variant.source_height,
+            'variants': [],
+        })
+        image['variants'].append({
+            'url': hashed_media_url(variant.file_path),
+            'width': variant.width,
+        })
+    return images
@@ -0,0 +1,63 @@
+# teddy_admin/management/commands/backfill_image_variants.py
+"""
+Создает варианты (уменьшенные копии), копии в AVIF/WebP и заглушки
+(LQIP) для уже загруженных изображений и публикует документ лендинга с новыми srcset.
+
+    python manage.py backfill_image_variants
+    python manage.py backfill_image_variants --force   # пересоздать все
+"""
+from django.core.management.base import BaseCommand
+
+from landing.page_cache import page_cache
+from landing.published_page import document_store, publish
+from teddy_admin.image_placeholders import store_placeholder
+from teddy_admin.image_transcodes import generate_transcodes
+from teddy_admin.image_variants import generate_variants
+from teddy_admin.models import SectionContent, ShopItem, UploadedImage
+
+
+class Command(BaseCommand):
+    help = 'Создает варианты изображений для srcset у существующих медиа-файлов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Пересоздать варианты, даже если они уже есть')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать список изображений')
+
+    def handle(self, *args, **options):
+        sources = set()
+        sources.update(ShopItem.objects.exclude(image='')
+                       .values_list('image', flat=True))
+        sources.update(UploadedImage.objects.filter(is_active=True)
+                       .values_list('file_path', flat=True))
+        sources.update(SectionContent.objects.filter(content_type='image')
+                       .exclude(value='').values_list('value', flat=True))
+        sources.discard(None)
+
+        self.stdout.write(f"Изображений: {len(sources)}")
+        created = 0
+        for source in sorted(sources):
+            if options['dry_run']:
+                self.stdout.write(f"  {source}")
+                continue
+            store_placeholder(source)
+            variants = generate_variants(source, force=options['force'])
+            created += len(variants)
+            widths = ', '.join(str(variant.width) for variant in variants)
+            transcodes = generate_transcodes(source, force=options['force'])
+            for variant in variants:
+                transcodes += generate_transcodes(variant.file_path,
+                                                  force=options['force'])
+            self.stdout.write(f"  {source}: {widths or 'без вариантов'}, "
+                              f"копий AVIF/WebP: {len(transcodes)}")
+
+        if options['dry_run']:
+            return
+
+        # Документ лендинга должен получить новые srcset
+        publish()
+        document_store.clear()
+        page_cache.bump_generation()
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: {created} вариантов, документ лендинга опубликован"))
@@ -0,0 +1,91 @@
+# teddy_admin/management/commands/backfill_media_hashes.py
+"""
+Считает sha256 для изображений, загруженных до дедупликации,
+регистрирует их в MediaBlob и объединяет файлы с одинаковым содержимым.
+
+    python manage.py backfill_media_hashes
+    python manage.py backfill_media_hashes --dry-run
+"""
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from landing.page_cache import page_cache
+from landing.published_page import document_store, publish
+from teddy_admin.image_transcodes import delete_transcodes
+from teddy_admin.image_variants import delete_variants
+from teddy_admin.media_store import file_sha256
+from teddy_admin.models import MediaBlob, SectionContent, ShopItem, UploadedImage
+
+
+class Command(BaseCommand):
+    help = 'Считает sha256 загруженных изображений и объединяет дубликаты'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать дубликаты, ничего не менять')
+
+    def handle(self, *args, **options):
+        # Путь -> число записей, ссылающихся на файл
+        references = defaultdict(int)
+        for path in ShopItem.objects.exclude(image='').values_list('image',
+                                                                   flat=True):
+            references[path] += 1
+        for path in UploadedImage.objects.values_list('file_path', flat=True):
+            references[path] += 1
+
+        by_hash = defaultdict(list)
+        for path in sorted(references):
+            if not os.path.isfile(os.path.join(settings.MEDIA_ROOT, path)):
+                self.stdout.write(self.style.WARNING(f"  Нет файла: {path}"))
+                continue
+            by_hash[file_sha256(path)].append(path)
+
+        merged = 0
+        for sha256, paths in by_hash.items():
+            blob = MediaBlob.objects.filter(sha256=sha256).first()
+            canonical = blob.file_path if blob else paths[0]
+            duplicates = [path for path in paths if path != canonical]
+            if duplicates:
+                self.stdout.write(f"  {canonical} <- {', '.join(duplicates)}")
+            if options['dry_run']:
+                continue
+
+            with transaction.atomic():
+                for path in duplicates:
+                    ShopItem.objects.filter(image=path).update(image=canonical)
+                    UploadedImage.objects.filter(file_path=path).update(
+                        file_path=canonical)
+                    SectionContent.objects.filter(
+                        content_type='image', value=path).update(value=canonical)
+                ShopItem.objects.filter(image=canonical).update(
+                    image_sha256=sha256)
+                UploadedImage.objects.filter(file_path=canonical).update(
+                    sha256=sha256)
+                size = os.path.getsize(os.path.join(settings.MEDIA_ROOT,
+                                                    canonical))
+                MediaBlob.objects.update_or_create(
+                    sha256=sha256,
+                    defaults={
+                        'file_path': canonical,
+                        'size': size,
+                        'refcount': sum(references[path] for path in paths),
+                    })
+
+            for path in duplicates:
+                os.remove(os.path.join(settings.MEDIA_ROOT, path))
+                delete_variants(path)
+                delete_transcodes(path)
+                merged += 1
+
+        if options['dry_run']:
+            return
+
+        publish()
+        document_store.clear()
+        page_cache.bump_generation()
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: {len(by_hash)} файлов, объединено дубликатов: {merged}"))
@@ -0,0 +1,515 @@
+# teddy_admin/management/commands/bench.py
+"""
+Нагрузочный замер основных страниц и AJAX-представлений.
+
+Команда создает временную базу SQLite, заполняет ее данными,
+похожими на рабочие (секции, контент, девять товаров, изображения,
+тысячи записей ChangeLog), и вызывает WSGI-приложение из
+TeddyTale.wsgi прямо в процессе из нескольких потоков - без сети
+и без запущенного сервера. Медиа-файлы, снимок лендинга, метки кэша
+и метрики на время замера переносятся во временную директорию:
+рабочие файлы проекта не меняются.
+
+По каждому адресу выводятся запросы в секунду, перцентили задержки
+(p50/p95/p99), число запросов к БД и размер ответа. Результат
+сохраняется в JSON; --compare показывает разницу с прошлым запуском.
+
+    python manage.py bench
+    python manage.py bench --concurrency 4 --duration 30 --endpoint index
+    python manage.py bench --compare cache/bench/20260101-120000.json
+"""
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from functools import lru_cache
+from importlib import import_module
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import setup_databases, teardown_databases
+from django.utils.crypto import get_random_string
+from PIL import Image
+
+from teddy_admin.models import (ChangeLog, PageSection, SectionContent,
+                                ShopItem, SiteSettings, UploadedImage)
+
+SHOP_IMAGES = ('Teddy_Buka', 'Teddy_Caramelka', 'Teddy_Karapuz',
+               'Teddy_Luchik', 'Teddy_Maikl', 'Teddy_Malishka',
+               'Teddy_Pushok', 'Teddy_Umka')
+UPLOADED_IMAGES = ('29a95bcf01214896907e0841bc545a80.webp',
+                   'd6ea4a3f13df4393b502cebfa9d8be8b.webp')
+SQLITE_OPTIONS = {
+    'timeout': 30,
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+}
+
+# Секция -> [(content_key, content_type, значение)]
+SECTIONS = {
+    'meta': [
+        ('title', 'text', 'Teddy Tale - мишки Тедди ручной работы'),
+        ('description', 'textarea', 'Авторские мишки Тедди ручной работы '
+                                    'из натуральных материалов'),
+        ('keyWords', 'text', 'мишки тедди, handmade, подарок'),
+    ],
+    'hero': [
+        ('titleHero', 'text', 'Мишки Тедди ручной работы'),
+        ('descriptionHero', 'textarea', 'Каждый мишка создается вручную '
+                                        'и становится другом на всю жизнь'),
+        ('heroImage', 'image', f'uploaded_images/{UPLOADED_IMAGES[0]}'),
+    ],
+    'about': [
+        ('aboutTitleBlock1', 'text', 'История мастера'),
+        ('aboutDescriptionBlock1', 'textarea',
+         'Добро пожаловать в мой мир handmade-творчества! ' * 4),
+        ('aboutTitleBlock2', 'text', 'Почему мне доверяют'),
+        ('aboutDescriptionBlock2', 'textarea',
+         'Внимание к деталям и качественные материалы. ' * 4),
+        ('aboutSlot1Block2', 'text', '5+ лет опыта'),
+        ('aboutSlot2Block2', 'text', '200+ довольных клиентов'),
+        ('aboutSlot3Block2', 'text', 'Натуральные материалы'),
+        ('aboutSlot4Block2', 'text', 'Индивидуальный подход'),
+        ('aboutImage', 'image', f'uploaded_images/{UPLOADED_IMAGES[1]}'),
+    ],
+    'contacts': [
+        ('contactsPhone', 'tel', '+7 (911) 129-26-55'),
+        ('contactsEmail', 'email', 'ev.filenko@rambler.ru'),
+        ('contactsCity', 'text', 'Санкт-Петербург'),
+        ('contactsAddress', 'text', 'ул. Среднерогатская'),
+        ('contactsVK', 'url', 'https://vk.com/teddytale'),
+        ('contactsWhatsApp', 'tel', '+79111292655'),
+        ('contactsTelegramm', 'url', 'https://t.me/Elen0Fil'),
+        ('mapCoords', 'coordinates', '59.819987,30.337649'),
+    ],
+}
+
+
+@lru_cache(maxsize=None)
+def _sample_image():
+    """JPEG размером с фотографию из админки (шум плохо сжимается)"""
+    buffer = io.BytesIO()
+    Image.effect_noise((1200, 900), 48).convert('RGB').save(
+        buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def _json_body(data):
+    return 'application/json', json.dumps(data, ensure_ascii=False).encode()
+
+
+def _upload_body(fields):
+    """multipart/form-data с изображением в поле image"""
+    data = dict(fields, image=SimpleUploadedFile(
+        'bench.jpg', _sample_image(), 'image/jpeg'))
+    return MULTIPART_CONTENT, encode_multipart(BOUNDARY, data)
+
+
+def _endpoints(item_id):
+    """
+    Имя -> (метод, путь, (Content-Type, тело) или None,
+    нужен ли вход в админку)
+    """
+    return {
+        'index': ('GET', '/', None, False),
+        'privacy': ('GET', '/privacy/', None, False),
+        'admin-panel': ('GET', '/admin-custom/panel/', None, True),
+        'update-shop-item': (
+            'POST', f'/admin-custom/ajax/update-shop-item/{item_id}/',
+            _json_body({'title': 'Мишка Бука', 'price': '4500'}), True),
+        'update-section': (
+            'POST', '/admin-custom/ajax/update-section/hero/',
+            _json_body({'content_key': 'titleHero',
+                        'value': SECTIONS['hero'][0][2]}), True),
+        'upload-image': (
+            'POST', '/admin-custom/ajax/upload-image/',
+            _upload_body({'section_type': 'hero',
+                          'content_key': 'heroImage'}), True),
+        'upload-shop-item-image': (
+            'POST', f'/admin-custom/ajax/upload-shop-item-image/{item_id}/',
+            _upload_body({}), True),
+    }
+
+
+def _percentile(sorted_values, percent):
+    """Перцентиль по ближайшему рангу"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1,
+                      round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Замер скорости страниц и AJAX-представлений на временной базе SQLite'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2,
+                            help='Число потоков (как --threads у gunicorn)')
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Длительность замера каждого адреса, секунды')
+        parser.add_argument('--warmup', type=int, default=3,
+                            help='Запросов для прогрева перед замером')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Замерять только этот адрес (можно повторять)')
+        parser.add_argument('--changelog-rows', type=int, default=5000,
+                            help='Сколько записей ChangeLog создать')
+        parser.add_argument('--output',
+                            help='Файл результата (по умолчанию cache/bench/)')
+        parser.add_argument('--compare',
+                            help='JSON прошлого запуска для сравнения')
+
+    def handle(self, *args, **options):
+        for alias in settings.DATABASES:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(
+                    f"bench работает только с SQLite, а база '{alias}' - "
+                    f"{connections[alias].vendor}. Запустите без DATABASE_URL")
+
+        names = options['endpoints'] or list(_endpoints(0))
+        unknown = set(names) - set(_endpoints(0))
+        if unknown:
+            raise CommandError(f"Неизвестные адреса: {', '.join(sorted(unknown))}. "
+                               f"Доступны: {', '.join(_endpoints(0))}")
+
+        with tempfile.TemporaryDirectory(prefix='teddytale-bench-') as tmp_dir:
+            for alias in settings.DATABASES:
+                settings_dict = connections[alias].settings_dict
+                settings_dict.setdefault('TEST', {})['NAME'] = (
+                    os.path.join(tmp_dir, f'{alias}.sqlite3'))
+                # Параллельные записи ждут блокировку, а не падают с
+                # "database is locked" (ошибка разомкнула бы выключатель БД)
+                settings_dict.setdefault('OPTIONS', {}).update(SQLITE_OPTIONS)
+            old_config = setup_databases(verbosity=0, interactive=False,
+                                         aliases={'default'})
+            try:
+                with override_settings(**self._isolated_settings(tmp_dir)):
+                    try:
+                        results = self._run(names, options)
+                    finally:
+                        # Задачи загрузок пишут во временную директорию
+                        self._wait_for_image_jobs()
+            finally:
+                connections.close_all()
+                teardown_databases(old_config, verbosity=0)
+
+        self._report(results)
+        self._save(results, options)
+        if options['compare']:
+            self._compare(results, options['compare'])
+
+    def _isolated_settings(self, tmp_dir):
+        """
+        Пути, в которые пишут представления, - во временной директории.
+        Изображения из данных замера копируются в новый MEDIA_ROOT.
+        """
+        media_root = os.path.join(tmp_dir, 'media')
+        for path in ([f'shop_items/{name}.webp' for name in SHOP_IMAGES]
+                     + [f'uploaded_images/{name}' for name in UPLOADED_IMAGES]):
+            source = os.path.join(settings.MEDIA_ROOT, path)
+            if os.path.isfile(source):
+                target = os.path.join(media_root, path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copy2(source, target)
+        return {
+            'MEDIA_ROOT': media_root,
+            'LANDING_SNAPSHOT_FILE': os.path.join(tmp_dir,
+                                                  'landing_snapshot.json'),
+            'LANDING_SNAPSHOT_SEED_FILE': None,
+            'PAGE_CACHE': dict(
+                settings.PAGE_CACHE,
+                STAMP_FILE=os.path.join(tmp_dir, 'page_cache.stamp')),
+            'DB_ROUTER': dict(
+                settings.DB_ROUTER,
+                WRITE_STAMP_FILE=os.path.join(tmp_dir, 'db_write.stamp')),
+            'REQUEST_METRICS': dict(settings.REQUEST_METRICS,
+                                    DIR=os.path.join(tmp_dir, 'metrics')),
+        }
+
+    def _wait_for_image_jobs(self, timeout=120):
+        """Ждет фоновые задачи изображений, поставленные загрузками"""
+        from teddy_admin.image_jobs import image_job_queue
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            stats = image_job_queue.stats()
+            if not stats['queued'] and not stats['running']:
+                return
+            time.sleep(0.1)
+        self.stdout.write(self.style.WARNING(
+            'Фоновые задачи изображений не завершились'))
+
+    def _run(self, names, options):
+        from TeddyTale.wsgi import application
+        from landing.page_cache import page_cache
+        from landing.published_page import document_store, publish
+
+        self.stdout.write('Заполнение базы...')
+        user, item_id = self._seed(options['changelog_rows'])
+        publish()
+        document_store.clear()
+        page_cache.bump_generation()
+
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS
+                     if host and '*' not in host), 'localhost')
+        session_key, csrf_token = self._login(user)
+        endpoints = _endpoints(item_id)
+
+        results = {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'options': {
+                'concurrency': options['concurrency'],
+                'duration': options['duration'],
+                'changelog_rows': options['changelog_rows'],
+                'debug': settings.DEBUG,
+                'python': sys.version.split()[0],
+            },
+            'endpoints': {},
+        }
+        for name in names:
+            method, path, body, auth = endpoints[name]
+            environ = {
+                'REQUEST_METHOD': method,
+                'PATH_INFO': path,
+                'HTTP_HOST': host,
+                'SERVER_NAME': host,
+                'HTTP_ACCEPT': 'text/html,application/json,*/*',
+                'HTTP_ACCEPT_LANGUAGE': 'ru',
+            }
+            payload = b''
+            if auth:
+                environ['HTTP_COOKIE'] = (
+                    f"{settings.SESSION_COOKIE_NAME}={session_key}")
+            if body is not None:
+                content_type, payload = body
+                environ.update({
+                    'CONTENT_TYPE': content_type,
+                    'CONTENT_LENGTH': str(len(payload)),
+                    'HTTP_X_CSRFTOKEN': csrf_token,
+                    'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest',
+                    'HTTP_ORIGIN': f'http://{host}',
+                })
+
+            self.stdout.write(f'Замер {name} ({method} {path})...')
+            results['endpoints'][name] = self._measure(
+                application, environ, payload, options)
+        return results
+
+    def _seed(self, changelog_rows):
+        """Данные, похожие на рабочие. bulk_create - без сигналов и фоновых задач"""
+        user = User.objects.create_superuser('bench', 'bench@example.com',
+                                             get_random_string(16))
+
+        for order_index, (section_key, contents) in enumerate(SECTIONS.items()):
+            section = PageSection.objects.create(
+                section_key=section_key, name=section_key.capitalize(),
+                is_active=True, order_index=order_index)
+            SectionContent.objects.bulk_create(
+                SectionContent(section=section, content_key=key, label=key,
+                               content_type=content_type, value=value,
+                               order_index=index)
+                for index, (key, content_type, value) in enumerate(contents))
+
+        ShopItem.objects.bulk_create(
+            ShopItem(slot_number=slot, title=f'Мишка {name.split("_")[1]}',
+                     description='Мишка ручной работы из плюша. ' * 5,
+                     price=f'{3000 + slot * 250}',
+                     image=f'shop_items/{name}.webp', order_index=slot)
+            for slot, name in enumerate(
+                SHOP_IMAGES + SHOP_IMAGES[:1], start=1))
+
+        UploadedImage.objects.bulk_create(
+            UploadedImage(original_filename=filename,
+                          stored_filename=filename,
+                          file_path=f'uploaded_images/{filename}',
+                          file_size=self._file_size(f'uploaded_images/{filename}'),
+                          mime_type='image/webp', section_type=section,
+                          content_key=key, uploaded_by=user)
+            for filename, section, key in (
+                (UPLOADED_IMAGES[0], 'hero', 'heroImage'),
+                (UPLOADED_IMAGES[1], 'about', 'aboutImage')))
+
+        SiteSettings.objects.bulk_create(
+            SiteSettings(setting_key=key, setting_value=value)
+            for key, value in (('site_name', 'Teddy Tale'),
+                               ('maintenance_mode', 'false')))
+
+        ChangeLog.objects.bulk_create(
+            (ChangeLog(user=user, changed_table='ShopItem',
+                       record_id=index % 9 + 1, action='UPDATE',
+                       old_value=json.dumps({'price': str(3000 + index)}),
+                       new_value=json.dumps({'price': str(3001 + index)}),
+                       ip_address='127.0.0.1', user_agent='bench')
+             for index in range(changelog_rows)),
+            batch_size=1000)
+
+        item_id = ShopItem.objects.order_by('slot_number').values_list(
+            'pk', flat=True).first()
+        return user, item_id
+
+    def _file_size(self, path):
+        try:
+            return os.path.getsize(os.path.join(settings.MEDIA_ROOT, path))
+        except OSError:
+            return 0
+
+    def _login(self, user):
+        """Сессия администратора и CSRF-токен (CSRF_USE_SESSIONS)"""
+        csrf_token = get_random_string(32)
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session['_csrftoken'] = csrf_token
+        session.create()
+        return session.session_key, csrf_token
+
+    def _call(self, application, base_environ, payload):
+        """Один запрос к WSGI-приложению: (статус, байт ответа)"""
+        environ = dict(base_environ)
+        environ['wsgi.input'] = io.BytesIO(payload)
+        setup_testing_defaults(environ)
+        status = []
+
+        def start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split(' ', 1)[0]))
+            return lambda data: None
+
+        result = application(environ, start_response)
+        try:
+            size = sum(len(chunk) for chunk in result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return status[0], size
+
+    def _measure(self, application, environ, payload, options):
+        for _ in range(options['warmup']):
+            self._call(application, environ, payload)
+
+        samples = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['duration']
+
+        def worker():
+            local = []
+            counter = _QueryCounter()
+            try:
+                with ExitStack() as stack:
+                    for conn in connections.all():
+                        stack.enter_context(conn.execute_wrapper(counter))
+                    while time.perf_counter() < deadline:
+                        queries_before = counter.count
+                        start = time.perf_counter()
+                        try:
+                            status, size = self._call(application, environ,
+                                                      payload)
+                        except Exception:
+                            status, size = 0, 0
+                        local.append((time.perf_counter() - start, status,
+                                      size, counter.count - queries_before))
+            finally:
+                connections.close_all()
+                with lock:
+                    samples.extend(local)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, name=f'bench-{index}')
+                   for index in range(max(1, options['concurrency']))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(sample[0] for sample in samples)
+        count = len(samples) or 1
+        return {
+            'requests': len(samples),
+            'errors': sum(1 for sample in samples
+                          if not 200 <= sample[1] < 400),
+            'statuses': sorted({sample[1] for sample in samples}),
+            'rps': round(len(samples) / elapsed, 2),
+            'mean_ms': round(sum(latencies) / count * 1000, 3),
+            'p50_ms': round(_percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(_percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(_percentile(latencies, 99) * 1000, 3),
+            'queries_per_request': round(
+                sum(sample[3] for sample in samples) / count, 2),
+            'bytes_per_response': round(
+                sum(sample[2] for sample in samples) / count),
+        }
+
+    def _report(self, results):
+        header = (f"{'адрес':<24}{'запр/с':>9}{'p50 мс':>10}{'p95 мс':>10}"
+                  f"{'p99 мс':>10}{'БД/запр':>9}{'байт':>10}{'ошибок':>8}")
+        self.stdout.write(header)
+        for name, stats in results['endpoints'].items():
+            line = (f"{name:<24}{stats['rps']:>9.1f}{stats['p50_ms']:>10.2f}"
+                    f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+                    f"{stats['queries_per_request']:>9.1f}"
+                    f"{stats['bytes_per_response']:>10}{stats['errors']:>8}")
+            if stats['errors']:
+                self.stdout.write(self.style.WARNING(
+                    f"{line}  статусы: {stats['statuses']}"))
+            else:
+                self.stdout.write(line)
+        if results['options']['debug']:
+            self.stdout.write(self.style.WARNING(
+                'DEBUG=True: результаты медленнее рабочих'))
+
+    def _save(self, results, options):
+        path = options['output']
+        if not path:
+            directory = os.path.join(settings.BASE_DIR, 'cache', 'bench')
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(
+                directory, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Результат сохранен: {path}"))
+
+    def _compare(self, results, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                previous = json.load(f)['endpoints']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Не удалось прочитать {path}: {e}")
+
+        self.stdout.write(f"Сравнение с {path} (было -> стало):")
+        for name, stats in results['endpoints'].items():
+            old = previous.get(name)
+            if old is None:
+                continue
+            parts = []
+            for key in ('rps', 'p50_ms', 'p95_ms', 'queries_per_request',
+                        'bytes_per_response'):
+                if not old.get(key):
+                    parts.append(f"{key} {old.get(key)} -> {stats[key]}")
+                    continue
+                change = (stats[key] - old[key]) / old[key] * 100
+                parts.append(f"{key} {old[key]} -> {stats[key]} "
+                             f"({change:+.1f}%)")
+            self.stdout.write(f"  {name}: " + ', '.join(parts))
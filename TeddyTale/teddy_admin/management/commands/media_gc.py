@@ -0,0 +1,249 @@
+# teddy_admin/management/commands/media_gc.py
+"""
+Удаляет из MEDIA_ROOT файлы, на которые не ссылается ни одна запись.
+
+Ссылки загружаются несколькими запросами целиком (ShopItem.image,
+UploadedImage.file_path, изображения SectionContent), производные файлы
+(варианты, копии в других форматах, миниатюры) считаются нужными, пока
+нужен их исходник. Дерево медиа обходится os.scandir, сироты удаляются
+пачками; перед удалением пачки ссылки загружаются еще раз, и файлы
+исходников, на которые успели сослаться, остаются вместе с производными.
+Заодно удаляются записи ImageVariant и MediaBlob без исходника.
+
+Файлы моложе --min-age не трогаются: это может быть загрузка, запись
+о которой еще не создана.
+
+    python manage.py media_gc --dry-run
+    python manage.py media_gc --min-age 3600 --batch-size 500
+"""
+import os
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+from TeddyTale.media_storage import get_config as get_hashing_config
+from TeddyTale.media_storage import digest_cache
+from TeddyTale.media_thumbnails import get_config as get_thumbnails_config
+from TeddyTale.media_thumbnails import is_allowed_size
+from teddy_admin.image_transcodes import FORMATS, transcode_path
+from teddy_admin.models import (ImageVariant, MediaBlob, SectionContent,
+                                ShopItem, UploadedImage)
+
+
+def _scan(directory, prefix=''):
+    """Обходит дерево: (путь относительно MEDIA_ROOT, stat) для каждого файла"""
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                path = f"{prefix}{entry.name}"
+                if entry.is_dir(follow_symlinks=False):
+                    yield from _scan(entry.path, f"{path}/")
+                elif entry.is_file(follow_symlinks=False):
+                    yield path, entry.stat(follow_symlinks=False)
+    except FileNotFoundError:
+        return
+
+
+def _media_path(value):
+    """Значение SectionContent -> путь относительно MEDIA_ROOT"""
+    value = value.strip()
+    if value.startswith(settings.MEDIA_URL):
+        value = value[len(settings.MEDIA_URL):]
+        prefix = f"{get_hashing_config()['PREFIX']}/"
+        if value.startswith(prefix):
+            # /media/h/<digest>/<путь>
+            value = value[len(prefix):].partition('/')[2]
+    return value
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Command(BaseCommand):
+    help = 'Удаляет медиа-файлы, на которые не ссылается ни одна запись'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать файлы-сироты, ничего не удалять')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Сколько файлов удалять за одну пачку')
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help='Не трогать файлы моложе стольких секунд')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch_size = max(1, options['batch_size'])
+        cutoff = time.time() - options['min_age']
+
+        sources = self._referenced_sources()
+        variant_files, orphan_variants = self._variants(sources)
+        referenced = sources | self._derived(sources, variant_files)
+        thumbnail_digests = {digest_cache.get(path) for path in sources}
+
+        # Верхняя директория -> [файлов, байт, сирот, байт сирот]
+        totals = defaultdict(lambda: [0, 0, 0, 0])
+        orphans = []
+        recent = 0
+        for path, stat in _scan(settings.MEDIA_ROOT):
+            top = path.split('/', 1)[0] if '/' in path else '.'
+            totals[top][0] += 1
+            totals[top][1] += stat.st_size
+            if path in referenced:
+                continue
+            if self._is_live_thumbnail(path, thumbnail_digests):
+                continue
+            if stat.st_mtime > cutoff:
+                recent += 1
+                continue
+            totals[top][2] += 1
+            totals[top][3] += stat.st_size
+            orphans.append((path, stat.st_size))
+
+        orphan_blobs = list(
+            MediaBlob.objects.exclude(file_path__in=sources)
+            .filter(created_at__lt=timezone.now()
+                    - timedelta(seconds=options['min_age']))
+            .values_list('pk', 'file_path'))
+
+        self._report(totals, recent)
+        if dry_run:
+            for path, size in orphans:
+                self.stdout.write(f"  {path} ({filesizeformat(size)})")
+            self.stdout.write(
+                f"Записей ImageVariant без исходника: {len(orphan_variants)}, "
+                f"MediaBlob без ссылок: {len(orphan_blobs)}")
+            return
+
+        removed, freed, errors = self._delete_files(orphans, batch_size,
+                                                    sources)
+        variants_deleted = self._delete_rows(ImageVariant, orphan_variants,
+                                             batch_size, sources)
+        blobs_deleted = self._delete_rows(MediaBlob, orphan_blobs, batch_size,
+                                          sources)
+
+        message = (f"Готово: удалено файлов {removed} "
+                   f"({filesizeformat(freed)}), записей ImageVariant "
+                   f"{variants_deleted}, MediaBlob {blobs_deleted}")
+        if errors:
+            self.stdout.write(self.style.WARNING(
+                f"{message}, ошибок удаления: {errors}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
+
+    def _referenced_sources(self):
+        """Пути исходников, на которые ссылаются записи (три запроса)"""
+        sources = set(ShopItem.objects.exclude(image='')
+                      .values_list('image', flat=True))
+        sources.update(UploadedImage.objects.values_list('file_path',
+                                                         flat=True))
+        sources.update(
+            _media_path(value) for value in
+            SectionContent.objects.filter(content_type='image')
+            .exclude(Q(value__isnull=True) | Q(value=''))
+            .values_list('value', flat=True))
+        sources.discard('')
+        return sources
+
+    def _variants(self, sources):
+        """(файлы нужных вариантов, [(pk, исходник)] вариантов без исходника)"""
+        files = set()
+        orphans = []
+        for pk, source, file_path in ImageVariant.objects.values_list(
+                'pk', 'source', 'file_path'):
+            if source in sources:
+                files.add(file_path)
+            else:
+                orphans.append((pk, source))
+        return files, orphans
+
+    def _derived(self, sources, variant_files):
+        """Файлы вариантов исходников и копии исходников и вариантов в других форматах"""
+        return variant_files | {transcode_path(path, image_format)
+                                for path in sources | variant_files
+                                for image_format in FORMATS}
+
+    def _is_live_thumbnail(self, path, digests):
+        """Миниатюра <DIR>/<digest>-<w>x<h>.webp нужного исходника и разрешенного размера"""
+        thumbnails_dir = f"{get_thumbnails_config()['DIR']}/"
+        if not path.startswith(thumbnails_dir):
+            return False
+        digest, _, rest = path[len(thumbnails_dir):].partition('-')
+        size = rest[:-len('.webp')] if rest.endswith('.webp') else ''
+        width, _, height = size.partition('x')
+        if not (width.isdigit() and height.isdigit()):
+            return False
+        return digest in digests and is_allowed_size(int(width), int(height))
+
+    def _report(self, totals, recent):
+        self.stdout.write('Директория: файлов (размер), из них сирот (размер)')
+        for top in sorted(totals):
+            files, size, orphans, orphan_size = totals[top]
+            self.stdout.write(
+                f"  {top}: {files} ({filesizeformat(size)}), "
+                f"сирот {orphans} ({filesizeformat(orphan_size)})")
+        if recent:
+            self.stdout.write(f"Пропущено недавно измененных файлов: {recent}")
+
+    def _still_referenced(self, paths, known_sources):
+        """
+        Какие из paths успели стать нужными после обхода: исходники, на
+        которые появились ссылки, и их варианты, копии и миниатюры.
+        known_sources - исходники, найденные при обходе (их производные
+        файлы в сироты не попали).
+        """
+        sources = self._referenced_sources()
+        rescued = sources.intersection(paths)
+        new_sources = sources - known_sources
+        if new_sources:
+            variant_files = set(ImageVariant.objects
+                                .filter(source__in=new_sources)
+                                .values_list('file_path', flat=True))
+            derived = self._derived(new_sources, variant_files)
+            digests = {digest_cache.get(path) for path in new_sources}
+            rescued.update(path for path in paths
+                           if path in derived
+                           or self._is_live_thumbnail(path, digests))
+        return rescued
+
+    def _delete_files(self, orphans, batch_size, sources):
+        removed = freed = errors = 0
+        for batch in _batches(orphans, batch_size):
+            rescued = self._still_referenced([path for path, _ in batch],
+                                             sources)
+            for path, size in batch:
+                if path in rescued:
+                    continue
+                full_path = os.path.join(settings.MEDIA_ROOT, path)
+                try:
+                    os.remove(full_path)
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    errors += 1
+                    self.stderr.write(f"  Не удалось удалить {path}: {e}")
+                    continue
+                removed += 1
+                freed += size
+            self.stdout.write(f"  Удалено файлов: {removed}")
+        return removed, freed, errors
+
+    def _delete_rows(self, model, rows, batch_size, sources):
+        """rows - [(pk, путь исходника)]; записи снова нужных путей остаются"""
+        deleted = 0
+        for batch in _batches(rows, batch_size):
+            rescued = self._still_referenced([path for _, path in batch],
+                                             sources)
+            pks = [pk for pk, path in batch if path not in rescued]
+            if pks:
+                deleted += model.objects.filter(pk__in=pks).delete()[0]
+        return deleted
@@ -0,0 +1,35 @@
+# teddy_admin/management/commands/seed_landing_snapshot.py
+"""
+Сохраняет опубликованный документ лендинга в LANDING_SNAPSHOT_SEED_FILE.
+
+Запускается при сборке (build.sh): файл входит в образ сборки и
+переживает засыпание инстанса Render, поэтому после пробуждения лендинг
+можно отдать, даже если Supabase еще не ответил.
+
+    python manage.py seed_landing_snapshot
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from landing.published_page import PUBLISHED_PAGE_PK, publish
+from landing.snapshot import write_snapshot
+from teddy_admin.models import PublishedPage
+
+
+class Command(BaseCommand):
+    help = 'Сохраняет документ лендинга в снимок сборки'
+
+    def handle(self, *args, **options):
+        path = getattr(settings, 'LANDING_SNAPSHOT_SEED_FILE', None)
+        if not path:
+            raise CommandError('LANDING_SNAPSHOT_SEED_FILE не задан')
+
+        page = PublishedPage.objects.filter(pk=PUBLISHED_PAGE_PK).first()
+        if page is None:
+            # Документ еще не публиковался (первый деплой)
+            page = publish()
+
+        if not write_snapshot(page.version, page.document, path=str(path)):
+            raise CommandError(f"Не удалось записать снимок в {path}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Снимок лендинга версии {page.version} сохранен в {path}"))
@@ -0,0 +1,168 @@
+# teddy_admin/media_store.py
+"""
+Хранение загруженных изображений с дедупликацией по содержимому.
+
+Файл хешируется (sha256) прямо во время записи на диск. Одинаковое
+содержимое хранится один раз: MediaBlob ведет счетчик ссылок
+(записи UploadedImage и ShopItem), и файл удаляется только когда
+счетчик доходит до нуля.
+
+Файлы лежат по пути <directory>/<sha256><расширение>, поэтому
+имя файла однозначно определяет его содержимое.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from TeddyTale.media_files import register_media_file
+
+from .models import MediaBlob
+
+logger = logging.getLogger(__name__)
+
+
+def _full_path(path):
+    return os.path.join(settings.MEDIA_ROOT, path)
+
+
+def _write_temp(chunks, directory):
+    """Пишет чанки во временный файл, считая sha256. Возвращает (tmp, sha256, size)"""
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.upload')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size
+
+
+def store_upload(uploaded_file, directory):
+    """
+    Сохраняет загруженный файл в MEDIA_ROOT/directory с дедупликацией.
+    Возвращает (file_path, sha256): путь относительно MEDIA_ROOT.
+    Каждый вызов добавляет одну ссылку на файл - ее снимает release().
+
+    Файл, принятый ImageUploadHandler (teddy_admin/upload_handlers.py),
+    уже лежит в MEDIA_ROOT и захеширован - он только перемещается.
+    """
+    extension = os.path.splitext(uploaded_file.name)[1].lower()
+    if getattr(uploaded_file, 'sha256', None):
+        uploaded_file.flush()
+        tmp_path = uploaded_file.temporary_file_path()
+        sha256, size = uploaded_file.sha256, uploaded_file.size
+    else:
+        if hasattr(uploaded_file, 'seek'):
+            uploaded_file.seek(0)
+        tmp_path, sha256, size = _write_temp(uploaded_file.chunks(),
+                                             _full_path(directory))
+
+    try:
+        for _ in range(2):
+            try:
+                file_path = _register(tmp_path, sha256, size, directory,
+                                      extension)
+                break
+            except IntegrityError:
+                # Тот же файл одновременно загрузили в другом потоке
+                continue
+        else:
+            raise IntegrityError(f"Не удалось сохранить файл {sha256}")
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+    # Файл сразу доступен для отдачи без первого обращения к диску
+    register_media_file(file_path)
+    return file_path, sha256
+
+
+def _register(tmp_path, sha256, size, directory, extension):
+    with transaction.atomic():
+        blob = (MediaBlob.objects.select_for_update()
+                .filter(sha256=sha256).first())
+        if blob is not None and os.path.exists(_full_path(blob.file_path)):
+            MediaBlob.objects.filter(pk=blob.pk).update(
+                refcount=F('refcount') + 1)
+            logger.info(f"Файл {blob.file_path} уже загружен, "
+                        f"добавлена ссылка")
+            return blob.file_path
+
+        file_path = f"{directory}/{sha256}{extension}"
+        os.makedirs(_full_path(directory), exist_ok=True)
+        # Временный файл создается с правами 0600
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, _full_path(file_path))
+        if blob is not None:
+            # Запись есть, а файл пропал - восстанавливаем
+            blob.file_path = file_path
+            blob.size = size
+            blob.refcount = F('refcount') + 1
+            blob.save(update_fields=['file_path', 'size', 'refcount'])
+        else:
+            MediaBlob.objects.create(sha256=sha256, file_path=file_path,
+                                     size=size, refcount=1)
+        return file_path
+
+
+def release(path):
+    """
+    Снимает одну ссылку с файла. Файл и его варианты удаляются,
+    когда ссылок не остается. Файлы без MediaBlob (загруженные до
+    дедупликации) удаляются, если на них не ссылается ни одна запись.
+    """
+    from .image_transcodes import delete_transcodes
+    from .image_variants import delete_variants
+
+    if not path:
+        return False
+
+    with transaction.atomic():
+        blob = (MediaBlob.objects.select_for_update()
+                .filter(file_path=path).first())
+        if blob is not None:
+            if blob.refcount > 1:
+                MediaBlob.objects.filter(pk=blob.pk).update(
+                    refcount=F('refcount') - 1)
+                return False
+            blob.delete()
+        elif _is_referenced(path):
+            # Старый файл без счетчика, но на него еще ссылаются записи
+            return False
+
+    full_path = _full_path(path)
+    try:
+        if os.path.isfile(full_path):
+            os.remove(full_path)
+    except OSError as e:
+        logger.error(f"Ошибка при удалении файла {full_path}: {e}")
+    delete_variants(path)
+    delete_transcodes(path)
+    return True
+
+
+def _is_referenced(path):
+    from .models import ShopItem, UploadedImage
+
+    return (ShopItem.objects.filter(image=path).exists()
+            or UploadedImage.objects.filter(file_path=path).exists())
+
+
+def file_sha256(path):
+    """sha256 существующего файла (путь относительно MEDIA_ROOT)"""
+    digest = hashlib.sha256()
+    with open(_full_path(path), 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
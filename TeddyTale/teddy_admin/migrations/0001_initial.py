@@ -0,0 +1,140 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:53
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageSection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section_key', models.CharField(choices=[('meta', 'Мета-информация'), ('hero', 'Hero-секция'), ('shop', 'Магазин товаров'), ('about', 'О мастере'), ('contacts', 'Контакты')], max_length=50, unique=True, verbose_name='Ключ секции')),
+                ('name', models.CharField(max_length=100, verbose_name='Название секции')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('is_active', models.BooleanField(blank=True, verbose_name='Активна')),
+                ('order_index', models.IntegerField(default=0, verbose_name='Порядок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Секция Страницы',
+                'verbose_name_plural': 'Секции Страницы',
+                'ordering': ['order_index'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShopItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot_number', models.IntegerField(unique=True, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(9)], verbose_name='Номер слота (1-9)')),
+                ('title', models.CharField(max_length=200, verbose_name='Название товара')),
+                ('description', models.TextField(verbose_name='Описание товара')),
+                ('price', models.CharField(max_length=50, verbose_name='Цена')),
+                ('image', models.ImageField(upload_to='shop_items/', verbose_name='Изображение товара')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активен')),
+                ('order_index', models.IntegerField(default=0, verbose_name='Порядок')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Товар магазина',
+                'verbose_name_plural': 'Товары магазина',
+                'ordering': ['slot_number'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SiteSettings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('setting_key', models.CharField(max_length=50, unique=True, verbose_name='Ключ настройки')),
+                ('setting_value', models.TextField(blank=True, null=True, verbose_name='Значение')),
+                ('setting_type', models.CharField(choices=[('text', 'Текст'), ('boolean', 'Да/Нет'), ('number', 'Число'), ('json', 'JSON')], default='text', max_length=20, verbose_name='Тип значения')),
+                ('category', models.CharField(default='general', max_length=50, verbose_name='Категория')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('is_public', models.BooleanField(default=False, verbose_name='Публичная')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Настройка сайта',
+                'verbose_name_plural': 'Настройки сайта',
+            },
+        ),
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('changed_table', models.CharField(max_length=50, verbose_name='Таблица')),
+                ('record_id', models.IntegerField(blank=True, null=True, verbose_name='ID записи')),
+                ('action', models.CharField(choices=[('CREATE', 'Создание'), ('UPDATE', 'Обновление'), ('DELETE', 'Удаление')], max_length=10, verbose_name='Действие')),
+                ('old_value', models.TextField(blank=True, null=True, verbose_name='Старое значение')),
+                ('new_value', models.TextField(blank=True, null=True, verbose_name='Новое значение')),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True, verbose_name='IP адрес')),
+                ('user_agent', models.TextField(blank=True, verbose_name='User Agent')),
+                ('changed_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Лог изменения',
+                'verbose_name_plural': 'Логи изменения',
+            },
+        ),
+        migrations.CreateModel(
+            name='UploadedImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_filename', models.CharField(max_length=255, verbose_name='Исходное имя файла')),
+                ('stored_filename', models.CharField(max_length=255, unique=True, verbose_name='Имя в системе')),
+                ('file_path', models.CharField(max_length=500, verbose_name='Путь к файлу')),
+                ('file_size', models.IntegerField(verbose_name='Размер файла')),
+                ('mime_type', models.CharField(max_length=100, verbose_name='Тип файла')),
+                ('width', models.IntegerField(blank=True, null=True, verbose_name='Ширина')),
+                ('height', models.IntegerField(blank=True, null=True, verbose_name='Высота')),
+                ('section_type', models.CharField(blank=True, max_length=50, verbose_name='Тип секции')),
+                ('content_key', models.CharField(blank=True, max_length=50, verbose_name='Ключ контента')),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата загрузки')),
+                ('last_accessed', models.DateTimeField(blank=True, null=True, verbose_name='Последний доступ')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активен')),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Загрузил')),
+            ],
+            options={
+                'verbose_name': 'Загруженное изображение',
+                'verbose_name_plural': 'Загруженные изображения',
+            },
+        ),
+        migrations.CreateModel(
+            name='SectionContent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_key', models.CharField(max_length=50, verbose_name='Ключ контента')),
+                ('content_type', models.CharField(max_length=20, verbose_name='Тип контента')),
+                ('label', models.CharField(choices=[('text', 'Текст (одна строка)'), ('textarea', 'Текст (несколько строк)'), ('image', 'Изображение'), ('url', 'Ссылка (URL)'), ('phone', 'Телефон'), ('email', 'Email'), ('coordinates', 'Координаты')], max_length=100, verbose_name='Название поля')),
+                ('value', models.TextField(blank=True, null=True, verbose_name='Значение')),
+                ('placeholder', models.TextField(blank=True, verbose_name='Пример заполнения')),
+                ('help_text', models.TextField(blank=True, verbose_name='Подсказка')),
+                ('max_length', models.IntegerField(blank=True, null=True, verbose_name='Макс. длина')),
+                ('is_required', models.BooleanField(default=True, verbose_name='Обязательное')),
+                ('order_index', models.IntegerField(default=0, verbose_name='Порядок')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contents', to='teddy_admin.pagesection', verbose_name='Секция')),
+            ],
+            options={
+                'verbose_name': 'Элемент контента',
+                'verbose_name_plural': 'Элемент контента',
+                'ordering': ['order_index'],
+                'unique_together': {('section', 'content_key')},
+            },
+        ),
+    ]
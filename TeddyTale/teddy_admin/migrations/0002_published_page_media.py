@@ -0,0 +1,122 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teddy_admin', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50, verbose_name='Тип задачи')),
+                ('payload', models.JSONField(default=dict, verbose_name='Параметры')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], db_index=True, default='pending', max_length=20, verbose_name='Статус')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Результат')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Запущена')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+            ],
+            options={
+                'verbose_name': 'Задача обработки изображения',
+                'verbose_name_plural': 'Задачи обработки изображений',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('file_path', models.CharField(max_length=500, unique=True, verbose_name='Путь к файлу')),
+                ('size', models.PositiveBigIntegerField(verbose_name='Размер файла')),
+                ('refcount', models.PositiveIntegerField(default=0, verbose_name='Число ссылок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+            ],
+            options={
+                'verbose_name': 'Файл изображения',
+                'verbose_name_plural': 'Файлы изображений',
+            },
+        ),
+        migrations.CreateModel(
+            name='PublishedPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Версия')),
+                ('document', models.JSONField(default=dict, verbose_name='Документ страницы')),
+                ('published_at', models.DateTimeField(auto_now=True, verbose_name='Опубликовано')),
+            ],
+            options={
+                'verbose_name': 'Опубликованная страница',
+                'verbose_name_plural': 'Опубликованные страницы',
+            },
+        ),
+        migrations.AddField(
+            model_name='shopitem',
+            name='image_color',
+            field=models.CharField(blank=True, max_length=7, verbose_name='Основной цвет'),
+        ),
+        migrations.AddField(
+            model_name='shopitem',
+            name='image_height',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Высота изображения'),
+        ),
+        migrations.AddField(
+            model_name='shopitem',
+            name='image_placeholder',
+            field=models.TextField(blank=True, verbose_name='Заглушка (data URI)'),
+        ),
+        migrations.AddField(
+            model_name='shopitem',
+            name='image_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='SHA-256 изображения'),
+        ),
+        migrations.AddField(
+            model_name='shopitem',
+            name='image_width',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Ширина изображения'),
+        ),
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='dominant_color',
+            field=models.CharField(blank=True, max_length=7, verbose_name='Основной цвет'),
+        ),
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='placeholder',
+            field=models.TextField(blank=True, verbose_name='Заглушка (data URI)'),
+        ),
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='SHA-256'),
+        ),
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(db_index=True, max_length=500, verbose_name='Исходное изображение')),
+                ('width', models.PositiveIntegerField(verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(verbose_name='Высота')),
+                ('source_width', models.PositiveIntegerField(verbose_name='Исходная ширина')),
+                ('source_height', models.PositiveIntegerField(verbose_name='Исходная высота')),
+                ('file_path', models.CharField(max_length=500, verbose_name='Путь к файлу')),
+                ('file_size', models.IntegerField(verbose_name='Размер файла')),
+                ('mime_type', models.CharField(max_length=100, verbose_name='Тип файла')),
+                ('created_at', models.DateTimeField(auto_now=True, verbose_name='Создано')),
+            ],
+            options={
+                'verbose_name': 'Вариант изображения',
+                'verbose_name_plural': 'Варианты изображений',
+                'ordering': ['source', 'width'],
+                'unique_together': {('source', 'width')},
+            },
+        ),
+    ]
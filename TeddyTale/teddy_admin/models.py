@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
+from django_cleanup import cleanup
 import os
 
 
@@ -78,6 +79,8 @@ class SectionContent(models.Model):
         return f"{self.section.name} - {self.label}"
 
 
+# Замененные изображения удаляет фоновая задача (teddy_admin/image_jobs.py)
+@cleanup.ignore
 class ShopItem(models.Model):
     slot_number = models.IntegerField(unique=True,
                                       validators=[MinValueValidator(1),
@@ -90,6 +93,17 @@ class ShopItem(models.Model):
     # изображение товара
     image = models.ImageField(upload_to='shop_items/',
                               verbose_name='Изображение товара')
+    image_sha256 = models.CharField(max_length=64, blank=True, db_index=True,
+                                    verbose_name='SHA-256 изображения')
+    # размеры и заглушка (LQIP) для лендинга, заполняет фоновая задача
+    image_width = models.IntegerField(blank=True, null=True,
+                                      verbose_name='Ширина изображения')
+    image_height = models.IntegerField(blank=True, null=True,
+                                       verbose_name='Высота изображения')
+    image_placeholder = models.TextField(blank=True,
+                                         verbose_name='Заглушка (data URI)')
+    image_color = models.CharField(max_length=7, blank=True,
+                                   verbose_name='Основной цвет')
     is_active = models.BooleanField(default=True, verbose_name='Активен')
     order_index = models.IntegerField(default=0, verbose_name='Порядок')
 
@@ -104,15 +118,6 @@ class ShopItem(models.Model):
     def __str__(self):
         return f"{self.slot_number}. {self.title}"
 
-    def delete(self, *args, **kwargs):
-        # удаляем файл изображения при удалении записи
-        if self.image and hasattr(self.image, 'path'):
-            try:
-                if os.path.isfile(self.image.path):
-                    os.remove(self.image.path)
-            except Exception:
-                pass
-        super().delete(*args, **kwargs)
 
 
 class UploadedImage(models.Model):
@@ -123,10 +128,17 @@ class UploadedImage(models.Model):
     file_path = models.CharField(max_length=500, verbose_name='Путь к файлу')
     file_size = models.IntegerField(verbose_name='Размер файла')
     mime_type = models.CharField(max_length=100, verbose_name='Тип файла')
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True,
+                              verbose_name='SHA-256')
 
     # размеры изображения
     width = models.IntegerField(blank=True, null=True, verbose_name='Ширина')
     height = models.IntegerField(blank=True, null=True, verbose_name='Высота')
+    # заглушка (LQIP) для лендинга, заполняет фоновая задача
+    placeholder = models.TextField(blank=True,
+                                   verbose_name='Заглушка (data URI)')
+    dominant_color = models.CharField(max_length=7, blank=True,
+                                      verbose_name='Основной цвет')
 
     # для связи с контентом
     section_type = models.CharField(max_length=50, blank=True,
@@ -147,17 +159,8 @@ class UploadedImage(models.Model):
         verbose_name_plural = 'Загруженные изображения'
 
     def save(self, *args, **kwargs):
-        # Если это обновление существующей записи, удаляем старый файл
-        if self.pk:
-            try:
-                old_instance = UploadedImage.objects.get(pk=self.pk)
-                if old_instance.file_path != self.file_path:
-                    old_file_path = os.path.join(settings.MEDIA_ROOT,
-                                                 old_instance.file_path)
-                    if os.path.exists(old_file_path):
-                        os.remove(old_file_path)
-            except UploadedImage.DoesNotExist:
-                pass
+        # Старый файл при замене удаляет фоновая задача (сигналы),
+        # с учетом других ссылок на тот же файл (MediaBlob)
 
         # Если это новая запись, создаем папку если не существует
         if not self.pk:
@@ -167,15 +170,6 @@ class UploadedImage(models.Model):
 
         super().save(*args, **kwargs)
 
-    def delete(self, *args, **kwargs):
-        # Удаляем файл при удалении записи
-        if self.file_path:
-            file_path = os.path.join(settings.MEDIA_ROOT, self.file_path)
-            if os.path.exists(file_path):
-                os.remove(file_path)
-
-        super().delete(*args, **kwargs)
-
     def __str__(self):
         return self.original_filename
 
@@ -241,4 +235,111 @@ class ChangeLog(models.Model):
         verbose_name_plural = 'Логи изменения'
 
     def __str__(self):
-        return f"{self.changed_table} - {self.action} - {self.changed_at}"
\ No newline at end of file
+        return f"{self.changed_table} - {self.action} - {self.changed_at}"
+
+class PublishedPage(models.Model):
+    """
+    Денормализованный документ лендинга: весь контент страницы в одном
+    JSON. Пересобирается при каждом изменении контента в админке,
+    версия монотонно растет.
+    """
+    version = models.PositiveBigIntegerField(default=0,
+                                             verbose_name='Версия')
+    document = models.JSONField(default=dict,
+                                verbose_name='Документ страницы')
+    published_at = models.DateTimeField(auto_now=True,
+                                        verbose_name='Опубликовано')
+
+    class Meta:
+        verbose_name = 'Опубликованная страница'
+        verbose_name_plural = 'Опубликованные страницы'
+
+    def __str__(self):
+        return f"Версия {self.version} от {self.published_at}"
+
+
+class ImageVariant(models.Model):
+    """
+    Уменьшенная копия загруженного изображения для srcset.
+    source - путь исходного файла относительно MEDIA_ROOT
+    (ShopItem.image.name или UploadedImage.file_path).
+    """
+    source = models.CharField(max_length=500, db_index=True,
+                              verbose_name='Исходное изображение')
+    width = models.PositiveIntegerField(verbose_name='Ширина')
+    height = models.PositiveIntegerField(verbose_name='Высота')
+    source_width = models.PositiveIntegerField(verbose_name='Исходная ширина')
+    source_height = models.PositiveIntegerField(
+        verbose_name='Исходная высота')
+    file_path = models.CharField(max_length=500, verbose_name='Путь к файлу')
+    file_size = models.IntegerField(verbose_name='Размер файла')
+    mime_type = models.CharField(max_length=100, verbose_name='Тип файла')
+    created_at = models.DateTimeField(auto_now=True, verbose_name='Создано')
+
+    class Meta:
+        verbose_name = 'Вариант изображения'
+        verbose_name_plural = 'Варианты изображений'
+        unique_together = ['source', 'width']
+        ordering = ['source', 'width']
+
+    def __str__(self):
+        return f"{self.source} ({self.width}w)"
+
+
+class ImageJob(models.Model):
+    """
+    Фоновая задача обработки изображения (IMAGE_JOBS['PERSIST']).
+    Незавершенные задачи подхватываются после перезапуска воркера.
+    """
+    STATUSES = [
+        ('pending', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Готово'),
+        ('failed', 'Ошибка'),
+    ]
+
+    kind = models.CharField(max_length=50, verbose_name='Тип задачи')
+    payload = models.JSONField(default=dict, verbose_name='Параметры')
+    status = models.CharField(max_length=20, choices=STATUSES,
+                              default='pending', db_index=True,
+                              verbose_name='Статус')
+    result = models.JSONField(blank=True, null=True, verbose_name='Результат')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток')
+    created_at = models.DateTimeField(auto_now_add=True,
+                                      verbose_name='Создана')
+    started_at = models.DateTimeField(blank=True, null=True,
+                                      verbose_name='Запущена')
+    finished_at = models.DateTimeField(blank=True, null=True,
+                                       verbose_name='Завершена')
+
+    class Meta:
+        verbose_name = 'Задача обработки изображения'
+        verbose_name_plural = 'Задачи обработки изображений'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class MediaBlob(models.Model):
+    """
+    Файл изображения, хранящийся один раз для одинакового содержимого.
+    refcount - число записей (UploadedImage, ShopItem), ссылающихся на файл.
+    """
+    sha256 = models.CharField(max_length=64, unique=True,
+                              verbose_name='SHA-256')
+    file_path = models.CharField(max_length=500, unique=True,
+                                 verbose_name='Путь к файлу')
+    size = models.PositiveBigIntegerField(verbose_name='Размер файла')
+    refcount = models.PositiveIntegerField(default=0,
+                                           verbose_name='Число ссылок')
+    created_at = models.DateTimeField(auto_now_add=True,
+                                      verbose_name='Создан')
+
+    class Meta:
+        verbose_name = 'Файл изображения'
+        verbose_name_plural = 'Файлы изображений'
+
+    def __str__(self):
+        return f"{self.file_path} ({self.refcount})"
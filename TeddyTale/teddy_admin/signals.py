@@ -1,42 +1,38 @@
-import os
-from django.conf import settings
-from django.db.models.signals import post_delete, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import UploadedImage, SectionContent
+from landing.published_page import schedule_publish
+from .image_jobs import image_job_queue
+from .media_store import store_upload
+from .models import (UploadedImage, SectionContent, PageSection, ShopItem,
+                     SiteSettings)
 
 
 @receiver(post_delete, sender=UploadedImage)
 def delete_uploaded_image_file(sender, instance, **kwargs):
     """
-    Удаляет файл изображения при удалении записи UploadedImage
+    Удаляет файл изображения (и его варианты) при удалении записи
+    UploadedImage - в фоновой задаче, после фиксации транзакции
     """
     if instance.file_path:
-        file_path = os.path.join(settings.MEDIA_ROOT, instance.file_path)
-        if os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-            except Exception as e:
-                # Логируем ошибку, но не прерываем выполнение
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f"Ошибка при удалении файла {file_path}: {e}")
+        image_job_queue.submit_on_commit('cleanup',
+                                         paths=[instance.file_path])
 
 
 @receiver(pre_save, sender=UploadedImage)
 def delete_old_image_on_update(sender, instance, **kwargs):
     """
-    Удаляет старый файл при обновлении записи UploadedImage
+    Запоминает старый файл при обновлении записи UploadedImage:
+    его удалит задача обработки нового изображения
     """
+    instance._image_uploaded = not instance.pk
     if not instance.pk:
         return False  # Новая запись
 
     try:
         old_instance = UploadedImage.objects.get(pk=instance.pk)
         if old_instance.file_path != instance.file_path:
-            old_file_path = os.path.join(settings.MEDIA_ROOT,
-                                         old_instance.file_path)
-            if os.path.exists(old_file_path):
-                os.remove(old_file_path)
+            instance._image_uploaded = True
+            instance._replaced_file = old_instance.file_path
     except UploadedImage.DoesNotExist:
         pass
 
@@ -65,4 +61,70 @@ def delete_image_on_section_content_update(sender, instance, **kwargs):
             if uploaded_image:
                 uploaded_image.delete()  # Это удалит и файл через сигнал
     except SectionContent.DoesNotExist:
-        pass
\ No newline at end of file
+        pass
+
+
+@receiver(post_save, sender=PageSection)
+@receiver(post_delete, sender=PageSection)
+@receiver(post_save, sender=SectionContent)
+@receiver(post_delete, sender=SectionContent)
+@receiver(post_save, sender=ShopItem)
+@receiver(post_delete, sender=ShopItem)
+@receiver(post_save, sender=SiteSettings)
+@receiver(post_delete, sender=SiteSettings)
+def publish_landing_page(sender, instance, **kwargs):
+    """
+    Пересобирает опубликованный документ лендинга и сбрасывает
+    кэш готовых страниц при изменении контента
+    """
+    schedule_publish()
+
+
+@receiver(pre_save, sender=ShopItem)
+def store_shop_item_image(sender, instance, **kwargs):
+    """
+    Сохраняет новое изображение товара с дедупликацией по sha256
+    и запоминает старый файл: ссылку на него снимет фоновая задача
+    """
+    instance._image_uploaded = bool(instance.image) and not instance.image._committed
+    if not instance._image_uploaded:
+        return
+
+    if instance.pk:
+        old_image = (ShopItem.objects.filter(pk=instance.pk)
+                     .values_list('image', flat=True).first())
+        instance._replaced_file = old_image or ''
+
+    file_path, sha256 = store_upload(instance.image.file, 'shop_items')
+    # Файл уже на диске - ImageField не должен сохранять его еще раз
+    instance.image.name = file_path
+    instance.image._committed = True
+    instance.image_sha256 = sha256
+
+
+@receiver(post_save, sender=ShopItem)
+@receiver(post_save, sender=UploadedImage)
+def process_uploaded_image(sender, instance, **kwargs):
+    """
+    Ставит в очередь обработку нового изображения: размеры, варианты
+    для srcset, удаление замененного файла. id задачи сохраняется
+    в instance.image_job_id для ответа AJAX-загрузки.
+    """
+    if not getattr(instance, '_image_uploaded', False):
+        return
+
+    old_file = getattr(instance, '_replaced_file', '')
+    source = instance.image.name if sender is ShopItem else instance.file_path
+    instance.image_job_id = image_job_queue.submit_on_commit(
+        'process_image', source=source,
+        old_sources=[old_file] if old_file else [])
+    instance._image_uploaded = False
+
+
+@receiver(post_delete, sender=ShopItem)
+def delete_shop_item_image(sender, instance, **kwargs):
+    """
+    Удаляет файл изображения товара (и его варианты) в фоновой задаче
+    """
+    if instance.image:
+        image_job_queue.submit_on_commit('cleanup', paths=[instance.image.name])
@@ -0,0 +1,106 @@
+# teddy_admin/tests/test_circuit_breaker.py
+"""
+Выключатель БД (TeddyTale/circuit_breaker.py) в связке с
+SupabaseConnectionMiddleware:
+- разомкнутый выключатель - страница 503 с Retry-After;
+- представления @db_optional отвечают и при разомкнутом выключателе;
+- пробный запрос в полуоткрытом состоянии замыкает или снова
+  размыкает выключатель.
+"""
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from landing.page_cache import page_cache
+from landing.published_page import PublishedDocumentStore
+from TeddyTale.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+# Модули, которые импортировали глобальный выключатель
+BREAKER_USERS = (
+    'TeddyTale.middleware',
+    'TeddyTale.health_views',
+    'landing.db_utils',
+    'landing.published_page',
+)
+
+_TMP_DIR = tempfile.mkdtemp(prefix='teddytale-breaker-')
+
+
+def tearDownModule():
+    shutil.rmtree(_TMP_DIR, ignore_errors=True)
+
+
+@override_settings(
+    LANDING_SNAPSHOT_FILE=os.path.join(_TMP_DIR, 'landing_snapshot.json'),
+    LANDING_SNAPSHOT_SEED_FILE=None,
+    PAGE_CACHE={'STAMP_FILE': os.path.join(_TMP_DIR, 'page_cache.stamp')},
+    REQUEST_METRICS={'DIR': os.path.join(_TMP_DIR, 'metrics')},
+    DB_ROUTER={'WRITE_STAMP_FILE': os.path.join(_TMP_DIR, 'db_write.stamp')},
+    DB_CIRCUIT_BREAKER={'FAILURE_THRESHOLD': 2, 'RESET_TIMEOUT': 30},
+)
+class CircuitBreakerMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker('database')
+        for module in BREAKER_USERS:
+            patcher = mock.patch(f'{module}.db_circuit_breaker', self.breaker)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch('landing.published_page.document_store',
+                             PublishedDocumentStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        page_cache.bump_generation()
+
+    def open_breaker(self):
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.transitions[OPEN], 1)
+
+    def test_open_breaker_returns_503_with_retry_after(self):
+        self.open_breaker()
+        self.assertEqual(self.breaker.state, OPEN)
+        response = self.client.get(reverse('teddy_admin_custom:custom-login'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(self.breaker.stats()['rejected'], 1)
+
+    def test_db_optional_views_are_served_while_open(self):
+        # Документ лендинга уже загружен процессом
+        self.assertEqual(self.client.get(reverse('landing:index'))
+                         .status_code, 200)
+        self.open_breaker()
+
+        self.assertEqual(self.client.get(reverse('landing:index'))
+                         .status_code, 200)
+        self.assertEqual(self.client.get('/ping/').status_code, 200)
+        self.assertEqual(self.breaker.stats()['rejected'], 0)
+
+    @override_settings(DB_CIRCUIT_BREAKER={'FAILURE_THRESHOLD': 2,
+                                           'RESET_TIMEOUT': 0})
+    def test_half_open_trial_success_closes_breaker(self):
+        self.open_breaker()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+
+        response = self.client.get(reverse('teddy_admin_custom:custom-login'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.transitions[HALF_OPEN], 1)
+
+    @override_settings(DB_CIRCUIT_BREAKER={'FAILURE_THRESHOLD': 2,
+                                           'RESET_TIMEOUT': 0})
+    def test_half_open_trial_failure_reopens_breaker(self):
+        self.open_breaker()
+
+        with mock.patch('django.db.backends.base.base.BaseDatabaseWrapper'
+                        '.ensure_connection',
+                        side_effect=OperationalError('connection refused')):
+            response = self.client.get(
+                reverse('teddy_admin_custom:custom-login'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.breaker.transitions[OPEN], 2)
@@ -0,0 +1,130 @@
+# teddy_admin/tests/test_db_retry.py
+"""
+Повторы запросов к БД (landing/db_utils.py, safe_db_query):
+ошибка соединения повторяется, пока есть попытки и токены бюджета,
+запись без идемпотентности не повторяется, статистика видна в /health.
+Перед повтором закрывается соединение, на котором была ошибка
+(в том числе реплика), а открытая транзакция на любом соединении
+запрещает повтор.
+"""
+from unittest import mock
+
+from django.db import IntegrityError, OperationalError
+from django.test import SimpleTestCase, override_settings
+
+from landing.db_utils import (RetryBudget, RetryStats, get_retry_stats,
+                              safe_db_query)
+from landing.published_page import PublishedDocumentStore
+
+RETRY_SETTINGS = {
+    'MAX_ATTEMPTS': 3,
+    'BASE_DELAY': 0,
+    'MAX_DELAY': 0,
+    'BUDGET_CAPACITY': 2,
+    'BUDGET_REFILL_PER_SECOND': 0,
+}
+
+
+def _failing(times, error=None):
+    """Функция, которая times раз падает с ошибкой соединения"""
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) <= times:
+            raise error or OperationalError('server closed the connection '
+                                            'unexpectedly')
+        return 'ok'
+    return func, calls
+
+
+@override_settings(DB_RETRY=RETRY_SETTINGS)
+class SafeDbQueryTests(SimpleTestCase):
+
+    def setUp(self):
+        for name, value in (('retry_budget', RetryBudget()),
+                            ('retry_stats', RetryStats())):
+            patcher = mock.patch(f'landing.db_utils.{name}', value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def stats(self, func):
+        return get_retry_stats()[f"{__name__}.{func.__name__}"]
+
+    def test_operational_error_is_retried(self):
+        func, calls = _failing(2)
+        self.assertEqual(safe_db_query(func)(), 'ok')
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(self.stats(func)['retries'], 2)
+        self.assertEqual(self.stats(func)['failures'], 0)
+
+    def test_retries_stop_when_budget_is_used_up(self):
+        func, calls = _failing(10)
+        wrapped = safe_db_query(func)
+        with self.assertRaises(OperationalError):
+            wrapped()
+        # Две повторные попытки израсходовали бюджет из двух токенов
+        self.assertEqual(len(calls), 3)
+
+        with self.assertRaises(OperationalError):
+            wrapped()
+        # Токенов нет - ошибка пробрасывается сразу, без повтора
+        self.assertEqual(len(calls), 4)
+        stats = self.stats(func)
+        self.assertEqual(stats['retries'], 2)
+        self.assertEqual(stats['failures'], 2)
+        self.assertEqual(stats['budget_exhausted'], 1)
+
+    def test_non_idempotent_call_is_not_retried(self):
+        func, calls = _failing(1)
+        with self.assertRaises(OperationalError):
+            safe_db_query(idempotent=False)(func)()
+        self.assertEqual(len(calls), 1)
+
+    def test_query_errors_are_not_retried(self):
+        func, calls = _failing(1, IntegrityError('duplicate key'))
+        with self.assertRaises(IntegrityError):
+            safe_db_query(func)()
+        self.assertEqual(len(calls), 1)
+
+    def _connections(self, **replica):
+        """Подменяет соединения: исправный default и реплика с replica"""
+        default = mock.Mock(alias='default', in_atomic_block=False,
+                            errors_occurred=False)
+        replica = mock.Mock(alias='replica', **dict(
+            {'in_atomic_block': False, 'errors_occurred': True}, **replica))
+        handler = mock.Mock()
+        handler.all.return_value = [default, replica]
+        patcher = mock.patch('landing.db_utils.connections', handler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return default, replica
+
+    def test_failed_replica_connection_is_closed(self):
+        default, replica = self._connections()
+        func, calls = _failing(1)
+        self.assertEqual(safe_db_query(func)(), 'ok')
+        self.assertEqual(len(calls), 2)
+        replica.close.assert_called_once_with()
+        default.close.assert_not_called()
+
+    def test_atomic_block_on_replica_prevents_retry(self):
+        _, replica = self._connections(in_atomic_block=True)
+        func, calls = _failing(1)
+        with self.assertRaises(OperationalError):
+            safe_db_query(func)()
+        self.assertEqual(len(calls), 1)
+        replica.close.assert_not_called()
+
+    def test_document_load_is_retried(self):
+        store = PublishedDocumentStore()
+        with mock.patch('landing.published_page.PublishedPage.objects'
+                        '.filter',
+                        side_effect=OperationalError('connection reset')) \
+                as query:
+            with self.assertRaises(OperationalError):
+                store._load(generation=1)
+        self.assertEqual(query.call_count, RETRY_SETTINGS['MAX_ATTEMPTS'])
+        stats = get_retry_stats()['landing.published_page._load']
+        self.assertEqual(stats['retries'], 2)
+        self.assertEqual(stats['failures'], 1)
@@ -0,0 +1,51 @@
+# teddy_admin/tests/test_db_router.py
+"""
+Роутер основной БД и реплики (TeddyTale/db_router.py): реплику
+отключает только запись контента лендинга, служебные записи
+(ChangeLog, ImageJob, MediaBlob) не трогают ни метку, ни закрепление.
+"""
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from TeddyTale import db_router
+from teddy_admin.models import (ChangeLog, ImageJob, MediaBlob, PageSection,
+                                PublishedPage, SectionContent, ShopItem,
+                                SiteSettings)
+
+_TMP_DIR = tempfile.mkdtemp(prefix='teddytale-router-')
+STAMP_FILE = os.path.join(_TMP_DIR, 'db_write.stamp')
+
+
+def tearDownModule():
+    shutil.rmtree(_TMP_DIR, ignore_errors=True)
+
+
+@override_settings(DB_ROUTER={'WRITE_STAMP_FILE': STAMP_FILE})
+class ContentWriteTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = db_router.PrimaryReplicaRouter()
+        db_router.begin_request()
+        self.addCleanup(db_router.begin_request)
+        if os.path.exists(STAMP_FILE):
+            os.remove(STAMP_FILE)
+
+    def test_content_write_pins_request_and_touches_stamp(self):
+        for model in (PageSection, SectionContent, ShopItem, SiteSettings,
+                      PublishedPage):
+            with self.subTest(model=model.__name__):
+                db_router.begin_request()
+                self.assertEqual(self.router.db_for_write(model), 'default')
+                self.assertTrue(db_router.is_pinned())
+                self.assertTrue(os.path.exists(STAMP_FILE))
+                os.remove(STAMP_FILE)
+
+    def test_service_write_keeps_replica(self):
+        for model in (ChangeLog, ImageJob, MediaBlob):
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.router.db_for_write(model), 'default')
+                self.assertFalse(db_router.is_pinned())
+                self.assertFalse(os.path.exists(STAMP_FILE))
@@ -0,0 +1,105 @@
+# teddy_admin/tests/test_media_gc.py
+"""
+Сборка мусора в MEDIA_ROOT (teddy_admin/management/commands/media_gc.py):
+если на исходник сослались после обхода дерева, перед удалением пачки
+остаются и он, и его варианты, копии в других форматах и миниатюры.
+"""
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from TeddyTale.media_storage import digest_cache, hashed_media_url
+from teddy_admin.management.commands.media_gc import Command
+from teddy_admin.models import ImageVariant, PageSection, SectionContent
+
+_TMP_DIR = tempfile.mkdtemp(prefix='teddytale-media-gc-')
+MEDIA_ROOT = os.path.join(_TMP_DIR, 'media')
+
+SOURCE = 'uploads/bear.png'
+VARIANT = 'variants/bear-200.png'
+
+
+def tearDownModule():
+    shutil.rmtree(_TMP_DIR, ignore_errors=True)
+
+
+def _write(path, content):
+    full_path = os.path.join(MEDIA_ROOT, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, 'wb') as f:
+        f.write(content)
+    # Старше --min-age
+    os.utime(full_path, (0, 0))
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    LANDING_SNAPSHOT_FILE=os.path.join(_TMP_DIR, 'landing_snapshot.json'),
+    LANDING_SNAPSHOT_SEED_FILE=None,
+    PAGE_CACHE={'STAMP_FILE': os.path.join(_TMP_DIR, 'page_cache.stamp')},
+    DB_ROUTER={'WRITE_STAMP_FILE': os.path.join(_TMP_DIR, 'db_write.stamp')},
+)
+class MediaGcRecheckTests(TestCase):
+
+    def setUp(self):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 48), (120, 80, 40)).save(buffer, 'PNG')
+        _write(SOURCE, buffer.getvalue())
+        _write(VARIANT, b'variant')
+        self.derived = [
+            VARIANT,
+            f"transcodes/{SOURCE}.webp",
+            f"transcodes/{VARIANT}.avif",
+            f"thumbs/{digest_cache.get(SOURCE)}-100x100.webp",
+        ]
+        for path in self.derived[1:]:
+            _write(path, b'derived')
+        _write('uploads/orphan.png', b'orphan')
+        ImageVariant.objects.create(
+            source=SOURCE, width=200, height=150, source_width=64,
+            source_height=48, file_path=VARIANT, file_size=7,
+            mime_type='image/png')
+
+    def run_gc(self, after_scan):
+        report = Command._report
+
+        def report_then_reference(command, *args):
+            report(command, *args)
+            after_scan()
+
+        with mock.patch.object(Command, '_report', report_then_reference):
+            call_command('media_gc', min_age=60, stdout=io.StringIO())
+
+    def test_source_referenced_after_scan_keeps_derived_files(self):
+        def reference_source():
+            section = PageSection.objects.create(
+                section_key='hero', name='Hero', is_active=True)
+            # Ссылка в том виде, в каком ее сохраняет админка: URL с хешем
+            SectionContent.objects.create(
+                section=section, content_key='heroImage',
+                content_type='image', label='image',
+                value=hashed_media_url(SOURCE))
+
+        self.run_gc(reference_source)
+
+        for path in [SOURCE, *self.derived]:
+            self.assertTrue(os.path.exists(os.path.join(MEDIA_ROOT, path)),
+                            path)
+        self.assertTrue(ImageVariant.objects.filter(source=SOURCE).exists())
+        self.assertFalse(os.path.exists(
+            os.path.join(MEDIA_ROOT, 'uploads/orphan.png')))
+
+    def test_unreferenced_source_is_removed_with_derived_files(self):
+        self.run_gc(lambda: None)
+
+        for path in [SOURCE, *self.derived]:
+            self.assertFalse(os.path.exists(os.path.join(MEDIA_ROOT, path)),
+                             path)
+        self.assertFalse(ImageVariant.objects.exists())
@@ -0,0 +1,80 @@
+# teddy_admin/tests/test_media_views.py
+"""
+Отдача медиа по URL с хешем (TeddyTale/media_views.py): пока копия
+AVIF/WebP, которую принимает клиент, еще не создана, исходник
+кэшируется ненадолго и без immutable; готовая копия и исходник для
+клиента без AVIF/WebP - на год.
+"""
+import io
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from teddy_admin.image_transcodes import FORMATS, transcode_path
+from TeddyTale.media_storage import hashed_media_url
+
+_TMP_DIR = tempfile.mkdtemp(prefix='teddytale-media-views-')
+MEDIA_ROOT = os.path.join(_TMP_DIR, 'media')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+PENDING = 'public, max-age=60'
+ACCEPT_WEBP = 'image/webp,image/*,*/*;q=0.8'
+
+
+def tearDownModule():
+    shutil.rmtree(_TMP_DIR, ignore_errors=True)
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    MEDIA_HASHING={'MAX_AGE': 31536000, 'PENDING_MAX_AGE': 60,
+                   'TRANSCODE_WAIT': 900},
+    IMAGE_TRANSCODING={'FORMATS': {'WEBP': {'QUALITY': 80,
+                                            'MAX_BYTES': 250 * 1024}}},
+)
+class TranscodeCachingTests(SimpleTestCase):
+
+    def setUp(self):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        self.name = f'uploaded_images/{self._testMethodName}.jpg'
+        full_path = os.path.join(MEDIA_ROOT, self.name)
+        os.makedirs(os.path.dirname(full_path))
+        Image.new('RGB', (64, 48), (90, 60, 30)).save(full_path, 'JPEG')
+
+    def get(self, accept=ACCEPT_WEBP):
+        return self.client.get(hashed_media_url(self.name),
+                               HTTP_ACCEPT=accept)
+
+    def test_missing_transcode_is_cached_briefly(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], PENDING)
+        self.assertIn('Accept', response['Vary'])
+
+    def test_ready_transcode_is_immutable(self):
+        path = transcode_path(self.name, 'WEBP')
+        os.makedirs(os.path.dirname(os.path.join(MEDIA_ROOT, path)))
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 48)).save(buffer, 'WEBP')
+        with open(os.path.join(MEDIA_ROOT, path), 'wb') as f:
+            f.write(buffer.getvalue())
+
+        response = self.get()
+        self.assertEqual(response['Content-Type'], FORMATS['WEBP'][1])
+        self.assertEqual(response['Cache-Control'], IMMUTABLE)
+
+    def test_client_without_webp_gets_immutable_original(self):
+        response = self.get(accept='image/png,image/*;q=0.8')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], IMMUTABLE)
+
+    def test_old_source_without_transcode_is_immutable(self):
+        # Копия так и не появилась (не меньше исходника или ошибка)
+        os.utime(os.path.join(MEDIA_ROOT, self.name), (0, 0))
+        response = self.get()
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], IMMUTABLE)
@@ -0,0 +1,21 @@
+# teddy_admin/tests/test_migrations.py
+"""
+Миграции соответствуют моделям: новое поле или модель без миграции
+не создастся в рабочей базе (start.sh выполняет только migrate).
+"""
+import io
+
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class MigrationsTests(TestCase):
+
+    def test_no_missing_migrations(self):
+        output = io.StringIO()
+        try:
+            call_command('makemigrations', check=True, dry_run=True,
+                         stdout=output, stderr=output)
+        except SystemExit:
+            self.fail(f"Модели изменены без миграций - выполните "
+                      f"python manage.py makemigrations:\n{output.getvalue()}")
@@ -0,0 +1,430 @@
+# teddy_admin/tests/test_performance.py
+"""
+Регрессионные тесты производительности представлений.
+
+Для каждого сценария (страница лендинга, вход и панель админки,
+AJAX-представления) проверяются:
+- число SQL-запросов - не больше базового значения и одинаковое для
+  маленького и большого набора данных: рост с объемом данных означает
+  N+1 (запросы в цикле по секциям, товарам, записям);
+- пиковый объем памяти по tracemalloc - не больше базового значения
+  для своего набора данных с допуском PERF_MEMORY_TOLERANCE (по
+  умолчанию 1.1): пик немного меняется между версиями Python и Django.
+
+Базовые значения лежат в perf_baselines.json рядом с тестами.
+После намеренного изменения их нужно пересчитать и закоммитить:
+
+    python manage.py test teddy_admin.tests
+    PERF_BASELINES_UPDATE=1 python manage.py test teddy_admin.tests
+
+Файлы тестов (медиа, снимок лендинга, метки, журналы) пишутся во
+временную директорию, а не в media/, cache/ и logs/ проекта.
+"""
+import copy
+import gc
+import io
+import json
+import logging.config
+import math
+import os
+import shutil
+import tempfile
+import tracemalloc
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from landing.page_cache import page_cache
+from landing.published_page import PublishedDocumentStore, publish
+from teddy_admin.models import (ChangeLog, ImageJob, PageSection,
+                                SectionContent, ShopItem, SiteSettings,
+                                UploadedImage)
+
+BASELINES_FILE = os.path.join(os.path.dirname(__file__), 'perf_baselines.json')
+UPDATE_BASELINES = os.environ.get('PERF_BASELINES_UPDATE') == '1'
+# Запас к измеренной памяти при пересчете базовых значений
+MEMORY_HEADROOM = 1.25
+# Допуск к базовому значению памяти при проверке
+MEMORY_TOLERANCE = float(os.environ.get('PERF_MEMORY_TOLERANCE', '1.1'))
+
+# Размеры наборов данных
+DATASETS = {
+    'small': {'shop_items': 3, 'extra_contents': 0, 'uploaded_images': 2,
+              'changelog': 10},
+    'large': {'shop_items': 9, 'extra_contents': 40, 'uploaded_images': 60,
+              'changelog': 3000},
+}
+
+_TMP_DIR = tempfile.mkdtemp(prefix='teddytale-perf-')
+# Измерения для пересчета базовых значений: сценарий -> набор -> значения
+_measurements = {}
+
+
+def _load_baselines():
+    try:
+        with open(BASELINES_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _png(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _logging_config(log_dir=None):
+    """LOGGING проекта; с log_dir файлы журналов лежат в log_dir"""
+    config = copy.deepcopy(settings.LOGGING)
+    config['disable_existing_loggers'] = False
+    if log_dir is not None:
+        for handler in config['handlers'].values():
+            if 'filename' in handler:
+                handler['filename'] = os.path.join(
+                    log_dir, os.path.basename(handler['filename']))
+    return config
+
+
+def setUpModule():
+    log_dir = os.path.join(_TMP_DIR, 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    logging.config.dictConfig(_logging_config(log_dir))
+
+
+def tearDownModule():
+    logging.config.dictConfig(_logging_config())
+    shutil.rmtree(_TMP_DIR, ignore_errors=True)
+    if not UPDATE_BASELINES or not _measurements:
+        return
+
+    baselines = _load_baselines()
+    for scenario, by_dataset in _measurements.items():
+        entry = baselines.setdefault(scenario, {'queries': 0, 'peak_kib': {}})
+        entry['queries'] = max(values['queries']
+                               for values in by_dataset.values())
+        for dataset, values in by_dataset.items():
+            entry['peak_kib'][dataset] = int(
+                math.ceil(values['peak_kib'] * MEMORY_HEADROOM / 16) * 16)
+    with open(BASELINES_FILE, 'w', encoding='utf-8') as f:
+        json.dump(baselines, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+# Файлы тестов - во временной директории, а не в media/ и cache/ проекта
+perf_settings = override_settings(
+    MEDIA_ROOT=os.path.join(_TMP_DIR, 'media'),
+    LANDING_SNAPSHOT_FILE=os.path.join(_TMP_DIR, 'landing_snapshot.json'),
+    LANDING_SNAPSHOT_SEED_FILE=None,
+    PAGE_CACHE={'STAMP_FILE': os.path.join(_TMP_DIR, 'page_cache.stamp')},
+    REQUEST_METRICS={'DIR': os.path.join(_TMP_DIR, 'metrics')},
+    DB_ROUTER={'WRITE_STAMP_FILE': os.path.join(_TMP_DIR, 'db_write.stamp')},
+    REQUEST_PROFILER={'DIR': os.path.join(_TMP_DIR, 'profiles')},
+    IMAGE_JOBS={'PERSIST': True},
+)
+
+
+class ViewPerformanceMixin:
+    """Сценарии и проверки; набор данных задает подкласс"""
+
+    dataset = None
+    baselines = _load_baselines()
+
+    @classmethod
+    def setUpTestData(cls):
+        sizes = DATASETS[cls.dataset]
+        cls.admin = User.objects.create_superuser('perf', 'perf@example.com',
+                                                  'perf-password')
+
+        contents = {
+            'meta': [('title', 'text', 'Teddy Tale'),
+                     ('description', 'textarea', 'Мишки ручной работы')],
+            'hero': [('titleHero', 'text', 'Мишки Тедди'),
+                     ('heroImage', 'image', 'uploaded_images/hero.png')],
+            'about': [('aboutTitleBlock1', 'text', 'История мастера'),
+                      ('aboutImage', 'image', 'uploaded_images/about.png')]
+                     + [(f'aboutExtra{index}', 'text', f'Текст {index}')
+                        for index in range(sizes['extra_contents'])],
+            'contacts': [('contactsCity', 'text', 'Санкт-Петербург'),
+                         ('mapCoords', 'coordinates', '59.819987,30.337649')],
+        }
+        for order_index, (section_key, fields) in enumerate(contents.items()):
+            section = PageSection.objects.create(
+                section_key=section_key, name=section_key, is_active=True,
+                order_index=order_index)
+            SectionContent.objects.bulk_create(
+                SectionContent(section=section, content_key=key, label=key,
+                               content_type=content_type, value=value,
+                               order_index=index)
+                for index, (key, content_type, value) in enumerate(fields))
+
+        # bulk_create - без сигналов и фоновых задач
+        ShopItem.objects.bulk_create(
+            ShopItem(slot_number=slot, title=f'Мишка {slot}',
+                     description='Описание', price='3000',
+                     image=f'shop_items/item-{slot}.png', order_index=slot)
+            for slot in range(1, sizes['shop_items'] + 1))
+        UploadedImage.objects.bulk_create(
+            UploadedImage(original_filename=f'{index}.png',
+                          stored_filename=f'{index}.png',
+                          file_path=f'uploaded_images/{index}.png',
+                          file_size=100, mime_type='image/png',
+                          section_type='gallery', content_key=f'image{index}',
+                          uploaded_by=cls.admin)
+            for index in range(sizes['uploaded_images']))
+        SiteSettings.objects.create(setting_key='site_name',
+                                    setting_value='Teddy Tale')
+        ChangeLog.objects.bulk_create(
+            (ChangeLog(user=cls.admin, changed_table='ShopItem',
+                       record_id=index, action='UPDATE', old_value='1',
+                       new_value='2')
+             for index in range(sizes['changelog'])),
+            batch_size=1000)
+        cls.item = ShopItem.objects.order_by('slot_number').first()
+        cls.job = ImageJob.objects.create(kind='process_image',
+                                          status='done')
+        publish()
+
+    def setUp(self):
+        os.makedirs(os.path.join(_TMP_DIR, 'media'), exist_ok=True)
+        self._reset_page_caches()
+
+    def _reset_page_caches(self):
+        """Состояние только что запущенного воркера: кэши пусты, снимка нет"""
+        patcher = mock.patch('landing.published_page.document_store',
+                             PublishedDocumentStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        page_cache.bump_generation()
+        snapshot = os.path.join(_TMP_DIR, 'landing_snapshot.json')
+        if os.path.exists(snapshot):
+            os.remove(snapshot)
+
+    def _measure(self, make_request, warm_up=None):
+        """
+        Выполняет запрос под CaptureQueriesContext и tracemalloc.
+        warm_up - такой же запрос до замера (шаблоны, импорты, кэши Django)
+        """
+        if warm_up is not None:
+            warm_up()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                response = make_request()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return response, queries, peak
+
+    def assertWithinBaseline(self, scenario, response, queries, peak):
+        self.assertLess(response.status_code, 400,
+                        f"{scenario}: ответ {response.status_code}")
+        measured = {'queries': len(queries),
+                    'peak_kib': math.ceil(peak / 1024)}
+        if UPDATE_BASELINES:
+            _measurements.setdefault(scenario, {})[self.dataset] = measured
+            return
+
+        baseline = self.baselines.get(scenario)
+        if baseline is None:
+            self.fail(f"Нет базового значения для '{scenario}': "
+                      f"запустите тесты с PERF_BASELINES_UPDATE=1")
+
+        if measured['queries'] > baseline['queries']:
+            sql = '\n'.join(f"  {number}. {query['sql']}"
+                            for number, query in enumerate(queries, 1))
+            self.fail(
+                f"{scenario} [{self.dataset}]: {measured['queries']} "
+                f"SQL-запросов при допустимых {baseline['queries']}. "
+                f"Число запросов не должно зависеть от объема данных - "
+                f"проверьте запросы в циклах (N+1):\n{sql}")
+
+        limit = baseline['peak_kib'].get(self.dataset)
+        if limit is not None and measured['peak_kib'] > math.ceil(
+                limit * MEMORY_TOLERANCE):
+            self.fail(
+                f"{scenario} [{self.dataset}]: пик памяти "
+                f"{measured['peak_kib']} КиБ при базовых {limit} КиБ "
+                f"(допуск x{MEMORY_TOLERANCE})")
+
+    def _login(self):
+        self.client.force_login(self.admin)
+
+    def _post_json(self, url, data):
+        return self.client.post(url, json.dumps(data),
+                                content_type='application/json')
+
+    # --------------------
+    # Лендинг
+    # --------------------
+
+    def test_index(self):
+        url = reverse('landing:index')
+
+        def cold_request():
+            self._reset_page_caches()
+            return self.client.get(url)
+
+        self.assertWithinBaseline('index',
+                                  *self._measure(cold_request, cold_request))
+
+    def test_index_cached(self):
+        url = reverse('landing:index')
+        self.assertWithinBaseline(
+            'index_cached',
+            *self._measure(lambda: self.client.get(url),
+                           lambda: self.client.get(url)))
+
+    def test_privacy(self):
+        url = reverse('landing:privacy')
+
+        def cold_request():
+            self._reset_page_caches()
+            return self.client.get(url)
+
+        self.assertWithinBaseline('privacy',
+                                  *self._measure(cold_request, cold_request))
+
+    # --------------------
+    # Вход и панель админки
+    # --------------------
+
+    def test_custom_admin_login_page(self):
+        url = reverse('teddy_admin_custom:custom-login')
+        self.assertWithinBaseline(
+            'custom_admin_login',
+            *self._measure(lambda: self.client.get(url),
+                           lambda: self.client.get(url)))
+
+    def test_custom_admin_login_submit(self):
+        url = reverse('teddy_admin_custom:custom-login')
+
+        def submit():
+            return self.client.post(url, {'login': 'perf',
+                                          'password': 'perf-password'})
+
+        def warm_up():
+            # logout() - вне замера, иначе его запросы попадут в базовую линию
+            submit()
+            self.client.logout()
+
+        self.assertWithinBaseline('custom_admin_login_submit',
+                                  *self._measure(submit, warm_up))
+
+    def test_custom_admin_panel(self):
+        self._login()
+        url = reverse('teddy_admin_custom:custom-panel')
+        self.assertWithinBaseline(
+            'custom_admin_panel',
+            *self._measure(lambda: self.client.get(url),
+                           lambda: self.client.get(url)))
+
+    # --------------------
+    # AJAX
+    # --------------------
+
+    def test_update_shop_item_ajax(self):
+        self._login()
+        url = reverse('teddy_admin_custom:update-shop-item',
+                      args=[self.item.pk])
+        self.assertWithinBaseline(
+            'update_shop_item_ajax',
+            *self._measure(
+                lambda: self._post_json(url, {'title': 'Мишка Бука'}),
+                lambda: self._post_json(url, {'title': 'Мишка'})))
+
+    def test_update_section_content_ajax(self):
+        self._login()
+        url = reverse('teddy_admin_custom:update-section', args=['hero'])
+        self.assertWithinBaseline(
+            'update_section_content_ajax',
+            *self._measure(
+                lambda: self._post_json(url, {'content_key': 'titleHero',
+                                              'value': 'Новый заголовок'}),
+                lambda: self._post_json(url, {'content_key': 'titleHero',
+                                              'value': 'Заголовок'})))
+
+    def test_update_site_settings_ajax(self):
+        self._login()
+        url = reverse('teddy_admin_custom:update-site-settings')
+        self.assertWithinBaseline(
+            'update_site_settings_ajax',
+            *self._measure(
+                lambda: self._post_json(url, {'setting_key': 'site_name',
+                                              'setting_value': 'Teddy'}),
+                lambda: self._post_json(url, {'setting_key': 'site_name',
+                                              'setting_value': 'Tale'})))
+
+    def test_upload_image_ajax(self):
+        self._login()
+        url = reverse('teddy_admin_custom:upload-image')
+
+        def upload(color):
+            return lambda: self.client.post(url, {
+                'image': SimpleUploadedFile(f'{color}.png', _png(color),
+                                            content_type='image/png'),
+                'section_type': 'hero',
+                'content_key': 'heroImage',
+            })
+
+        # Разное содержимое: повторная загрузка того же файла - другой путь
+        self.assertWithinBaseline(
+            'upload_image_ajax',
+            *self._measure(upload('red'), upload('blue')))
+
+    def test_upload_shop_item_image_ajax(self):
+        self._login()
+        url = reverse('teddy_admin_custom:upload-shop-item-image',
+                      args=[self.item.pk])
+
+        def upload(color):
+            return lambda: self.client.post(url, {
+                'image': SimpleUploadedFile(f'{color}.png', _png(color),
+                                            content_type='image/png'),
+            })
+
+        self.assertWithinBaseline(
+            'upload_shop_item_image_ajax',
+            *self._measure(upload('green'), upload('yellow')))
+
+    def test_image_job_status_ajax(self):
+        self._login()
+        url = reverse('teddy_admin_custom:image-job-status',
+                      args=[self.job.pk])
+        self.assertWithinBaseline(
+            'image_job_status_ajax',
+            *self._measure(lambda: self.client.get(url),
+                           lambda: self.client.get(url)))
+
+    # --------------------
+    # Публикация документа лендинга (после каждого изменения контента)
+    # --------------------
+
+    def test_publish(self):
+        class _Response:
+            status_code = 200
+
+        def run_publish():
+            publish()
+            return _Response()
+
+        self.assertWithinBaseline('publish',
+                                  *self._measure(run_publish, run_publish))
+
+
+@perf_settings
+class SmallDatasetPerformanceTests(ViewPerformanceMixin, TestCase):
+    dataset = 'small'
+
+
+@perf_settings
+class LargeDatasetPerformanceTests(ViewPerformanceMixin, TestCase):
+    dataset = 'large'
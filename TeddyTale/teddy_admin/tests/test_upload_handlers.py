@@ -0,0 +1,149 @@
+# teddy_admin/tests/test_upload_handlers.py
+"""
+Потоковая загрузка изображений (teddy_admin/upload_handlers.py):
+- CSRF проверяется и после замены csrf_protect на streaming_image_upload;
+- файл не-изображение или обрезанный файл отклоняется через
+  request.upload_error и не остается в MEDIA_ROOT;
+- у принятого изображения верные sha256 и размеры, а размеры
+  читаются из заголовка без декодера и буфера пикселей.
+"""
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, ImageFile
+
+from teddy_admin.models import UploadedImage
+
+_TMP_DIR = tempfile.mkdtemp(prefix='teddytale-upload-')
+MEDIA_ROOT = os.path.join(_TMP_DIR, 'media')
+
+
+def tearDownModule():
+    shutil.rmtree(_TMP_DIR, ignore_errors=True)
+
+
+def _png(width=64, height=48):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 120, 90)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _media_files():
+    """Файлы в MEDIA_ROOT (пустые директории не считаются)"""
+    return [os.path.join(root, name)
+            for root, _, names in os.walk(MEDIA_ROOT) for name in names]
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    LANDING_SNAPSHOT_FILE=os.path.join(_TMP_DIR, 'landing_snapshot.json'),
+    LANDING_SNAPSHOT_SEED_FILE=None,
+    PAGE_CACHE={'STAMP_FILE': os.path.join(_TMP_DIR, 'page_cache.stamp')},
+    REQUEST_METRICS={'DIR': os.path.join(_TMP_DIR, 'metrics')},
+    DB_ROUTER={'WRITE_STAMP_FILE': os.path.join(_TMP_DIR, 'db_write.stamp')},
+)
+class StreamingImageUploadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'uploader', 'uploader@example.com', 'upload-password')
+
+    def setUp(self):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        self.client.force_login(self.admin)
+        self.url = reverse('teddy_admin_custom:upload-image')
+
+    def upload(self, content, name='image.png', client=None, **extra):
+        return (client or self.client).post(self.url, {
+            'image': SimpleUploadedFile(name, content, 'image/png'),
+            'section_type': 'hero',
+            'content_key': 'heroImage',
+        }, **extra)
+
+    def test_post_without_csrf_token_is_rejected(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.admin)
+        response = self.upload(_png(), client=client)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(UploadedImage.objects.exists())
+
+    def test_post_with_csrf_token_is_accepted(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.admin)
+        # Токен появляется в сессии при показе панели
+        client.get(reverse('teddy_admin_custom:custom-panel'))
+        token = client.session['_csrftoken']
+        response = self.upload(_png(), client=client,
+                               HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 200)
+
+    def test_non_image_is_rejected_without_writing_media(self):
+        response = self.upload(b'<?php echo "not an image"; ?>' * 10,
+                               name='image.png')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Неподдерживаемый тип файла',
+                      response.json()['message'])
+        self.assertEqual(_media_files(), [])
+        self.assertFalse(UploadedImage.objects.exists())
+
+    def test_truncated_image_is_rejected_without_writing_media(self):
+        png = _png()
+        for content in (png[:8], png[:40], png[:-12]):
+            with self.subTest(size=len(content)):
+                response = self.upload(content)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('не является изображением',
+                              response.json()['message'])
+                self.assertEqual(_media_files(), [])
+        self.assertFalse(UploadedImage.objects.exists())
+
+    def test_valid_formats_are_accepted(self):
+        for image_format, name in (('JPEG', 'image.jpg'), ('GIF', 'image.gif'),
+                                   ('WEBP', 'image.webp')):
+            with self.subTest(image_format=image_format):
+                buffer = io.BytesIO()
+                Image.new('RGB', (32, 24), (10, 20, 30)).save(buffer,
+                                                               image_format)
+                response = self.upload(buffer.getvalue(), name=name)
+                self.assertEqual(response.json()['status'], 'success')
+
+    def test_valid_image_gets_sha256_and_dimensions(self):
+        content = _png(64, 48)
+        response = self.upload(content)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['status'], 'success')
+
+        image = UploadedImage.objects.get()
+        self.assertEqual(image.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual((image.width, image.height), (64, 48))
+        self.assertEqual(image.mime_type, 'image/png')
+        self.assertEqual(_media_files(),
+                         [os.path.join(MEDIA_ROOT, image.file_path)])
+
+    def test_large_gif_dimensions_are_read_without_decoding(self):
+        buffer = io.BytesIO()
+        Image.new('P', (4000, 4000)).save(buffer, 'GIF')
+        content = buffer.getvalue()
+        for data, status in ((content, 200), (content[:2048], 400)):
+            with self.subTest(size=len(data)), \
+                    mock.patch.object(ImageFile.ImageFile, 'load_prepare',
+                                      autospec=True) as load_prepare, \
+                    mock.patch.object(Image.core, 'new',
+                                      wraps=Image.core.new) as new_buffer:
+                response = self.upload(data, name='image.gif')
+            self.assertEqual(response.status_code, status, response.content)
+            # Ни декодера, ни буфера пикселей 4000x4000
+            load_prepare.assert_not_called()
+            new_buffer.assert_not_called()
+
+        image = UploadedImage.objects.get()
+        self.assertEqual((image.width, image.height), (4000, 4000))
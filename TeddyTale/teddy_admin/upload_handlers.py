@@ -0,0 +1,209 @@
+# teddy_admin/upload_handlers.py
+"""
+Потоковая загрузка изображений из админ-панели.
+
+ImageUploadHandler принимает тело запроса по частям и за один проход:
+- пишет файл во временный файл в MEDIA_ROOT/tmp (та же файловая
+  система, поэтому media_store перемещает его на место атомарно);
+- считает sha256 (повторное чтение для дедупликации не нужно);
+- определяет формат по сигнатуре (magic bytes), а не по Content-Type
+  клиента, и отклоняет загрузку на первых байтах;
+- отклоняет обрезанные файлы: проверяет окончание файла (IEND у PNG,
+  FFD9 у JPEG, 3B у GIF) и размер из заголовка RIFF у WEBP;
+- читает размеры из заголовка изображения без декодирования пикселей:
+  первые HEADER_LIMIT байт открываются Image.open без load(), буфер
+  пикселей не создается.
+
+Подключается декоратором streaming_image_upload вместо csrf_protect:
+обработчик должен быть установлен до чтения request.POST.
+"""
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import warnings
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Сигнатура -> MIME-тип. WEBP: RIFF????WEBP
+_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+_SNIFF_LENGTH = 12
+# Чем заканчивается целый файл (нули и переводы строк в конце допустимы)
+_TRAILERS = {
+    'image/png': b'IEND\xaeB`\x82',
+    'image/jpeg': b'\xff\xd9',
+    'image/gif': b'\x3b',
+}
+_TAIL_LENGTH = 64
+
+
+def _get_config():
+    config = {
+        'MAX_SIZE': 5 * 1024 * 1024,  # Байт
+        'ALLOWED_TYPES': ('image/jpeg', 'image/png', 'image/webp', 'image/gif'),
+        # Сколько байт заголовка читать в поисках размеров
+        'HEADER_LIMIT': 256 * 1024,
+        'TEMP_DIR': 'tmp',  # Поддиректория MEDIA_ROOT
+    }
+    config.update(getattr(settings, 'IMAGE_UPLOADS', {}))
+    return config
+
+
+def sniff_image_type(head):
+    """MIME-тип по первым байтам файла или None"""
+    for signature, mime_type in _SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+class StreamedImageFile(TemporaryUploadedFile):
+    """
+    Загруженное изображение во временном файле в MEDIA_ROOT.
+    content_type определен по содержимому; sha256, width, height
+    посчитаны при приеме.
+    """
+
+    def __init__(self, name, temp_dir, charset=None, content_type_extra=None):
+        _, extension = os.path.splitext(name)
+        os.makedirs(temp_dir, exist_ok=True)
+        file = tempfile.NamedTemporaryFile(suffix='.upload' + extension,
+                                           dir=temp_dir)
+        super(TemporaryUploadedFile, self).__init__(
+            file, name, None, 0, charset, content_type_extra)
+        self.sha256 = None
+        self.width = None
+        self.height = None
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """Обработчик загрузки: хеш, проверка сигнатуры и размеры за один проход"""
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.config = _get_config()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        temp_dir = os.path.join(settings.MEDIA_ROOT, self.config['TEMP_DIR'])
+        self.file = StreamedImageFile(self.file_name, temp_dir, self.charset,
+                                      self.content_type_extra)
+        self.digest = hashlib.sha256()
+        # Начало файла: сигнатура и заголовок с размерами
+        self.head = bytearray()
+        self.header_done = False
+        self.tail = b''
+        self.riff_size = None
+
+    def _reject(self, message):
+        logger.warning(f"Загрузка {self.file_name} отклонена: {message}")
+        if self.request is not None:
+            self.request.upload_error = message
+        self.upload_interrupted()
+        # Остаток тела запроса пропускается без записи на диск
+        raise StopUpload(connection_reset=False)
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.config['MAX_SIZE']:
+            self._reject(f"Файл слишком большой. Максимальный размер: "
+                         f"{self.config['MAX_SIZE'] // (1024 * 1024)}MB")
+
+        if not self.header_done:
+            self.head += raw_data[:self.config['HEADER_LIMIT']
+                                  - len(self.head)]
+
+        if self.file.content_type is None:
+            if len(self.head) >= _SNIFF_LENGTH:
+                mime_type = sniff_image_type(self.head)
+                if mime_type not in self.config['ALLOWED_TYPES']:
+                    self._reject("Неподдерживаемый тип файла. "
+                                 "Разрешены: JPEG, PNG, WEBP, GIF")
+                self.file.content_type = mime_type
+                if mime_type == 'image/webp':
+                    # Размер файла из заголовка RIFF (без первых 8 байт)
+                    self.riff_size = int.from_bytes(self.head[4:8],
+                                                    'little') + 8
+
+        if not self.header_done and self.file.content_type is not None:
+            self._read_header()
+
+        self.tail = (self.tail + raw_data)[-_TAIL_LENGTH:]
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+        # Данные записаны, другим обработчикам их передавать не нужно
+        return None
+
+    def _read_header(self):
+        """
+        Размеры из заголовка. Image.open читает только заголовок формата
+        и не вызывает load(): пиксели не декодируются, буфер не создается.
+        """
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+                with Image.open(io.BytesIO(self.head)) as image:
+                    self.file.width, self.file.height = image.size
+        except Image.DecompressionBombError:
+            self._reject("Слишком большое изображение (число пикселей)")
+        except Exception:
+            if len(self.head) < self.config['HEADER_LIMIT']:
+                # Заголовок еще не получен целиком
+                return
+            # Размеры посчитает фоновая задача (teddy_admin/image_jobs.py)
+        self.header_done = True
+        self.head = None
+
+    def file_complete(self, file_size):
+        if self.file.content_type is None:
+            # Файл короче сигнатуры
+            self._reject("Файл не является изображением")
+        if not self._is_complete(file_size):
+            self._reject("Файл поврежден (обрезан) или не является "
+                         "изображением")
+        self.file.flush()
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.digest.hexdigest()
+        self.head = None
+        return self.file
+
+    def _is_complete(self, file_size):
+        """Файл загружен целиком: верное окончание или размер RIFF"""
+        if self.riff_size is not None:
+            return file_size >= self.riff_size
+        trailer = _TRAILERS.get(self.file.content_type)
+        return (trailer is None
+                or self.tail.rstrip(b'\x00\r\n').endswith(trailer))
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.close()
+
+
+def streaming_image_upload(view_func):
+    """
+    Декоратор представления загрузки: включает ImageUploadHandler
+    и проверяет CSRF уже после его установки.
+    """
+    protected_view = csrf_protect(view_func)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [ImageUploadHandler(request)]
+        return protected_view(request, *args, **kwargs)
+    return csrf_exempt(wrapper)
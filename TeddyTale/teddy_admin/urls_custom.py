@@ -17,6 +17,12 @@ urlpatterns = [
     path('ajax/upload-shop-item-image/<int:item_id>/',
          views_custom.upload_shop_item_image_ajax,
          name='upload-shop-item-image'),
+    path('ajax/image-job/<str:job_id>/',
+         views_custom.image_job_status_ajax, name='image-job-status'),
     path('ajax/update-site-settings/',
          views_custom.update_site_settings_ajax, name='update-site-settings'),
+    path('slow-queries/', views_custom.slow_queries_view, name='slow-queries'),
+    path('profiles/', views_custom.profiles_view, name='profiles'),
+    path('profiles/<str:name>.prof',
+         views_custom.profile_download, name='profile-download'),
 ]
\ No newline at end of file
@@ -3,14 +3,22 @@ import os
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, JsonResponse
 from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.http import require_http_methods, require_POST
 from django.conf import settings
 from django.utils import timezone
 from uuid import uuid4
+from landing.content_repository import load_page_content
+from TeddyTale.media_storage import hashed_media_url
+from TeddyTale.request_profiler import list_profiles, profile_path
+from TeddyTale.slow_queries import get_config as get_slow_queries_config
+from TeddyTale.slow_queries import slow_query_log
+from .image_jobs import image_job_queue
+from .media_store import store_upload
 from .models import PageSection, ShopItem, SectionContent, ChangeLog, SiteSettings, UploadedImage
 from .permissions_custom import is_site_admin, check_site_admin_access
+from .upload_handlers import streaming_image_upload
 
 
 @csrf_protect
@@ -36,22 +44,7 @@ def custom_admin_login(request):
 
     # Загружаем контакты из базы данных для футера
     try:
-        contacts_section = (PageSection.objects
-                            .filter(section_key='contacts').first())
-        contacts_contents = {}
-
-        if contacts_section:
-            # Получаем содержимое секции контактов
-            contents = (SectionContent.objects
-                        .filter(section=contacts_section)
-                        .order_by('order_index'))
-            for content in contents:
-                contacts_contents[content.content_key] = {
-                    'value': content.value,
-                    'label': content.label,
-                    'content_type': content.content_type,
-                    'id': content.id
-                }
+        contacts_contents = load_page_content().section('contacts')
     except Exception as e:
         # В случае ошибки используем пустой словарь
         import logging
@@ -121,32 +114,18 @@ def custom_admin_panel(request):
     shop_items = (ShopItem.objects.filter(is_active=True)
                   .order_by('slot_number'))
 
-    # Создаем словарь для хранения содержимого каждой секции
-    section_contents = {}
-
-    for section in page_sections:
-        contents = (SectionContent.objects.filter(section=section)
-                    .order_by('order_index'))
-        content_dict = {}
-        for content in contents:
-            content_dict[content.content_key] = {
-                'value': content.value,
-                'label': content.label,
-                'content_type': content.content_type,
-                'id': content.id
-            }
-        section_contents[section.section_key] = content_dict
+    # Содержимое всех активных секций одним запросом
+    page_content = load_page_content()
 
     # Получаем контент для каждой секции
-    meta_contents = section_contents.get('meta', {})
-    hero_contents = section_contents.get('hero', {})
-    about_contents = section_contents.get('about', {})
-    contacts_contents = section_contents.get('contacts', {})
+    meta_contents = page_content.section('meta')
+    hero_contents = page_content.section('hero')
+    about_contents = page_content.section('about')
+    contacts_contents = page_content.section('contacts')
 
     # Получаем настройки сайта
-    site_settings = {}
-    for setting in SiteSettings.objects.all():
-        site_settings[setting.setting_key] = setting.setting_value
+    site_settings = dict(SiteSettings.objects
+                         .values_list('setting_key', 'setting_value'))
 
     # Получаем загруженные изображения
     uploaded_images = UploadedImage.objects.filter(is_active=True)
@@ -383,10 +362,11 @@ def update_section_content_ajax(request, section_key):
 
 @require_POST
 @login_required
-@csrf_protect
+@streaming_image_upload
 def upload_image_ajax(request):
     """
-    AJAX-загрузка изображения для секций (hero, about)
+    AJAX-загрузка изображения для секций (hero, about).
+    Тип, sha256 и размеры определяет ImageUploadHandler при приеме файла.
     """
     check_site_admin_access(request.user)
 
@@ -394,7 +374,8 @@ def upload_image_ajax(request):
         if 'image' not in request.FILES:
             return JsonResponse({
                 'status': 'error',
-                'message': 'Файл изображения не найден'
+                'message': getattr(request, 'upload_error',
+                                   'Файл изображения не найден')
             }, status=400)
 
         image_file = request.FILES['image']
@@ -416,41 +397,22 @@ def upload_image_ajax(request):
         section_type = request.POST.get('section_type', '')
         content_key = request.POST.get('content_key', '')
 
-        # Генерируем новое имя файла
+        # Генерируем новое имя записи
         original_filename = image_file.name
         file_extension = os.path.splitext(original_filename)[1]
         stored_filename = f"{uuid4().hex}{file_extension}"
-        file_path = f"uploaded_images/{stored_filename}"
 
-        # Создаем директорию если не существует
-        os.makedirs(os.path.dirname(f"media/{file_path}"), exist_ok=True)
+        # Сохраняем новый файл: одинаковое содержимое хранится один раз.
+        # Ссылка на файл добавляется до удаления старых записей, чтобы
+        # повторно загруженный файл не удалился вместе с ними.
+        file_path, sha256 = store_upload(image_file, 'uploaded_images')
 
-        # Находим все старые изображения для этой секции и ключа контента
-        old_images = UploadedImage.objects.filter(
+        # Удаляем старые изображения для этой секции и ключа контента
+        # (файлы удалит фоновая задача, см. teddy_admin/image_jobs.py)
+        UploadedImage.objects.filter(
             section_type=section_type,
             content_key=content_key
-        )
-
-        # Удаляем старые файлы из файловой системы
-        for old_image in old_images:
-            if old_image.file_path:
-                old_file_path = os.path.join(settings.MEDIA_ROOT, old_image.file_path)
-                if os.path.exists(old_file_path):
-                    try:
-                        os.remove(old_file_path)
-                    except Exception as e:
-                        # Логируем ошибку, но продолжаем выполнение
-                        import logging
-                        logger = logging.getLogger(__name__)
-                        logger.error(f"Ошибка при удалении старого файла {old_file_path}: {e}")
-
-        # Удаляем старые записи из базы данных
-        old_images.delete()
-
-        # Сохраняем новый файл
-        with open(f"media/{file_path}", 'wb') as f:
-            for chunk in image_file.chunks():
-                f.write(chunk)
+        ).delete()
 
         # Создаем новую запись UploadedImage
         uploaded_image = UploadedImage.objects.create(
@@ -459,6 +421,9 @@ def upload_image_ajax(request):
             file_path=file_path,
             file_size=image_file.size,
             mime_type=image_file.content_type,
+            width=getattr(image_file, 'width', None),
+            height=getattr(image_file, 'height', None),
+            sha256=sha256,
             section_type=section_type,
             content_key=content_key,
             uploaded_by=request.user,
@@ -500,7 +465,9 @@ def upload_image_ajax(request):
                 'stored_filename': uploaded_image.stored_filename,
                 'file_path': uploaded_image.file_path,
                 'file_size': uploaded_image.file_size,
-                'url': f"{settings.MEDIA_URL}{uploaded_image.file_path}",
+                'url': hashed_media_url(uploaded_image.file_path),
+                # Размеры и варианты для srcset готовит фоновая задача
+                'job_id': getattr(uploaded_image, 'image_job_id', None),
             }
         })
 
@@ -513,10 +480,7 @@ def upload_image_ajax(request):
 
 @require_POST
 @login_required
-@csrf_protect
-@require_POST
-@login_required
-@csrf_protect
+@streaming_image_upload
 def upload_shop_item_image_ajax(request, item_id):
     """
     AJAX-загрузка изображения для товара ShopItem
@@ -527,7 +491,8 @@ def upload_shop_item_image_ajax(request, item_id):
         if 'image' not in request.FILES:
             return JsonResponse({
                 'status': 'error',
-                'message': 'Файл изображения не найден'
+                'message': getattr(request, 'upload_error',
+                                   'Файл изображения не найден')
             }, status=400)
 
         image_file = request.FILES['image']
@@ -552,41 +517,11 @@ def upload_shop_item_image_ajax(request, item_id):
         # Сохраняем информацию о старом изображении
         old_image = shop_item.image
 
-        # Обновляем изображение товара
+        # Обновляем изображение товара. Старый файл удаляется, а варианты
+        # для srcset создаются в фоновой задаче (teddy_admin/image_jobs.py)
         shop_item.image = image_file
-
-        # Принудительно сохраняем модель
         shop_item.save()
 
-        # Логируем информацию о файле
-        import logging
-        logger = logging.getLogger(__name__)
-
-        # Получаем полный путь к файлу
-        image_path = shop_item.image.path if hasattr(shop_item.image, 'path') else ''
-        logger.info(f"Изображение загружено: {shop_item.image.name}")
-        logger.info(f"Полный путь: {shop_item.image.path if hasattr(shop_item.image, 'path') else 'N/A'}")
-        logger.info(f"URL: {shop_item.image.url if hasattr(shop_item.image, 'url') else 'N/A'}")
-        logger.info(f"MEDIA_ROOT: {settings.MEDIA_ROOT}")
-
-        # Проверяем существование файла
-        if os.path.exists(image_path):
-            logger.info(f"Файл существует по пути: {image_path}")
-            file_size = os.path.getsize(image_path)
-            logger.info(f"Размер файла: {file_size} байт")
-        else:
-            logger.warning(f"Файл НЕ существует по пути: {image_path}")
-
-        # Удаляем старый файл изображения, если он существует
-        if old_image and old_image.name:
-            try:
-                old_image_path = os.path.join(settings.MEDIA_ROOT, old_image.name)
-                if os.path.isfile(old_image_path):
-                    os.remove(old_image_path)
-                    logger.info(f"Старый файл удален: {old_image_path}")
-            except Exception as e:
-                logger.error(f"Ошибка при удалении старого файла: {e}")
-
         ChangeLog.objects.create(
             user=request.user,
             changed_table='ShopItem',
@@ -597,7 +532,7 @@ def upload_shop_item_image_ajax(request, item_id):
         )
 
         # Возвращаем правильный URL
-        image_url = shop_item.image.url if hasattr(shop_item.image, 'url') else f"{settings.MEDIA_URL}{shop_item.image.name}"
+        image_url = hashed_media_url(shop_item.image.name)
 
         return JsonResponse({
             'status': 'success',
@@ -606,6 +541,7 @@ def upload_shop_item_image_ajax(request, item_id):
                 'id': shop_item.id,
                 'image_url': image_url,
                 'image_name': shop_item.image.name.split('/')[-1] if shop_item.image else '',
+                'job_id': getattr(shop_item, 'image_job_id', None),
             }
         })
 
@@ -697,4 +633,73 @@ def update_site_settings_ajax(request):
         return JsonResponse({
             'status': 'error',
             'message': f'Ошибка при обновлении: {str(e)}'
-        }, status=400)
\ No newline at end of file
+        }, status=400)
+
+@require_http_methods(["GET"])
+@login_required
+def image_job_status_ajax(request, job_id):
+    """
+    AJAX-статус фоновой обработки загруженного изображения
+    """
+    check_site_admin_access(request.user)
+
+    job = image_job_queue.get(job_id)
+    if job is None:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Задача {job_id} не найдена'
+        }, status=404)
+
+    return JsonResponse({
+        'status': 'success',
+        'data': job,
+    })
+
+
+@require_http_methods(["GET"])
+@login_required
+def slow_queries_view(request):
+    """
+    Медленные запросы к БД, записанные этим воркером
+    """
+    try:
+        check_site_admin_access(request.user)
+    except Exception:
+        return redirect('teddy_admin_custom:custom-login')
+
+    context = {
+        'entries': slow_query_log.entries(),
+        'stats': slow_query_log.stats(),
+        'threshold_ms': get_slow_queries_config()['THRESHOLD_MS'],
+        'pid': os.getpid(),
+    }
+    return render(request, 'slow-queries.html', context)
+
+
+@require_http_methods(["GET"])
+@login_required
+def profiles_view(request):
+    """
+    Последние профили запросов (X-Profile: 1 или ?_profile=1)
+    """
+    try:
+        check_site_admin_access(request.user)
+    except Exception:
+        return redirect('teddy_admin_custom:custom-login')
+
+    return render(request, 'profiles.html', {'profiles': list_profiles()})
+
+
+@require_http_methods(["GET"])
+@login_required
+def profile_download(request, name):
+    """
+    Файл профиля в формате pstats
+    """
+    check_site_admin_access(request.user)
+
+    path = profile_path(name)
+    if path is None:
+        raise Http404(f'Профиль {name} не найден')
+    return FileResponse(open(path, 'rb'), as_attachment=True,
+                        filename=f'{name}.prof')